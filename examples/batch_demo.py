@@ -42,23 +42,39 @@ class PodcastBatchGenerator:
             print(f"❌ 生成失败: {str(e)}")
             return None
     
+    def submit_batch(self, configs: List[Dict]) -> List[str]:
+        """一次提交整批任务，返回与配置顺序一致的task_id列表（失败返回空列表）"""
+        url = f"{self.api_base_url}/api/v1/podcast/batch"
+        
+        try:
+            response = requests.post(url, json={"forms": configs}, timeout=30)
+            response.raise_for_status()
+            result = response.json()
+            print(f"  ✅ 批次创建成功: {result['batch_id']}")
+            return [item["task_id"] for item in result["items"]]
+        except Exception as e:
+            print(f"❌ 批量提交失败: {str(e)}")
+            return []
+    
     def wait_for_completion(self, task_id: str, timeout: int = 300) -> Dict:
-        """等待任务完成"""
+        """等待任务完成（长轮询：服务端在状态/进度变化或等待超时后才返回，只返回游标之后的增量）"""
         url = f"{self.api_base_url}/api/v1/podcast/status/{task_id}"
         start_time = time.time()
+        cursor = None
         
         while time.time() - start_time < timeout:
             try:
-                response = requests.get(url, timeout=10)
+                params = {"since": cursor, "wait": 30} if cursor is not None else {}
+                response = requests.get(url, params=params, timeout=40)
                 status = response.json()
+                cursor = status.get("cursor", cursor)
                 
-                if status["status"] == "completed":
-                    return status
-                elif status["status"] == "failed":
+                if status["status"] in ("completed", "failed", "cancelled", "not_found"):
                     return status
                 
-                print(f"  ⏳ 任务 {task_id[:8]} 进行中... ({int(time.time() - start_time)}s)")
-                time.sleep(5)
+                segments = (status.get("progress") or {}).get("segments")
+                detail = f" {segments['done']}/{segments['total']}" if segments else ""
+                print(f"  ⏳ 任务 {task_id[:8]} {status['status']}{detail}... ({int(time.time() - start_time)}s)")
                 
             except Exception as e:
                 print(f"  ⚠️  查询状态失败: {str(e)}")
@@ -103,19 +119,9 @@ class PodcastBatchGenerator:
             return
         print("✅ 服务器运行正常\n")
         
-        # 批量提交任务
-        task_ids = []
-        for i, config in enumerate(configs, 1):
-            print(f"📝 [{i}/{len(configs)}] 提交任务: {config.get('topic', 'Unknown')}")
-            task_id = self.generate_podcast(config)
-            
-            if task_id:
-                print(f"  ✅ 任务创建成功: {task_id}")
-                task_ids.append((task_id, config))
-            else:
-                print(f"  ❌ 任务创建失败")
-            
-            time.sleep(1)  # 避免请求过快
+        # 批量提交任务（服务端共享相同主题/素材的RAG检索和分析）
+        print(f"📝 提交批次: {len(configs)} 个任务")
+        task_ids = list(zip(self.submit_batch(configs), configs))
         
         print(f"\n{'='*60}")
         print(f"⏳ 等待任务完成 (共 {len(task_ids)} 个任务)")
@@ -20,11 +20,22 @@ class Settings(BaseSettings):
     gemini_api_key: str = ""
     gemini_base_url: str = "https://generativelanguage.googleapis.com/v1beta"
     gemini_model: str = "gemini-2.5-flash"
+    analysis_chunk_chars: int = 8000  # 素材超过该字符数时分段并发分析再合并
+    analysis_max_chunks: int = 8  # 最多分段数（素材更长时放大每段字符数）
 
     # LLM配置 - 用于剧本生成（支持OpenAI兼容接口，如DeepSeek、腾讯混元等）
     deepseek_api_key: str = ""
     deepseek_base_url: str = "https://api.hunyuan.cloud.tencent.com/v1"  # 默认使用腾讯混元
     deepseek_model: str = "hunyuan-turbos-latest"  # 腾讯混元模型
+    script_generation_mode: str = "sequential"  # 剧本生成模式: "sequential"(逐轮续写), "parallel_stages"(先规划阶段再并发生成)
+    llm_json_mode: bool = True  # 请求 response_format=json_object（服务商不支持时自动关闭）
+    llm_stream_dialogues: bool = False  # 剧本轮次流式输出，边生成边提取完整对话上报进度（部分服务商流式时不返回Token用量）
+    # 额外的OpenAI兼容端点（与上面的主端点一起由路由器按延迟和健康状态选择），JSON数组：
+    # [{"name": "deepseek", "base_url": "...", "api_key": "...", "model": "...", "max_concurrency": 4}]
+    llm_endpoints: str = ""
+    llm_endpoint_failure_threshold: int = 3  # 连续失败多少次后熔断该端点
+    llm_endpoint_cooldown_seconds: float = 30.0  # 首次熔断的冷却时间（秒），再次熔断时翻倍
+    llm_endpoint_max_cooldown_seconds: float = 300.0  # 冷却时间上限（秒）
 
     # Gradio Space配置（可选，用于自部署的DeepSeek）
     use_gradio_deepseek: bool = False
@@ -34,15 +45,31 @@ class Settings(BaseSettings):
     tts_api_key: str = ""
     tts_model: str = "tts-1"
     tts_engine: str = "indextts2_gradio"  # 可选: "qwen3_tts", "nihal_tts", "indextts2_gradio", "indextts2", "openai"
+    tts_singleflight_enabled: bool = True  # 相同(引擎, 音色, 情感, 文本)的并发合成请求共享一次上游调用
+
+    # TTS引擎路由配置（按各引擎滚动延迟/错误率/合成速度选择最快引擎，替代固定优先级）
+    tts_routing_enabled: bool = False
+    tts_routing_engines: str = "cosyvoice,qwen3_tts,nihal_tts,indextts2_gradio,openai"  # 候选引擎（逗号分隔，顺序即样本不足时的优先级）
+    tts_routing_explore_ratio: float = 0.1  # 优先尝试样本不足引擎的概率
+
+    # TTS对冲请求配置（仅Gradio在线引擎）
+    tts_hedging_enabled: bool = False  # 超过延迟分位数截止时间后向备用客户端重发请求
+    tts_hedge_percentile: float = 95.0  # 截止时间取历史延迟的该分位数
+    tts_hedge_min_delay: float = 5.0  # 截止时间下限（秒）
+    tts_hedge_initial_delay: float = 30.0  # 样本不足时的截止时间（秒）
+    tts_hedge_max_ratio: float = 0.1  # 对冲请求占总请求的比例上限
 
     # Qwen3-TTS配置
     qwen3_tts_space: str = "Qwen/Qwen3-TTS-Demo"
+    qwen3_tts_hedge_space: str = ""  # 对冲请求使用的备用Space（留空则复用主Space）
 
     # NihalGazi-TTS配置
     nihal_tts_space: str = "NihalGazi/Text-To-Speech-Unlimited"
+    nihal_tts_hedge_space: str = ""  # 对冲请求使用的备用Space（留空则复用主Space）
 
     # IndexTTS2 Gradio配置
     indextts2_gradio_space: str = "IndexTeam/IndexTTS-2-Demo"
+    indextts2_gradio_hedge_space: str = ""  # 对冲请求使用的备用Space（留空则复用主Space）
 
     # AliCloud CosyVoice配置
     alicloud_dashscope_api_key: str = ""
@@ -122,9 +149,74 @@ class Settings(BaseSettings):
     max_requests: int = 1000
     timeout: int = 30
 
+    # 自适应并发配置（AIMD，按引擎独立调整：CosyVoice、Gradio引擎、LLM、嵌入模型）
+    tts_max_concurrency: int = 3  # TTS引擎的初始并发数
+    adaptive_concurrency_enabled: bool = True  # 关闭后各引擎固定使用初始并发数
+    adaptive_concurrency_initial: int = 3  # 其他引擎（LLM、嵌入模型）的初始并发数
+    adaptive_concurrency_min: int = 1
+    adaptive_concurrency_max: int = 16
+
     # 播客生成配置
     enable_audio_generation: bool = False  # 是否生成音频（设为False只生成剧本）
     task_worker_count: int = 2  # 任务工作线程数
+    task_deadline_seconds: int = 0  # 单个任务的固定完成时限（秒），远端调用的超时和重试不会超过剩余时间，0表示按目标时长推算
+    task_deadline_base_seconds: int = 600  # 按目标时长推算时限时的基础时间（秒）
+    task_deadline_per_minute_seconds: int = 240  # 按目标时长推算时限时每分钟音频给予的时间（秒），与基础时间均为0时不限
+
+    # 任务准入控制（超限返回429并给出Retry-After）
+    task_queue_max_depth: int = 50  # 排队任务数上限，0表示不限
+    task_queue_max_wait_seconds: int = 900  # 按实际吞吐估算的排队等待时间上限（秒），0表示不限
+    task_preview_max_minutes: int = 3  # 目标时长不超过该分钟数的任务视为预览，优先于长时长渲染执行
+
+    # 多租户公平调度（租户：X-API-Key哈希"key:xxxx" / X-Client-Id"client:xxx" / 客户端地址"host:x.x.x.x"）
+    tenant_weights: str = ""  # 租户权重，格式 tenant1:2,tenant2:0.5，未配置的租户权重为1
+
+    # 任务注册表（内存中只保留未结束任务和最近结束的任务，其余写入磁盘按需加载）
+    task_registry_dir: str = "data/task_registry"
+    task_registry_recent_max: int = 200  # 内存中保留的已结束任务数
+    task_registry_retention_days: int = 7  # 已结束任务记录的保留天数，0表示不清理
+
+    # 任务检查点（各阶段产物写入任务目录，进程重启后从最后完成的阶段继续）
+    task_checkpoint_enabled: bool = True
+    task_checkpoint_ttl_hours: int = 72  # 失败、取消或中断后超过该时长未更新的检查点在启动时删除（不再恢复），0表示不清理
+
+    # 请求幂等与结果缓存（按规范化定制单 + 引擎配置去重）
+    request_dedup_enabled: bool = True
+    result_cache_ttl_seconds: int = 86400  # 已完成结果的缓存时间（秒）
+    idempotency_key_ttl_seconds: int = 86400  # Idempotency-Key 的有效期（秒）
+
+    # 任务完成通知（Webhook回调 + 状态长轮询）
+    webhook_secret: str = ""  # 回调签名密钥（HMAC-SHA256），为空时不签名
+    webhook_max_attempts: int = 5  # 回调最大尝试次数（网络错误、429、5xx时重试）
+    webhook_timeout_seconds: float = 10.0  # 单次回调超时（秒）
+    webhook_max_connections: int = 20  # 所有回调共用的连接数上限
+    webhook_allow_private_targets: bool = False  # 是否允许回调本机/内网地址（仅限本地调试）
+    status_long_poll_max_seconds: int = 60  # 状态长轮询的最长等待时间（秒）
+
+    # 批量生成与共享预处理（相同主题的RAG检索、相同背景素材的Gemini分析跨任务共享）
+    batch_max_items: int = 20  # 单批最多的定制单数
+    preprocess_cache_ttl_seconds: int = 3600  # 预处理结果缓存时间（秒），0表示只合并并发的相同请求
+
+    # LLM响应持久缓存（素材分析、结构规划、结束语等低温度调用，按内容哈希存入SQLite，进程重启后仍有效、多worker共享）
+    llm_cache_enabled: bool = True
+    llm_cache_path: str = "data/cache/llm_cache.sqlite3"
+    llm_cache_ttl_seconds: int = 604800  # 缓存有效期（秒），默认7天
+    llm_cache_max_entries: int = 5000  # 最多条目数，超出时淘汰最久未使用的结果
+    llm_cache_max_mb: int = 100  # 缓存总大小上限（MB）
+
+    # 统一重试配置（所有远端调用共享的重试预算：每次调用积累ratio个令牌，每次重试消耗1个）
+    retry_budget_ratio: float = 0.2  # 重试流量不超过正常调用量的20%
+    retry_budget_min_tokens: int = 10  # 初始令牌数（冷启动时允许的重试次数）
+
+    # 出站HTTP连接池（LLM、嵌入、TTS、视觉、网页抓取、回调共用，按目标主机复用keep-alive连接）
+    http_pool_max_connections: int = 100  # aiohttp会话的总连接数上限
+    http_pool_max_per_host: int = 20  # 每个目标主机的连接数上限
+    http_keepalive_seconds: float = 60.0  # 空闲连接保留时间（秒）
+    http_dns_cache_seconds: int = 300  # aiohttp会话DNS解析结果缓存时间（秒）
+    http2_enabled: bool = True  # 安装了h2时对httpx客户端启用HTTP/2
+
+    # 音频后处理配置
+    audio_process_workers: int = 2  # 音效/母带/BGM/导出的进程池大小（与API worker独立，0表示改用线程池）
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,154 @@
+"""
+出站HTTP客户端注册表
+LLM、嵌入、TTS、视觉和网页抓取共用应用级的HTTP客户端，不再每次调用新建会话：
+- 按目标主机（scheme://host:port）各建一个httpx客户端，keep-alive连接池按主机限制连接数，
+  连续请求复用已完成TLS握手的连接；安装了h2时启用HTTP/2多路复用
+- aiohttp调用方共用一个会话：总连接数和单主机连接数上限、DNS解析缓存、空闲连接保活
+应用启动时创建，关闭时统一释放
+"""
+
+import logging
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, Dict
+from urllib.parse import urlsplit
+
+import httpx
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401 - httpx的HTTP/2支持依赖h2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+def host_key(url: str) -> str:
+    """连接池的分组键：scheme://host:port（同一主机的不同路径共用连接池）"""
+    parts = urlsplit(url)
+    scheme = parts.scheme or "https"
+    port = parts.port or (443 if scheme == "https" else 80)
+    return f"{scheme}://{parts.hostname or ''}:{port}"
+
+
+class HTTPClientRegistry:
+    """按目标主机缓存的连接池客户端（httpx同步/异步客户端 + 共享aiohttp会话）"""
+
+    def __init__(self, max_connections: int = 100, max_per_host: int = 20,
+                 keepalive_seconds: float = 60.0, dns_cache_seconds: int = 300,
+                 http2: bool = True):
+        self.max_connections = max_connections
+        self.max_per_host = max_per_host
+        self.keepalive_seconds = keepalive_seconds
+        self.dns_cache_seconds = dns_cache_seconds
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self._async_clients: Dict[str, httpx.AsyncClient] = {}
+        self._sync_clients: Dict[str, httpx.Client] = {}
+        self._aiohttp_session = None
+        self._lock = threading.Lock()
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_per_host,
+            max_keepalive_connections=self.max_per_host,
+            keepalive_expiry=self.keepalive_seconds
+        )
+
+    # ---------- httpx ----------
+
+    def get_async_client(self, url: str) -> httpx.AsyncClient:
+        """
+        目标主机共用的异步客户端（可直接作为 openai.AsyncOpenAI 的 http_client）
+
+        超时由调用方按请求传入；客户端本身只提供连接池
+        """
+        key = host_key(url)
+        with self._lock:
+            client = self._async_clients.get(key)
+            if client is None or client.is_closed:
+                client = httpx.AsyncClient(limits=self._limits(), http2=self.http2, timeout=None)
+                self._async_clients[key] = client
+                logger.info(f"[HTTP] 创建连接池: {key} (HTTP/2: {self.http2})")
+            return client
+
+    def get_sync_client(self, url: str) -> httpx.Client:
+        """目标主机共用的同步客户端（供在线程中调用的 openai.OpenAI 等使用）"""
+        key = host_key(url)
+        with self._lock:
+            client = self._sync_clients.get(key)
+            if client is None or client.is_closed:
+                client = httpx.Client(limits=self._limits(), http2=self.http2, timeout=None)
+                self._sync_clients[key] = client
+                logger.info(f"[HTTP] 创建同步连接池: {key} (HTTP/2: {self.http2})")
+            return client
+
+    # ---------- aiohttp ----------
+
+    def _get_aiohttp_session(self):
+        import aiohttp
+
+        if self._aiohttp_session is None or self._aiohttp_session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.max_per_host,
+                ttl_dns_cache=self.dns_cache_seconds,
+                keepalive_timeout=self.keepalive_seconds
+            )
+            self._aiohttp_session = aiohttp.ClientSession(connector=connector)
+        return self._aiohttp_session
+
+    @asynccontextmanager
+    async def session(self):
+        """
+        共享的aiohttp会话（退出时不关闭，连接留在池中复用）
+
+        用法与 `async with aiohttp.ClientSession() as session` 相同，超时在各请求上指定
+        """
+        yield self._get_aiohttp_session()
+
+    # ---------- 生命周期 ----------
+
+    async def startup(self):
+        """应用启动时在事件循环中创建共享会话"""
+        self._get_aiohttp_session()
+        logger.info(f"[HTTP] 连接池就绪 (每主机 {self.max_per_host} 连接, HTTP/2: {self.http2})")
+
+    async def aclose(self):
+        """应用关闭时释放所有连接"""
+        with self._lock:
+            async_clients = list(self._async_clients.values())
+            sync_clients = list(self._sync_clients.values())
+            self._async_clients.clear()
+            self._sync_clients.clear()
+            session, self._aiohttp_session = self._aiohttp_session, None
+
+        for client in async_clients:
+            await client.aclose()
+        for client in sync_clients:
+            client.close()
+        if session is not None and not session.closed:
+            await session.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = {
+                "http2": self.http2,
+                "max_per_host": self.max_per_host,
+                "async_hosts": sorted(self._async_clients),
+                "sync_hosts": sorted(self._sync_clients)
+            }
+        session = self._aiohttp_session
+        stats["aiohttp_session"] = session is not None and not session.closed
+        return stats
+
+
+http_clients = HTTPClientRegistry(
+    max_connections=settings.http_pool_max_connections,
+    max_per_host=settings.http_pool_max_per_host,
+    keepalive_seconds=settings.http_keepalive_seconds,
+    dns_cache_seconds=settings.http_dns_cache_seconds,
+    http2=settings.http2_enabled
+)
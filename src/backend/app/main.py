@@ -29,7 +29,20 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from .core.config import settings, create_directories
+from .core.http_clients import http_clients
 from .routes import podcast, knowledge, quality, vision, voice, voice_samples, voice_clone
+from .services.audio_process_pool import audio_process_pool
+from .services.adaptive_limiter import limiter_registry
+from .services.tts_singleflight import tts_singleflight
+from .services.tts_hedging import tts_hedger
+from .services.engine_router import engine_router
+from .services.retry_policy import retry_budget
+from .services.task_manager import task_manager
+from .services.webhook_notifier import webhook_notifier
+from .services.preprocess_cache import preprocess_cache
+from .services.llm_usage import llm_usage
+from .services.llm_cache import llm_cache
+from .services.llm_router import llm_router
 
 # 创建必要的目录
 create_directories()
@@ -72,6 +85,30 @@ app.mount("/static", StaticFiles(directory=frontend_path), name="static")
 if os.path.exists(audio_output_path):
     app.mount("/audio", StaticFiles(directory=audio_output_path), name="audio")
 
+@app.on_event("startup")
+async def startup_event():
+    # 创建出站HTTP连接池
+    await http_clients.startup()
+
+    # 清理过期的已结束任务记录
+    pruned = task_manager.prune_task_records()
+    if pruned:
+        print(f"已清理 {pruned} 条过期任务记录")
+
+    # 恢复进程退出前未完成的任务（从检查点继续）
+    resumed = task_manager.resume_interrupted_tasks()
+    if resumed:
+        print(f"已从检查点恢复 {resumed} 个未完成的任务")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # 关闭音频后处理进程池
+    audio_process_pool.shutdown()
+
+    # 释放出站HTTP连接
+    await http_clients.aclose()
+    await webhook_notifier.aclose()
+
 @app.get("/")
 async def root():
     return {
@@ -84,6 +121,24 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics")
+async def metrics():
+    """运行时指标：各引擎当前并发上限、请求去重、对冲与路由、重试预算、任务队列、回调、预处理缓存、LLM Token用量、LLM持久缓存、LLM端点路由和出站连接池统计"""
+    return {
+        "concurrency": limiter_registry.get_stats(),
+        "tts_singleflight": tts_singleflight.get_stats(),
+        "tts_hedging": tts_hedger.get_stats(),
+        "tts_routing": engine_router.get_stats(),
+        "retry_budget": retry_budget.get_stats(),
+        "task_queue": task_manager.get_queue_stats(),
+        "webhooks": webhook_notifier.get_stats(),
+        "preprocess_cache": preprocess_cache.get_stats(),
+        "llm_usage": llm_usage.get_stats(),
+        "llm_cache": await llm_cache.get_stats(),
+        "llm_routing": llm_router.get_stats(),
+        "http_clients": http_clients.get_stats()
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
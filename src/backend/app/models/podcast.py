@@ -1,7 +1,9 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, Field, PrivateAttr
+from typing import Dict, List, Optional
 from enum import Enum
 
+from ..utils.text_cleaner import clean_for_tts
+
 class DiscussionAtmosphere(str, Enum):
     RELAXED_HUMOROUS = "relaxed_humorous"
     SERIOUS_DEEP = "serious_deep"
@@ -63,6 +65,15 @@ class ScriptDialogue(BaseModel):
     content: str = Field(..., description="对话内容")
     emotion: Optional[str] = Field(None, description="情感标注")
 
+    # 清理后的朗读文本：(原文, 情感, 清理结果)，原文或情感被修改后重新清理
+    _tts_text: Optional[tuple] = PrivateAttr(default=None)
+
+    def tts_text(self) -> str:
+        """TTS朗读用的文本（移除舞台指示等，每句只清理一次）"""
+        if self._tts_text is None or self._tts_text[:2] != (self.content, self.emotion):
+            self._tts_text = (self.content, self.emotion, clean_for_tts(self.content, self.emotion))
+        return self._tts_text[2]
+
 class PodcastScript(BaseModel):
     title: str = Field(..., description="播客标题")
     topic: str = Field(..., description="播客主题")
@@ -72,10 +83,39 @@ class PodcastScript(BaseModel):
 
 class PodcastGenerationRequest(BaseModel):
     custom_form: PodcastCustomForm = Field(..., description="播客定制单")
+    callback_url: Optional[str] = Field(None, description="任务结束时回调的URL（POST任务状态，带HMAC签名）")
+
+class DialogueDelta(BaseModel):
+    offset: int = Field(..., description="变化的起始下标（客户端从此处替换）")
+    count: int = Field(..., description="当前对话总数（客户端据此截断）")
+    dialogues: List[ScriptDialogue] = Field(..., description="offset之后的对话")
 
 class PodcastGenerationResponse(BaseModel):
     task_id: str = Field(..., description="任务ID")
     status: str = Field(..., description="生成状态")
     script: Optional[PodcastScript] = Field(None, description="生成的剧本")
     audio_url: Optional[str] = Field(None, description="音频文件URL")
+    message: str = Field(..., description="状态消息")
+    cursor: Optional[str] = Field(None, description="状态游标（下次查询传入since只返回增量）")
+    progress: Optional[Dict[str, Dict[str, int]]] = Field(None, description="各阶段进度（如 segments: {done, total}）")
+    events: Optional[List[dict]] = Field(None, description="游标之后的进度事件（增量查询）")
+    dialogue_delta: Optional[DialogueDelta] = Field(None, description="游标之后变化的对话（增量查询）")
+
+class PodcastBatchRequest(BaseModel):
+    forms: List[PodcastCustomForm] = Field(..., min_items=1, description="播客定制单列表")
+    callback_url: Optional[str] = Field(None, description="每个任务结束时回调的URL")
+
+class PodcastBatchItem(BaseModel):
+    task_id: str = Field(..., description="任务ID")
+    status: str = Field(..., description="生成状态")
+    audio_url: Optional[str] = Field(None, description="音频文件URL")
+    progress: Optional[Dict[str, Dict[str, int]]] = Field(None, description="各阶段进度")
+
+class PodcastBatchResponse(BaseModel):
+    batch_id: str = Field(..., description="批次ID")
+    status: str = Field(..., description="批次状态（processing/completed）")
+    total: int = Field(..., description="任务总数")
+    counts: Dict[str, int] = Field(..., description="各状态的任务数")
+    progress: float = Field(..., description="整体进度（0-1）")
+    items: List[PodcastBatchItem] = Field(..., description="各任务状态（与提交顺序一致）")
     message: str = Field(..., description="状态消息")
\ No newline at end of file
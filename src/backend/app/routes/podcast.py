@@ -1,23 +1,56 @@
-from fastapi import APIRouter, HTTPException, Response
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 from fastapi.responses import FileResponse, JSONResponse
 import os
-from ..models.podcast import PodcastGenerationRequest, PodcastGenerationResponse
+from typing import Optional
+from ..models.podcast import (
+    PodcastGenerationRequest, PodcastGenerationResponse, PodcastBatchRequest, PodcastBatchResponse
+)
 from ..services.task_manager import task_manager
+from ..services.admission_control import QueueFullError
+from ..services.task_scheduler import resolve_tenant
+from ..services.request_dedup import IdempotencyConflict
+from ..services.webhook_notifier import validate_callback_url
+from ..core.config import settings
 
 router = APIRouter(prefix="/podcast", tags=["podcast"])
 
 @router.post("/generate", response_model=PodcastGenerationResponse)
-async def generate_podcast(request: PodcastGenerationRequest):
+async def generate_podcast(request: PodcastGenerationRequest, http_request: Request):
     """
     生成AI虚拟播客
+
+    租户由 X-API-Key 或 X-Client-Id 请求头（缺省时为客户端地址）确定，
+    不同租户的任务按权重公平排队。相同定制单（或相同 Idempotency-Key）的请求
+    返回已有任务，已完成的结果直接返回。提供 callback_url 时任务结束后回调该地址
     """
-    try:
-        # 验证角色数量
-        if len(request.custom_form.characters) < 2:
-            raise HTTPException(status_code=400, detail="至少需要2个角色")
+    # 验证角色数量和回调地址（在下面的 try 之外，400 不会被转换成 500）
+    if len(request.custom_form.characters) < 2:
+        raise HTTPException(status_code=400, detail="至少需要2个角色")
+
+    if request.callback_url:
+        try:
+            validate_callback_url(request.callback_url)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
+    try:
         # 创建生成任务
-        task_id = await task_manager.create_task(request.custom_form)
+        tenant = resolve_tenant(
+            api_key=http_request.headers.get("X-API-Key"),
+            client_id=http_request.headers.get("X-Client-Id"),
+            client_host=http_request.client.host if http_request.client else None
+        )
+        task_id = await task_manager.create_task(
+            request.custom_form,
+            tenant=tenant,
+            idempotency_key=http_request.headers.get("Idempotency-Key"),
+            callback_url=request.callback_url
+        )
+
+        # 复用的任务可能已在执行或已完成，直接返回其当前状态
+        existing = task_manager.get_task_status(task_id)
+        if existing.status != "queued":
+            return existing
 
         return PodcastGenerationResponse(
             task_id=task_id,
@@ -25,14 +58,135 @@ async def generate_podcast(request: PodcastGenerationRequest):
             message="任务已创建，正在处理中..."
         )
 
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    except QueueFullError as e:
+        # 背压：按实际吞吐估算的重试间隔告知客户端
+        raise HTTPException(
+            status_code=429,
+            detail=f"服务繁忙: {str(e)}",
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"任务创建失败: {str(e)}")
 
+@router.post("/batch", response_model=PodcastBatchResponse)
+async def generate_podcast_batch(request: PodcastBatchRequest, http_request: Request):
+    """
+    批量生成播客：一次提交多个定制单，返回批次ID
+
+    整批准入（队列容量不足时整体返回429）；批内相同的定制单只生成一次，
+    相同主题的RAG检索和相同背景素材的分析在批内共享
+    """
+    if len(request.forms) > settings.batch_max_items:
+        raise HTTPException(status_code=400, detail=f"单批最多 {settings.batch_max_items} 个定制单")
+    if any(len(form.characters) < 2 for form in request.forms):
+        raise HTTPException(status_code=400, detail="至少需要2个角色")
+    if request.callback_url:
+        try:
+            validate_callback_url(request.callback_url)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    tenant = resolve_tenant(
+        api_key=http_request.headers.get("X-API-Key"),
+        client_id=http_request.headers.get("X-Client-Id"),
+        client_host=http_request.client.host if http_request.client else None
+    )
+    try:
+        batch_id = await task_manager.create_batch(request.forms, tenant=tenant, callback_url=request.callback_url)
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=429,
+            detail=f"服务繁忙: {str(e)}",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"批量任务创建失败: {str(e)}")
+
+    return task_manager.get_batch_status(batch_id)
+
+@router.get("/batch/{batch_id}", response_model=PodcastBatchResponse)
+async def get_batch_status(batch_id: str):
+    """
+    查询批次状态：各任务状态与整体进度
+    """
+    status = task_manager.get_batch_status(batch_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="批次不存在")
+    return status
+
+def _status_etag(cursor: str) -> str:
+    return f'"{cursor}"'
+
+
+def _if_none_match_cursor(header: Optional[str]) -> Optional[str]:
+    """从 If-None-Match 中解析客户端已有的游标"""
+    for tag in (header or "").split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if len(tag) > 2 and tag.startswith('"') and tag.endswith('"'):
+            return tag[1:-1]
+    return None
+
+
 @router.get("/status/{task_id}", response_model=PodcastGenerationResponse)
-async def get_task_status(task_id: str):
+async def get_task_status(
+    task_id: str,
+    http_request: Request,
+    response: Response,
+    wait: float = Query(0, ge=0, description="长轮询等待秒数（0表示立即返回）"),
+    since: Optional[str] = Query(None, description="上次响应中的cursor，只返回之后的增量")
+):
     """
     获取播客生成任务状态
+
+    - 响应带 ETag（任务游标），If-None-Match 命中时返回 304
+    - 传入 since（上次响应的 cursor）时只返回之后变化的对话和进度事件
+    - 同时传入 wait 时为长轮询：等到有新变化或超时才返回，
+      等待时间不超过 STATUS_LONG_POLL_MAX_SECONDS
     """
+    known_cursor = _if_none_match_cursor(http_request.headers.get("If-None-Match"))
+    baseline = since if since is not None else known_cursor
+    timeout = min(wait, settings.status_long_poll_max_seconds)
+
+    if baseline is not None and timeout > 0:
+        await task_manager.wait_for_change(task_id, baseline, timeout)
+    status = task_manager.get_task_status(task_id, since)
+
+    if status.cursor is None:
+        return status
+
+    etag = _status_etag(status.cursor)
+    if known_cursor == status.cursor:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return status
+
+@router.post("/cancel/{task_id}", response_model=PodcastGenerationResponse)
+async def cancel_podcast_task(task_id: str, http_request: Request):
+    """
+    取消播客生成任务，立即中断正在进行的剧本/音频生成并释放中间产物
+
+    只能取消本租户（与创建任务时相同的 X-API-Key / X-Client-Id / 客户端地址）创建的任务
+    """
+    tenant = resolve_tenant(
+        api_key=http_request.headers.get("X-API-Key"),
+        client_id=http_request.headers.get("X-Client-Id"),
+        client_host=http_request.client.host if http_request.client else None
+    )
+    try:
+        cancelled = task_manager.cancel_task(task_id, tenant=tenant)
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+
+    if cancelled is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    if not cancelled:
+        raise HTTPException(status_code=409, detail="任务已结束，无法取消")
+
     return task_manager.get_task_status(task_id)
 
 @router.get("/download/{task_id}")
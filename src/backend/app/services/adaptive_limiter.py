@@ -0,0 +1,284 @@
+"""
+自适应并发控制（AIMD）
+为每个远端引擎（CosyVoice、Gradio Space、LLM、嵌入模型）维护独立的并发上限：
+延迟和错误率健康时加性增加，遇到限流（429）、超时或WebSocket断开时乘性减小。
+同时支持异步调用方和同步调用方（如在线程中运行的嵌入模型）
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Callable, Deque, Dict, Optional
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 视为"过载信号"的错误关键字，命中时触发乘性减小
+OVERLOAD_KEYWORDS = [
+    "429",
+    "rate limit",
+    "too many requests",
+    "throttl",
+    "timeout",
+    "timed out",
+    "websocket closed",
+    "connection to remote host was lost",
+    "connection reset",
+    "queue is full",
+]
+
+
+def is_overload_error(error: BaseException) -> bool:
+    """判断异常是否表示远端过载"""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError)):
+        return True
+
+    status_code = getattr(error, "status_code", None)
+    if status_code in (429, 503):
+        return True
+
+    message = str(error).lower()
+    return any(keyword in message for keyword in OVERLOAD_KEYWORDS)
+
+# 同步等待者的重新检查间隔（秒）
+SYNC_WAIT_RECHECK_SECONDS = 1.0
+
+
+class AdaptiveLimiter:
+    """单个引擎的AIMD并发限制器"""
+
+    def __init__(self, name: str, initial_limit: int = 3, min_limit: int = 1,
+                 max_limit: int = 16, decrease_factor: float = 0.5,
+                 latency_tolerance: float = 2.0, error_rate_threshold: float = 0.2,
+                 window: int = 50, adaptive: bool = True):
+        self.name = name
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.error_rate_threshold = error_rate_threshold
+        self.adaptive = adaptive
+
+        self._limit = float(min(self.max_limit, max(self.min_limit, initial_limit)))
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._waiters: Deque[Callable[[], None]] = deque()
+
+        # 健康度统计
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._baseline_latency: Optional[float] = None
+        self._last_decrease = 0.0
+
+        self.stats = {"success": 0, "errors": 0, "overloads": 0, "decreases": 0}
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    # ---------- 获取/释放 ----------
+
+    def _acquire_or_enqueue(self, wake: Callable[[], None]) -> bool:
+        """
+        有空余名额时直接占用并返回True，否则登记唤醒回调并返回False
+
+        名额检查和登记在同一把锁内完成，release() 不会落在两者之间而丢失唤醒
+        """
+        with self._lock:
+            if self._in_flight < int(self._limit):
+                self._in_flight += 1
+                return True
+            self._waiters.append(wake)
+            return False
+
+    def _wake_next(self):
+        with self._lock:
+            wake = self._waiters.popleft() if self._waiters else None
+        if wake is not None:
+            wake()
+
+    async def acquire(self):
+        """异步获取一个并发名额"""
+        loop = asyncio.get_running_loop()
+        while True:
+            future = loop.create_future()
+
+            def wake(fut=future):
+                loop.call_soon_threadsafe(lambda: fut.done() or fut.set_result(None))
+
+            if self._acquire_or_enqueue(wake):
+                return
+            try:
+                await future
+            except asyncio.CancelledError:
+                with self._lock:
+                    if wake in self._waiters:
+                        self._waiters.remove(wake)
+                        wake = None
+                # 已被唤醒却取消了，把唤醒机会让给下一个等待者
+                if wake is not None:
+                    self._wake_next()
+                raise
+
+    def acquire_sync(self):
+        """同步获取一个并发名额（供线程中的同步调用使用）"""
+        while True:
+            event = threading.Event()
+            if self._acquire_or_enqueue(event.set):
+                return
+            # 等待带超时：即使唤醒丢失，也会定期重新检查名额
+            if not event.wait(SYNC_WAIT_RECHECK_SECONDS):
+                with self._lock:
+                    if event.set in self._waiters:
+                        self._waiters.remove(event.set)
+
+    def release(self, latency: Optional[float] = None, error: Optional[BaseException] = None,
+                record: bool = True):
+        """释放名额并根据本次结果调整并发上限（record=False时不计入统计，如调用被取消）"""
+        with self._lock:
+            self._in_flight = max(0, self._in_flight - 1)
+            if record and error is None:
+                self._on_success(latency)
+            elif record:
+                self._on_error(error)
+            # 上限提高时可能需要唤醒多个等待者
+            wake_count = max(1, int(self._limit) - self._in_flight)
+            wakers = [self._waiters.popleft() for _ in range(min(wake_count, len(self._waiters)))]
+
+        for wake in wakers:
+            wake()
+
+    # ---------- AIMD ----------
+
+    def _error_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return self._outcomes.count(False) / len(self._outcomes)
+
+    def _on_success(self, latency: Optional[float]):
+        self.stats["success"] += 1
+        self._outcomes.append(True)
+
+        latency_healthy = True
+        if latency is not None:
+            if self._baseline_latency is None:
+                self._baseline_latency = latency
+            else:
+                # 基线延迟取慢速EWMA，对单次抖动不敏感
+                self._baseline_latency = 0.9 * self._baseline_latency + 0.1 * latency
+            latency_healthy = latency <= self._baseline_latency * self.latency_tolerance
+
+        if not self.adaptive or not latency_healthy:
+            return
+        if self._error_rate() > self.error_rate_threshold:
+            return
+
+        # 加性增加：每个"满负载往返"上限约增加1
+        if self._in_flight + 1 >= int(self._limit):
+            self._limit = min(self.max_limit, self._limit + 1.0 / max(1.0, self._limit))
+
+    def _on_error(self, error: BaseException):
+        self._outcomes.append(False)
+        overloaded = is_overload_error(error)
+        if overloaded:
+            self.stats["overloads"] += 1
+        else:
+            self.stats["errors"] += 1
+
+        if not self.adaptive:
+            return
+        if not overloaded and self._error_rate() <= self.error_rate_threshold:
+            return
+
+        # 同一批并发请求同时失败只减小一次（冷却时间取基线延迟）
+        now = time.monotonic()
+        cooldown = self._baseline_latency or 1.0
+        if now - self._last_decrease < cooldown:
+            return
+
+        old_limit = self._limit
+        self._limit = max(float(self.min_limit), self._limit * self.decrease_factor)
+        self._last_decrease = now
+        self.stats["decreases"] += 1
+        logger.warning(
+            f"[AIMD] {self.name} 并发上限下调 {old_limit:.1f} -> {self._limit:.1f} "
+            f"(原因: {str(error)[:100]})"
+        )
+
+    # ---------- 上下文管理器 ----------
+
+    @asynccontextmanager
+    async def slot(self):
+        """异步上下文：获取名额，结束时按结果（耗时/异常）反馈给AIMD"""
+        await self.acquire()
+        started = time.monotonic()
+        try:
+            yield
+        except asyncio.CancelledError:
+            self.release(record=False)
+            raise
+        except Exception as error:
+            self.release(error=error)
+            raise
+        else:
+            self.release(latency=time.monotonic() - started)
+
+    @contextmanager
+    def slot_sync(self):
+        """同步上下文：同 slot()，供同步客户端使用"""
+        self.acquire_sync()
+        started = time.monotonic()
+        try:
+            yield
+        except Exception as error:
+            self.release(error=error)
+            raise
+        else:
+            self.release(latency=time.monotonic() - started)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "in_flight": self._in_flight,
+            "waiting": len(self._waiters),
+            "error_rate": round(self._error_rate(), 3),
+            "baseline_latency": round(self._baseline_latency, 3) if self._baseline_latency else None,
+            **self.stats
+        }
+
+
+class LimiterRegistry:
+    """按引擎名称管理限制器"""
+
+    def __init__(self):
+        self._limiters: Dict[str, AdaptiveLimiter] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str, initial_limit: Optional[int] = None) -> AdaptiveLimiter:
+        """获取（或创建）指定引擎的限制器"""
+        with self._lock:
+            limiter = self._limiters.get(name)
+            if limiter is None:
+                limiter = AdaptiveLimiter(
+                    name,
+                    initial_limit=initial_limit or settings.adaptive_concurrency_initial,
+                    min_limit=settings.adaptive_concurrency_min,
+                    max_limit=settings.adaptive_concurrency_max,
+                    adaptive=settings.adaptive_concurrency_enabled
+                )
+                self._limiters[name] = limiter
+            return limiter
+
+    def get_stats(self) -> Dict[str, Any]:
+        """所有引擎当前并发上限等指标"""
+        return {name: limiter.get_stats() for name, limiter in self._limiters.items()}
+
+
+limiter_registry = LimiterRegistry()
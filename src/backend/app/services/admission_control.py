@@ -0,0 +1,177 @@
+"""
+任务准入控制
+根据排队深度和按实际吞吐估算的等待时间决定是否接收新任务，
+超限时拒绝并给出建议的重试间隔（Retry-After），避免流量高峰时队列无限增长、所有任务一起变慢
+"""
+
+import math
+import re
+import threading
+from typing import Any, Dict, List, Optional
+
+from ..core.config import settings
+
+# 优先级（数值越小越先执行）：短时长预览可以越过长时长渲染
+PRIORITY_PREVIEW = 0
+PRIORITY_STANDARD = 1
+
+PRIORITY_NAMES = {
+    PRIORITY_PREVIEW: "preview",
+    PRIORITY_STANDARD: "standard",
+}
+
+
+class QueueFullError(Exception):
+    """任务队列已满（或预计等待时间过长），请求应稍后重试"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_target_minutes(target_duration: str) -> Optional[int]:
+    """从目标时长（如"5分钟"、"10-15分钟"）中提取分钟数，取第一个数字"""
+    numbers = re.findall(r'\d+', target_duration or "")
+    return int(numbers[0]) if numbers else None
+
+
+def classify_priority(target_duration: str) -> int:
+    """按目标时长划分优先级：不超过 task_preview_max_minutes 分钟的视为预览"""
+    minutes = parse_target_minutes(target_duration)
+    if minutes is not None and minutes <= settings.task_preview_max_minutes:
+        return PRIORITY_PREVIEW
+    return PRIORITY_STANDARD
+
+
+class AdmissionController:
+    """基于排队深度与预计等待时间的准入控制器"""
+
+    def __init__(self, max_depth: int = 50, max_wait_seconds: float = 900.0,
+                 initial_service_seconds: float = 120.0, smoothing: float = 0.2):
+        """
+        Args:
+            max_depth: 排队任务数上限（0表示不限）
+            max_wait_seconds: 预计等待时间上限（秒，0表示不限）
+            initial_service_seconds: 尚无完成样本时假定的单任务耗时
+            smoothing: 单任务耗时EWMA的平滑系数
+        """
+        self.max_depth = max_depth
+        self.max_wait_seconds = max_wait_seconds
+        self.smoothing = smoothing
+        self._service_seconds = {
+            PRIORITY_PREVIEW: initial_service_seconds,
+            PRIORITY_STANDARD: initial_service_seconds,
+        }
+        self._samples = {PRIORITY_PREVIEW: 0, PRIORITY_STANDARD: 0}
+        self._lock = threading.Lock()
+        self.stats = {"admitted": 0, "rejected": 0}
+
+    def record_completion(self, priority: int, seconds: float):
+        """记录一个任务的实际执行耗时（用于估算吞吐）"""
+        with self._lock:
+            if self._samples[priority] == 0:
+                self._service_seconds[priority] = seconds
+            else:
+                self._service_seconds[priority] += self.smoothing * (seconds - self._service_seconds[priority])
+            self._samples[priority] += 1
+
+    def estimate_wait(self, queued: Dict[int, int], priority: int, workers: int) -> float:
+        """
+        估算新任务的排队等待时间：排在它前面的任务（同级及更高优先级）按各自平均耗时
+        由所有工作协程分摊
+
+        Args:
+            queued: 各优先级当前排队任务数
+            priority: 新任务的优先级
+            workers: 工作协程数
+        """
+        ahead = sum(
+            count * self._service_seconds[level]
+            for level, count in queued.items()
+            if level <= priority
+        )
+        return ahead / max(1, workers)
+
+    def admit(self, queued: Dict[int, int], priority: int, workers: int):
+        """
+        判断是否接收新任务，超限时抛出 QueueFullError
+
+        Args:
+            queued: 各优先级当前排队任务数
+            priority: 新任务的优先级
+            workers: 工作协程数
+        """
+        self._check(queued, priority, workers)
+        with self._lock:
+            self.stats["admitted"] += 1
+
+    def admit_batch(self, queued: Dict[int, int], priorities: List[int], workers: int):
+        """
+        整批判断是否接收（批量任务要么全部入队，要么整体拒绝），超限时抛出 QueueFullError
+
+        Args:
+            queued: 各优先级当前排队任务数
+            priorities: 批内各任务的优先级
+            workers: 工作协程数
+        """
+        projected = dict(queued)
+        for priority in sorted(priorities):
+            self._check(projected, priority, workers)
+            projected[priority] = projected.get(priority, 0) + 1
+        with self._lock:
+            self.stats["admitted"] += len(priorities)
+
+    def _check(self, queued: Dict[int, int], priority: int, workers: int):
+        workers = max(1, workers)
+        depth = sum(queued.values())
+
+        if self.max_depth and depth >= self.max_depth:
+            # 需要排空的超额任务数 × 平均耗时 / 并行度
+            excess = depth - self.max_depth + 1
+            retry_after = excess * self._service_seconds[PRIORITY_STANDARD] / workers
+            self._reject()
+            raise QueueFullError(
+                f"任务队列已满（{depth}/{self.max_depth}）",
+                _retry_seconds(retry_after)
+            )
+
+        wait = self.estimate_wait(queued, priority, workers)
+        if self.max_wait_seconds and wait > self.max_wait_seconds:
+            self._reject()
+            raise QueueFullError(
+                f"预计等待 {wait:.0f} 秒，超过上限 {self.max_wait_seconds:.0f} 秒",
+                _retry_seconds(wait - self.max_wait_seconds)
+            )
+
+    def _reject(self):
+        with self._lock:
+            self.stats["rejected"] += 1
+
+    def get_stats(self, queued: Optional[Dict[int, int]] = None, workers: int = 1) -> Dict[str, Any]:
+        """准入统计：各优先级排队数、平均耗时和预计等待时间"""
+        result: Dict[str, Any] = {
+            "max_depth": self.max_depth,
+            "max_wait_seconds": self.max_wait_seconds,
+            **self.stats,
+            "classes": {}
+        }
+        for level, name in PRIORITY_NAMES.items():
+            entry = {
+                "service_seconds": round(self._service_seconds[level], 1),
+                "samples": self._samples[level]
+            }
+            if queued is not None:
+                entry["queued"] = queued.get(level, 0)
+                entry["estimated_wait"] = round(self.estimate_wait(queued, level, workers), 1)
+            result["classes"][name] = entry
+        return result
+
+
+def _retry_seconds(seconds: float) -> int:
+    return max(1, int(math.ceil(seconds)))
+
+
+admission_controller = AdmissionController(
+    max_depth=settings.task_queue_max_depth,
+    max_wait_seconds=settings.task_queue_max_wait_seconds
+)
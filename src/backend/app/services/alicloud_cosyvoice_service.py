@@ -23,10 +23,42 @@ from ..models.podcast import PodcastScript, CharacterRole, ScriptDialogue
 from ..core.config import settings
 from ..utils.text_cleaner import clean_for_tts
 from .voice_resolver_service import voice_resolver
+from .tts_singleflight import tts_singleflight
+from .adaptive_limiter import limiter_registry
+from .engine_router import engine_router
+from .retry_policy import RetryPolicy
+from .audio_process_pool import audio_process_pool
+from .task_checkpoint import TaskCheckpoint, get_task_checkpoint
+from .task_context import report_progress
+from .task_progress import PROGRESS_SEGMENTS
 
 logger = logging.getLogger(__name__)
 
 
+def _is_invalid_parameter(error: BaseException) -> bool:
+    """418错误（参数无效）：重试无意义"""
+    message = str(error)
+    return "418" in message or "InvalidParameter" in message
+
+
+def _is_connection_issue(error: BaseException) -> bool:
+    """仅连接类异常值得重试"""
+    if _is_invalid_parameter(error):
+        return False
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    message = str(error).lower()
+    return any(
+        keyword in message
+        for keyword in [
+            "websocket closed",
+            "connection to remote host was lost",
+            "connection reset",
+            "timeout"
+        ]
+    )
+
+
 class AliCloudCosyVoiceService:
     """阿里云百炼 CosyVoice 语音合成服务"""
 
@@ -136,21 +168,37 @@ class AliCloudCosyVoiceService:
         if cleaned_text != text:
             logger.info(f"文本清理: [{text[:50]}...] -> [{cleaned_text[:50]}...]")
 
-        max_retries = 3
-        last_error: Optional[Exception] = None
-
-        for attempt in range(1, max_retries + 1):
-            try:
-                # 记录请求参数，方便排查问题
-                logger.info(f"[CosyVoice] 请求参数: model={self.model}, voice={voice}, text_length={len(cleaned_text)}")
-
+        # 记录单句耗时和结果，供引擎路由使用
+        async with engine_router.track("cosyvoice", voice, cleaned_text) as tracker:
+            # 单飞去重：相同音色和文本的并发请求共享一次上游调用
+            flight_key = tts_singleflight.make_key("cosyvoice", voice, None, cleaned_text)
+            success, audio_data = await tts_singleflight.run(
+                flight_key,
+                lambda: self._call_with_retries(cleaned_text, voice)
+            )
+            if not success:
+                tracker.mark_failed()
+        return success, audio_data
+
+    async def _call_with_retries(self, cleaned_text: str, voice: str) -> Tuple[bool, Optional[bytes]]:
+        """调用CosyVoice合成接口（统一重试策略，仅连接异常时重试）"""
+        async def call_once(timeout: Optional[float]) -> bytes:
+            # 记录请求参数，方便排查问题
+            logger.info(f"[CosyVoice] 请求参数: model={self.model}, voice={voice}, text_length={len(cleaned_text)}")
+
+            # 并发数由自适应限制器控制，限流/断连时自动收缩
+            limiter = limiter_registry.get("cosyvoice", initial_limit=settings.tts_max_concurrency)
+            async with limiter.slot():
                 synthesizer = SpeechSynthesizer(
                     model=self.model,
                     voice=voice
                 )
 
                 # call为同步阻塞，放入线程池避免阻塞事件循环
-                audio_data = await asyncio.to_thread(synthesizer.call, cleaned_text)
+                audio_data = await asyncio.wait_for(
+                    asyncio.to_thread(synthesizer.call, cleaned_text),
+                    timeout=timeout
+                )
 
                 # 检查返回的音频数据是否有效
                 if audio_data is None:
@@ -164,52 +212,36 @@ class AliCloudCosyVoiceService:
                     logger.error(f"❌ {error_msg}")
                     raise ValueError(error_msg)
 
-                logger.info(
-                    f'[Metric] requestId: {synthesizer.get_last_request_id()}, '
-                    f'首包延迟: {synthesizer.get_first_package_delay()}ms'
-                )
-                logger.info(f"✅ CosyVoice音频���成成功，数据大小: {len(audio_data)} bytes")
-                return True, audio_data
-
-            except Exception as error:  # noqa: BLE001 - 需捕捉SDK内部异常
-                last_error = error
-                message = str(error)
-
-                # 检查是否是418错误（参数无效）
-                if "418" in message or "InvalidParameter" in message:
-                    logger.error(f"❌ CosyVoice参数错误 (418): {message}")
-                    logger.error(f"   可能的原因:")
-                    logger.error(f"   1. 音色ID '{voice}' 不正确或不支持")
-                    logger.error(f"   2. 文本内容有问题: {cleaned_text[:100]}")
-                    logger.error(f"   3. 模型 '{self.model}' 配置错误")
-                    logger.error(f"   建议检查 .env 中的 COSYVOICE_MODEL 和音色配置")
-                    # 418错误不重试，直接失败
-                    break
-
-                connection_issue = any(
-                    keyword in message.lower()
-                    for keyword in [
-                        "websocket closed",
-                        "connection to remote host was lost",
-                        "connection reset",
-                        "timeout"
-                    ]
-                )
-
-                if attempt < max_retries and connection_issue:
-                    logger.warning(
-                        f"⚠️ CosyVoice连接异常，准备重试 {attempt}/{max_retries}: {message}"
-                    )
-                    await asyncio.sleep(1 * attempt)
-                    continue
-
-                logger.error(f"❌ CosyVoice音频合成失败: {message}")
-                logger.error(f"错误详情: {repr(error)}")
-                import traceback
-                logger.error(traceback.format_exc())
-                break
+            logger.info(
+                f'[Metric] requestId: {synthesizer.get_last_request_id()}, '
+                f'首包延迟: {synthesizer.get_first_package_delay()}ms'
+            )
+            return audio_data
 
-        return False, None
+        policy = RetryPolicy("cosyvoice", max_attempts=3, call_timeout=120)
+        try:
+            audio_data = await policy.run(call_once, retry_on=_is_connection_issue)
+            logger.info(f"✅ CosyVoice音频合成成功，数据大小: {len(audio_data)} bytes")
+            return True, audio_data
+
+        except Exception as error:  # noqa: BLE001 - 需捕捉SDK内部异常
+            message = str(error)
+
+            # 检查是否是418错误（参数无效）
+            if _is_invalid_parameter(error):
+                logger.error(f"❌ CosyVoice参数错误 (418): {message}")
+                logger.error(f"   可能的原因:")
+                logger.error(f"   1. 音色ID '{voice}' 不正确或不支持")
+                logger.error(f"   2. 文本内容有问题: {cleaned_text[:100]}")
+                logger.error(f"   3. 模型 '{self.model}' 配置错误")
+                logger.error(f"   建议检查 .env 中的 COSYVOICE_MODEL 和音色配置")
+                return False, None
+
+            logger.error(f"❌ CosyVoice音频合成失败: {message}")
+            logger.error(f"错误详情: {repr(error)}")
+            import traceback
+            logger.error(traceback.format_exc())
+            return False, None
 
     async def synthesize_script_audio(self, script: PodcastScript, characters: List[CharacterRole],
                                      task_id: str, atmosphere: str = "轻松幽默",
@@ -227,62 +259,75 @@ class AliCloudCosyVoiceService:
             character_voices[char.name] = self.get_voice_for_character(char.voice_description)
             logger.info(f"角色 {char.name} 使用音色: {character_voices[char.name]}")
 
-        # 合成每个对话片段
-        audio_segments = []
+        # 并发合成每个对话片段（并发上限由自适应限制器控制），按原顺序拼接
+        checkpoint = get_task_checkpoint()
 
-        for i, dialogue in enumerate(script.dialogues):
+        async def process_segment(index: int, dialogue) -> Optional[AudioSegment]:
             voice = character_voices.get(dialogue.character_name, self.default_voice)
 
             try:
+                # 检查点中已有该句音频（进程重启前已合成）
+                segment_key = TaskCheckpoint.segment_key(voice, dialogue.content)
+                saved_path = checkpoint.get_segment(index, segment_key) if checkpoint else None
+                if saved_path:
+                    return AudioSegment.from_file(saved_path, format="mp3")
+
                 # 合成音频，直接获取音频数据
                 success, audio_data = await self.synthesize_single_audio(
-                    text=dialogue.content,
+                    text=dialogue.tts_text(),
                     voice=voice
                 )
 
                 if success and audio_data:
-                    segment = AudioSegment.from_file(io.BytesIO(audio_data), format="mp3")
-                    audio_segments.append(segment)
-                    logger.info(f"成功合成片段 {i+1}/{len(script.dialogues)}")
-                else:
-                    logger.error(f"片段 {i} 合成失败")
+                    # MP3解码会同步调用ffmpeg，放到线程中执行
+                    segment = await asyncio.to_thread(AudioSegment.from_file, io.BytesIO(audio_data), format="mp3")
+                    if checkpoint:
+                        # 启用检查点时落盘，重启后无需重新合成
+                        segment_path = os.path.join(task_dir, f"segment_{index:03d}.mp3")
+                        with open(segment_path, "wb") as f:
+                            f.write(audio_data)
+                        checkpoint.record_segment(index, segment_key, segment_path)
+                    logger.info(f"成功合成片段 {index+1}/{len(script.dialogues)}")
+                    return segment
+
+                logger.error(f"片段 {index} 合成失败")
+                return None
 
             except Exception as e:
-                logger.error(f"片段 {i} 合成异常: {str(e)}")
+                logger.error(f"片段 {index} 合成异常: {str(e)}")
                 logger.error(f"错误详情: {repr(e)}")
                 import traceback
                 logger.error(traceback.format_exc())
-                continue
+                return None
 
-        if not audio_segments:
-            raise Exception("所有音频片段合成失败")
+        completed = 0
+        report_progress(PROGRESS_SEGMENTS, 0, len(script.dialogues))
 
-        # 拼接音频
-        combined = AudioSegment.empty()
-
-        for i, segment in enumerate(audio_segments):
-            if i > 0:
-                # 添加800ms停顿
-                pause = AudioSegment.silent(duration=800)
-                combined += pause
+        async def tracked_segment(index: int, dialogue) -> Optional[AudioSegment]:
+            nonlocal completed
+            try:
+                return await process_segment(index, dialogue)
+            finally:
+                completed += 1
+                report_progress(PROGRESS_SEGMENTS, completed, len(script.dialogues))
 
-            combined += segment
+        results = await asyncio.gather(
+            *[tracked_segment(i, dialogue) for i, dialogue in enumerate(script.dialogues)]
+        )
+        audio_segments = [segment for segment in results if segment is not None]
 
-        # 保存最终音频
-        final_path = os.path.join(task_dir, f"podcast_{task_id}.mp3")
+        if not audio_segments:
+            raise Exception("所有音频片段合成失败")
 
-        try:
-            # 尝试导出为MP3（需要FFmpeg）
-            combined.export(final_path, format="mp3", bitrate="192k")
-            logger.info(f"✅ 音频导出为MP3格式")
-        except Exception as e:
-            # 如果FFmpeg不可用，回退到WAV格式
-            logger.warning(f"MP3导出失败（可能缺少FFmpeg）: {e}")
-            logger.info("回退到WAV格式")
-            final_path = os.path.join(task_dir, f"podcast_{task_id}.wav")
-            combined.export(final_path, format="wav")
+        # 在音频进程池中拼接（片段间800ms停顿）并导出，MP3导出失败（可能缺少FFmpeg）时回退到WAV格式
+        final_path = await audio_process_pool.concat_segments(
+            audio_segments,
+            os.path.join(task_dir, f"podcast_{task_id}.mp3"),
+            pause_duration=800,
+            fallback_format="wav"
+        )
 
-        total_duration = len(combined) // 1000
+        total_duration = (sum(len(segment) for segment in audio_segments) + 800 * (len(audio_segments) - 1)) // 1000
         logger.info(f"✅ CosyVoice播客音频生成完成: {final_path} (时长: {total_duration}秒)")
 
         return final_path
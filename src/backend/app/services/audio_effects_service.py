@@ -5,6 +5,8 @@ from pydub import AudioSegment
 from pydub.effects import normalize, compress_dynamic_range
 import logging
 
+from ..utils.keyword_matcher import get_matcher
+
 logger = logging.getLogger(__name__)
 
 class AudioEffectsService:
@@ -116,10 +118,10 @@ class AudioEffectsService:
         effects = []
 
         # 基于内容的音效检测
-        content_lower = content.lower()
-        for trigger, effect_type in self.effect_rules["content_triggers"].items():
-            if trigger in content_lower or trigger in content:
-                effects.append(effect_type)
+        content_triggers = self.effect_rules["content_triggers"]
+        matcher = get_matcher(tuple(content_triggers), ignore_case=True)
+        for trigger in matcher.matched(content):
+            effects.append(content_triggers[trigger])
 
         # 基于情感的音效
         if emotion:
@@ -0,0 +1,291 @@
+"""
+音频后处理进程池
+将音效叠加、母带处理、BGM混音和最终导出等CPU密集型步骤移出事件循环线程，
+PCM数据通过共享内存传递给子进程，避免大块音频数据的pickle序列化。
+不做母带处理的引擎（简单拼接 + 固定停顿）和占位符音频同样在进程池中拼接导出，
+已落盘的片段直接把文件路径交给子进程解码
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from multiprocessing import shared_memory
+from typing import List, Optional, Tuple
+
+from pydub import AudioSegment
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# (偏移, 字节数, 采样宽度, 采样率, 声道数)
+SegmentMeta = Tuple[int, int, int, int, int]
+
+# 子进程内复用的音效服务实例
+_worker_effects_service = None
+
+
+def _get_worker_effects_service():
+    """获取子进程内的音效服务（每个进程只初始化一次）"""
+    global _worker_effects_service
+    if _worker_effects_service is None:
+        from .audio_effects_service import AudioEffectsService
+        _worker_effects_service = AudioEffectsService()
+    return _worker_effects_service
+
+
+def _pack_segments(segments: List[AudioSegment]) -> Tuple[shared_memory.SharedMemory, List[SegmentMeta]]:
+    """将音频片段的PCM数据写入一块共享内存"""
+    total_size = sum(len(segment.raw_data) for segment in segments)
+    shm = shared_memory.SharedMemory(create=True, size=max(total_size, 1))
+
+    metas: List[SegmentMeta] = []
+    offset = 0
+    for segment in segments:
+        raw = segment.raw_data
+        shm.buf[offset:offset + len(raw)] = raw
+        metas.append((offset, len(raw), segment.sample_width, segment.frame_rate, segment.channels))
+        offset += len(raw)
+
+    return shm, metas
+
+
+def _unpack_segments(shm_name: str, metas: List[SegmentMeta]) -> List[AudioSegment]:
+    """从共享内存还原音频片段"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        # 共享内存由父进程负责释放，子进程不应被resource_tracker登记
+        if multiprocessing.parent_process() is not None:
+            try:
+                from multiprocessing import resource_tracker
+                resource_tracker.unregister(shm._name, "shared_memory")
+            except Exception:
+                pass
+
+        return [
+            AudioSegment(
+                data=bytes(shm.buf[offset:offset + length]),
+                sample_width=sample_width,
+                frame_rate=frame_rate,
+                channels=channels
+            )
+            for offset, length, sample_width, frame_rate, channels in metas
+        ]
+    finally:
+        shm.close()
+
+
+def _render_podcast_master(shm_name: str, metas: List[SegmentMeta],
+                           segment_effects: List[List[str]], pause_durations: List[int],
+                           atmosphere: str, enable_bgm: bool, output_path: str) -> str:
+    """子进程入口：音效叠加 -> 拼接 -> 母带处理 -> BGM -> 导出"""
+    audio_effects = _get_worker_effects_service()
+    segments = _unpack_segments(shm_name, metas)
+
+    # 片段级音效
+    for i, effects in enumerate(segment_effects):
+        if effects:
+            segments[i] = audio_effects.add_effects_to_segment(segments[i], effects)
+
+    # 开场和结尾音效
+    intro_audio, outro_audio = audio_effects.create_intro_outro(atmosphere=atmosphere)
+
+    combined = AudioSegment.empty()
+    if intro_audio:
+        combined += intro_audio
+
+    for i, segment in enumerate(segments):
+        if i > 0:
+            combined += audio_effects.generate_silence_with_ambience(
+                duration=pause_durations[i],
+                atmosphere="studio"
+            )
+        combined += segment
+
+    if outro_audio:
+        combined += outro_audio
+
+    # 专业级后处理
+    combined = audio_effects.apply_professional_mastering(combined)
+
+    # 背景音乐
+    if enable_bgm:
+        combined = audio_effects.add_background_music(
+            audio=combined,
+            atmosphere=atmosphere,
+            fade_in_duration=3000,
+            fade_out_duration=3000
+        )
+
+    combined.export(output_path, format="mp3", bitrate="192k")
+    return output_path
+
+
+def _concat_and_export(segments: List[AudioSegment], pause_duration: int, output_path: str,
+                       normalize: bool, bitrate: Optional[str], fallback_format: Optional[str]) -> str:
+    """按顺序拼接片段（片段间插入固定停顿）-> 可选音量标准化 -> 导出MP3（失败时可改用备用格式）"""
+    combined = AudioSegment.empty()
+    for i, segment in enumerate(segments):
+        if i > 0 and pause_duration > 0:
+            combined += AudioSegment.silent(duration=pause_duration)
+        combined += segment
+
+    if normalize:
+        combined = combined.normalize()
+
+    export_args = {"bitrate": bitrate} if bitrate else {}
+    try:
+        combined.export(output_path, format="mp3", **export_args)
+    except Exception:
+        if not fallback_format:
+            raise
+        # MP3导出失败（通常是缺少FFmpeg）时改用备用格式
+        output_path = f"{os.path.splitext(output_path)[0]}.{fallback_format}"
+        combined.export(output_path, format=fallback_format)
+    return output_path
+
+
+def _render_concat_segments(shm_name: str, metas: List[SegmentMeta], pause_duration: int, output_path: str,
+                            normalize: bool, bitrate: Optional[str], fallback_format: Optional[str]) -> str:
+    """子进程入口：拼接共享内存中的片段并导出"""
+    segments = _unpack_segments(shm_name, metas)
+    return _concat_and_export(segments, pause_duration, output_path, normalize, bitrate, fallback_format)
+
+
+def _render_concat_files(audio_files: List[str], pause_duration: int, output_path: str,
+                         normalize: bool, bitrate: Optional[str], fallback_format: Optional[str]) -> str:
+    """子进程入口：解码并拼接已落盘的片段文件后导出（不存在的文件跳过）"""
+    segments = [AudioSegment.from_file(path) for path in audio_files if os.path.exists(path)]
+    return _concat_and_export(segments, pause_duration, output_path, normalize, bitrate, fallback_format)
+
+
+def _render_placeholder(durations: List[int], pause_duration: int, output_path: str) -> str:
+    """子进程入口：生成占位符音频（每段一个提示音 + 按时长补足的静音）"""
+    from pydub.generators import Sine
+
+    segments = []
+    for duration in durations:
+        tone = Sine(440).to_audio_segment(duration=300)  # 300ms提示音
+        segment = tone + AudioSegment.silent(duration=max(duration - 300, 0))
+        segments.append(segment.fade_in(50).fade_out(50) - 15)
+    return _concat_and_export(segments, pause_duration, output_path, False, "128k", None)
+
+
+class AudioProcessPool:
+    """音频后处理进程池（与API worker数量独立配置）"""
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max(0, max_workers)
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.max_workers == 0:
+            return None
+
+        if self._executor is None:
+            # 使用spawn，避免fork带有事件循环和线程的主进程
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            logger.info(f"音频后处理进程池已启动: {self.max_workers} 个进程")
+        return self._executor
+
+    async def render_master(self, segments: List[AudioSegment], segment_effects: List[List[str]],
+                            pause_durations: List[int], atmosphere: str, enable_bgm: bool,
+                            output_path: str) -> str:
+        """在进程池中完成整段播客的后处理并导出
+
+        Args:
+            segments: 已合成的对话片段
+            segment_effects: 每个片段需要叠加的音效类型
+            pause_durations: 每个片段前的停顿时长（毫秒，第一个忽略）
+            atmosphere: 播客氛围（用于开场/结尾音效和BGM）
+            enable_bgm: 是否混入背景音乐
+            output_path: 最终MP3输出路径
+
+        Returns:
+            输出文件路径
+        """
+        shm, metas = _pack_segments(segments)
+        try:
+            return await self._run(partial(
+                _render_podcast_master,
+                shm.name, metas, segment_effects, pause_durations,
+                atmosphere, enable_bgm, output_path
+            ))
+        finally:
+            shm.close()
+            shm.unlink()
+
+    async def concat_segments(self, segments: List[AudioSegment], output_path: str, pause_duration: int = 500,
+                              normalize: bool = False, bitrate: Optional[str] = "192k",
+                              fallback_format: Optional[str] = None) -> str:
+        """在进程池中拼接内存中的片段并导出（不叠加音效和母带处理）
+
+        Args:
+            segments: 已合成的对话片段
+            output_path: 最终MP3输出路径
+            pause_duration: 片段间停顿（毫秒）
+            normalize: 是否标准化音量
+            bitrate: MP3码率，None时使用ffmpeg默认值
+            fallback_format: MP3导出失败时改用的格式（如 wav），None时直接抛出异常
+
+        Returns:
+            实际输出的文件路径（改用备用格式时扩展名不同）
+        """
+        shm, metas = _pack_segments(segments)
+        try:
+            return await self._run(partial(
+                _render_concat_segments,
+                shm.name, metas, pause_duration, output_path, normalize, bitrate, fallback_format
+            ))
+        finally:
+            shm.close()
+            shm.unlink()
+
+    async def concat_files(self, audio_files: List[str], output_path: str, pause_duration: int = 500,
+                           normalize: bool = False, bitrate: Optional[str] = "192k",
+                           fallback_format: Optional[str] = None) -> str:
+        """在进程池中解码、拼接已落盘的片段文件并导出（参数同 concat_segments）"""
+        return await self._run(partial(
+            _render_concat_files,
+            list(audio_files), pause_duration, output_path, normalize, bitrate, fallback_format
+        ))
+
+    async def render_placeholder(self, durations: List[int], output_path: str, pause_duration: int = 800) -> str:
+        """在进程池中生成占位符音频（所有TTS方案都失败时使用）
+
+        Args:
+            durations: 每段对话的占位时长（毫秒）
+            output_path: 最终MP3输出路径
+            pause_duration: 片段间停顿（毫秒）
+        """
+        return await self._run(partial(_render_placeholder, list(durations), pause_duration, output_path))
+
+    async def _run(self, job) -> str:
+        """在进程池中执行任务；进程池不可用时退回线程池，至少不阻塞事件循环"""
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        if executor is not None:
+            try:
+                return await loop.run_in_executor(executor, job)
+            except BrokenProcessPool as pool_error:
+                logger.error(f"音频进程池异常，重建后改用线程执行: {pool_error}")
+                self._executor = None
+
+        return await loop.run_in_executor(None, job)
+
+    def shutdown(self):
+        """关闭进程池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            logger.info("音频后处理进程池已关闭")
+
+
+audio_process_pool = AudioProcessPool(settings.audio_process_workers)
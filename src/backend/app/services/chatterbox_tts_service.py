@@ -13,7 +13,13 @@ from pydub import AudioSegment
 from ..models.podcast import PodcastScript, CharacterRole, ScriptDialogue
 from ..core.config import settings
 from .audio_effects_service import AudioEffectsService
+from .audio_process_pool import audio_process_pool
 from .voice_resolver_service import voice_resolver
+from .tts_singleflight import tts_singleflight
+from .engine_router import engine_router
+from .task_checkpoint import TaskCheckpoint, get_task_checkpoint, discard_segment_file
+from .task_context import report_progress
+from .task_progress import PROGRESS_SEGMENTS
 
 logger = logging.getLogger(__name__)
 
@@ -141,8 +147,6 @@ class ChatterboxTTSService:
             temp_file.close()
 
         try:
-            import torchaudio as ta
-
             # 自动检测语言
             if language == 'auto':
                 language = self.detect_language(text)
@@ -152,45 +156,75 @@ class ChatterboxTTSService:
             if emotion:
                 exaggeration, cfg_weight = self._adjust_params_for_emotion(emotion)
 
-            # 选择模型
-            if language == 'en':
-                # 英文使用专用模型
-                if voice_sample_path and os.path.exists(voice_sample_path):
-                    wav = self.model.generate(
-                        text,
-                        audio_prompt_path=voice_sample_path
-                    )
-                else:
-                    wav = self.model.generate(text)
-            else:
-                # 其他语言使用多语言模型
-                if voice_sample_path and os.path.exists(voice_sample_path):
-                    wav = self.multilingual_model.generate(
-                        text,
-                        language_id=language,
-                        audio_prompt_path=voice_sample_path,
-                        exaggeration=exaggeration,
-                        cfg_weight=cfg_weight
-                    )
-                else:
-                    wav = self.multilingual_model.generate(
-                        text,
-                        language_id=language,
-                        exaggeration=exaggeration,
-                        cfg_weight=cfg_weight
+            # 记录单句耗时和结果，供引擎路由使用
+            async with engine_router.track("chatterbox", voice_sample_path or "", text):
+                # 单飞去重：生成参数一并纳入情感维度，保证共享结果完全一致
+                flight_key = tts_singleflight.make_key(
+                    "chatterbox",
+                    voice_sample_path,
+                    f"{emotion or ''}|{language}|{exaggeration}|{cfg_weight}",
+                    text
+                )
+                return await tts_singleflight.run_to_file(
+                    flight_key,
+                    output_path,
+                    lambda path: asyncio.to_thread(
+                        self._generate_to_file, text, voice_sample_path,
+                        language, exaggeration, cfg_weight, path
                     )
-
-            # 保存音频
-            sample_rate = self.model.sr if language == 'en' else self.multilingual_model.sr
-            ta.save(output_path, wav, sample_rate)
-
-            logger.info(f"✅ 音频合成成功: {output_path}")
-            return output_path
+                )
 
         except Exception as e:
             logger.error(f"音频合成失败: {str(e)}")
             raise Exception(f"Chatterbox TTS 合成失败: {str(e)}")
 
+    def _generate_to_file(
+        self,
+        text: str,
+        voice_sample_path: Optional[str],
+        language: str,
+        exaggeration: float,
+        cfg_weight: float,
+        output_path: str
+    ) -> str:
+        """执行模型推理并保存音频（同步，在线程池中运行）"""
+        import torchaudio as ta
+
+        # 选择模型
+        if language == 'en':
+            # 英文使用专用模型
+            if voice_sample_path and os.path.exists(voice_sample_path):
+                wav = self.model.generate(
+                    text,
+                    audio_prompt_path=voice_sample_path
+                )
+            else:
+                wav = self.model.generate(text)
+        else:
+            # 其他语言使用多语言模型
+            if voice_sample_path and os.path.exists(voice_sample_path):
+                wav = self.multilingual_model.generate(
+                    text,
+                    language_id=language,
+                    audio_prompt_path=voice_sample_path,
+                    exaggeration=exaggeration,
+                    cfg_weight=cfg_weight
+                )
+            else:
+                wav = self.multilingual_model.generate(
+                    text,
+                    language_id=language,
+                    exaggeration=exaggeration,
+                    cfg_weight=cfg_weight
+                )
+
+        # 保存音频
+        sample_rate = self.model.sr if language == 'en' else self.multilingual_model.sr
+        ta.save(output_path, wav, sample_rate)
+
+        logger.info(f"✅ 音频合成成功: {output_path}")
+        return output_path
+
     def _adjust_params_for_emotion(self, emotion: str) -> tuple:
         """
         根据情感调整生成参数
@@ -272,28 +306,38 @@ class ChatterboxTTSService:
         main_language = self.detect_language(all_text)
         logger.info(f"播客主要语言: {main_language}")
 
-        # 合成每个对话片段
+        # 合成每个对话片段（音效只做分析，实际叠加在进程池中完成）
         audio_segments = []
+        segment_effects = []
+        checkpoint = get_task_checkpoint()
 
         for i, dialogue in enumerate(script.dialogues):
+            report_progress(PROGRESS_SEGMENTS, i, len(script.dialogues))
             voice_sample_path = character_voice_samples.get(dialogue.character_name)
             output_path = os.path.join(task_dir, f"segment_{i:03d}.wav")
 
             try:
-                # 合成音频
-                result_path = await self.synthesize_single_audio(
-                    text=dialogue.content,
-                    voice_sample_path=voice_sample_path,
-                    language=main_language,
-                    emotion=dialogue.emotion,
-                    output_path=output_path
-                )
+                # 检查点中已有该句音频时直接复用（进程重启前已合成）
+                segment_key = TaskCheckpoint.segment_key(f"{voice_sample_path}|{main_language}|{dialogue.emotion}", dialogue.content)
+                result_path = checkpoint.get_segment(i, segment_key) if checkpoint else None
+                if not result_path:
+                    # 合成音频
+                    result_path = await self.synthesize_single_audio(
+                        text=dialogue.content,
+                        voice_sample_path=voice_sample_path,
+                        language=main_language,
+                        emotion=dialogue.emotion,
+                        output_path=output_path
+                    )
+                    if checkpoint and result_path and os.path.exists(result_path):
+                        checkpoint.record_segment(i, segment_key, result_path)
 
                 if result_path and os.path.exists(result_path):
                     # 加载音频
                     segment = AudioSegment.from_wav(result_path)
 
-                    # 添加音效
+                    # 分析音效
+                    effects = []
                     if enable_effects:
                         position = None
                         if i == 0:
@@ -306,27 +350,26 @@ class ChatterboxTTSService:
                             emotion=dialogue.emotion,
                             position=position
                         )
-                        segment = self.audio_effects.add_effects_to_segment(segment, effects)
 
                     audio_segments.append(segment)
+                    segment_effects.append(effects)
                     logger.info(f"成功合成片段 {i}: {dialogue.character_name}")
 
-                    # 清理临时文件
-                    try:
-                        os.remove(result_path)
-                    except:
-                        pass
+                    # 清理临时文件（启用检查点时由任务完成时统一清理）
+                    discard_segment_file(result_path)
 
             except Exception as e:
                 logger.error(f"片段合成失败 {i}: {dialogue.character_name} - {str(e)}")
                 continue
 
+        report_progress(PROGRESS_SEGMENTS, len(script.dialogues), len(script.dialogues))
+
         if not audio_segments:
             raise Exception("所有音频片段合成失败")
 
         # 拼接音频
         final_audio = await self._concatenate_audio_with_effects(
-            audio_segments, task_dir, task_id, atmosphere, enable_bgm
+            audio_segments, task_dir, task_id, atmosphere, enable_bgm, segment_effects
         )
 
         return final_audio
@@ -337,48 +380,25 @@ class ChatterboxTTSService:
         task_dir: str,
         task_id: str,
         atmosphere: str,
-        enable_bgm: bool
+        enable_bgm: bool,
+        segment_effects: Optional[List[List[str]]] = None
     ) -> str:
-        """拼接音频并应用效果"""
+        """拼接音频并应用效果（在音频进程池中执行）"""
         try:
-            # 生成开场和结尾
-            intro_audio, outro_audio = self.audio_effects.create_intro_outro(atmosphere=atmosphere)
-
-            # 拼接
-            combined = AudioSegment.empty()
-
-            if intro_audio:
-                combined += intro_audio
-
-            # 添加对话片段
-            for i, segment in enumerate(audio_segments):
-                if i > 0:
-                    pause_duration = 800 if i % 3 != 0 else 1200
-                    pause = self.audio_effects.generate_silence_with_ambience(
-                        duration=pause_duration,
-                        atmosphere="studio"
-                    )
-                    combined += pause
-                combined += segment
-
-            if outro_audio:
-                combined += outro_audio
-
-            # 专业后处理
-            combined = self.audio_effects.apply_professional_mastering(combined)
-
-            # 添加BGM
-            if enable_bgm:
-                combined = self.audio_effects.add_background_music(
-                    audio=combined,
-                    atmosphere=atmosphere,
-                    fade_in_duration=3000,
-                    fade_out_duration=3000
-                )
+            pause_durations = [
+                (800 if i % 3 != 0 else 1200) if i > 0 else 0
+                for i in range(len(audio_segments))
+            ]
 
-            # 保存
             final_path = os.path.join(task_dir, f"podcast_{task_id}.mp3")
-            combined.export(final_path, format="mp3", bitrate="192k")
+            await audio_process_pool.render_master(
+                segments=audio_segments,
+                segment_effects=segment_effects or [[] for _ in audio_segments],
+                pause_durations=pause_durations,
+                atmosphere=atmosphere,
+                enable_bgm=enable_bgm,
+                output_path=final_path
+            )
 
             logger.info(f"完成 Chatterbox TTS 音频处理: {final_path}")
             return final_path
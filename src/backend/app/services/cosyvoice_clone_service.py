@@ -16,6 +16,7 @@ from urllib import parse
 import aiohttp
 
 from ..core.config import settings
+from ..core.http_clients import http_clients
 
 logger = logging.getLogger(__name__)
 
@@ -136,7 +137,7 @@ class CosyVoiceCloneService:
             full_url = f"{self.api_endpoint}?Signature={signature}&{query_string}"
 
             # 发送请求
-            async with aiohttp.ClientSession() as session:
+            async with http_clients.session() as session:
                 async with session.post(full_url, timeout=aiohttp.ClientTimeout(total=30)) as response:
                     response_text = await response.text()
                     logger.info(f"CosyVoice 克隆 API 响应: {response_text}")
@@ -225,7 +226,7 @@ class CosyVoiceCloneService:
             full_url = f"{self.api_endpoint}?Signature={signature}&{query_string}"
 
             # 发送请求
-            async with aiohttp.ClientSession() as session:
+            async with http_clients.session() as session:
                 async with session.post(full_url, timeout=aiohttp.ClientTimeout(total=10)) as response:
                     response_text = await response.text()
                     logger.info(f"CosyVoice 列表 API 响应: {response_text}")
@@ -0,0 +1,182 @@
+"""
+TTS引擎路由
+按（引擎, 音色族）维护滚动的延迟分位数、错误率和合成速度（字/秒），
+为每个任务选择当前最快且能还原所需音色的引擎，替代固定的优先级顺序
+"""
+
+import logging
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+from ..core.config import settings
+from .voice_resolver_service import voice_resolver
+
+logger = logging.getLogger(__name__)
+
+# 引擎整体统计使用的音色族
+ALL_FAMILIES = "*"
+
+
+class _RollingStats:
+    """滚动窗口统计：每条样本为 (耗时秒, 字数, 是否成功)"""
+
+    def __init__(self, window: int):
+        self.samples: Deque[Tuple[float, int, bool]] = deque(maxlen=window)
+
+    def add(self, latency: float, chars: int, success: bool):
+        self.samples.append((latency, chars, success))
+
+    @property
+    def count(self) -> int:
+        return len(self.samples)
+
+    def _successes(self) -> List[Tuple[float, int, bool]]:
+        return [sample for sample in self.samples if sample[2]]
+
+    def latency_percentile(self, p: float) -> Optional[float]:
+        latencies = sorted(latency for latency, _, _ in self._successes())
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, max(0, int(round(p / 100 * (len(latencies) - 1)))))
+        return latencies[index]
+
+    def seconds_per_char_percentile(self, p: float) -> Optional[float]:
+        costs = sorted(latency / max(1, chars) for latency, chars, _ in self._successes())
+        if not costs:
+            return None
+        index = min(len(costs) - 1, max(0, int(round(p / 100 * (len(costs) - 1)))))
+        return costs[index]
+
+    def error_rate(self) -> float:
+        if not self.samples:
+            return 0.0
+        return sum(1 for _, _, ok in self.samples if not ok) / len(self.samples)
+
+    def chars_per_second(self) -> Optional[float]:
+        successes = self._successes()
+        total_time = sum(latency for latency, _, _ in successes)
+        if total_time <= 0:
+            return None
+        return sum(chars for _, chars, _ in successes) / total_time
+
+
+class _LineTracker:
+    """单句合成的结果标记（调用方可在不抛异常的失败路径上标记失败）"""
+
+    def __init__(self):
+        self.success = True
+
+    def mark_failed(self):
+        self.success = False
+
+
+class EngineRouter:
+    """基于滚动统计的TTS引擎路由器"""
+
+    def __init__(self, window: int = 200, min_samples: int = 5,
+                 explore_ratio: float = 0.1, error_penalty: float = 3.0):
+        self.window = window
+        self.min_samples = min_samples
+        self.explore_ratio = explore_ratio
+        self.error_penalty = error_penalty
+        self._stats: Dict[Tuple[str, str], _RollingStats] = {}
+
+    def _get_stats(self, engine: str, family: str) -> _RollingStats:
+        key = (engine, family)
+        if key not in self._stats:
+            self._stats[key] = _RollingStats(self.window)
+        return self._stats[key]
+
+    def record(self, engine: str, voice: str, chars: int, latency: float, success: bool):
+        """记录一次单句合成结果（同时计入引擎整体统计）"""
+        family = voice_resolver.get_voice_family(voice)
+        self._get_stats(engine, family).add(latency, chars, success)
+        self._get_stats(engine, ALL_FAMILIES).add(latency, chars, success)
+
+    def record_failure(self, engine: str):
+        """记录引擎级失败（如初始化/健康检查失败）"""
+        self._get_stats(engine, ALL_FAMILIES).add(0.0, 0, False)
+
+    @asynccontextmanager
+    async def track(self, engine: str, voice: str, text: str):
+        """统计单句合成耗时和结果：抛出异常或调用 mark_failed() 视为失败"""
+        tracker = _LineTracker()
+        started = time.monotonic()
+        try:
+            yield tracker
+        except Exception:
+            self.record(engine, voice, len(text or ""), time.monotonic() - started, False)
+            raise
+        else:
+            self.record(engine, voice, len(text or ""), time.monotonic() - started, tracker.success)
+
+    def score(self, engine: str, families: Sequence[str]) -> Optional[float]:
+        """引擎评分（越小越好）：尾部每字耗时(P95) × 错误率惩罚；样本不足返回None"""
+        overall = self._stats.get((engine, ALL_FAMILIES))
+        if overall is None or overall.count < self.min_samples:
+            return None
+
+        scores = []
+        for family in set(families) or {ALL_FAMILIES}:
+            stats = self._stats.get((engine, family))
+            # 该音色族样本不足时用引擎整体统计
+            if stats is None or stats.count < self.min_samples:
+                stats = overall
+
+            cost = stats.seconds_per_char_percentile(95)
+            if cost is None:
+                # 全部失败：排在所有有成功样本的引擎之后
+                return float("inf")
+            scores.append(cost * (1 + self.error_penalty * stats.error_rate()))
+
+        return sum(scores) / len(scores)
+
+    def rank(self, engines: Sequence[str], voices: Sequence[str]) -> List[str]:
+        """
+        对候选引擎排序：有统计的按评分从快到慢，样本不足的按配置顺序；
+        以 explore_ratio 的概率优先尝试样本不足的引擎，避免其永远得不到流量
+
+        Args:
+            engines: 候选引擎（已按配置优先级排列，且均能还原所需音色）
+            voices: 本任务用到的音色（描述或ID）
+
+        Returns:
+            排序后的引擎列表
+        """
+        families = [voice_resolver.get_voice_family(voice) for voice in voices]
+
+        measured: List[Tuple[float, int, str]] = []
+        unmeasured: List[str] = []
+        for priority, engine in enumerate(engines):
+            engine_score = self.score(engine, families)
+            if engine_score is None:
+                unmeasured.append(engine)
+            else:
+                measured.append((engine_score, priority, engine))
+
+        ordered_measured = [engine for _, _, engine in sorted(measured)]
+        if unmeasured and (not ordered_measured or random.random() < self.explore_ratio):
+            return unmeasured + ordered_measured
+        return ordered_measured + unmeasured
+
+    def get_stats(self) -> Dict[str, Any]:
+        """各（引擎, 音色族）的滚动统计"""
+        result: Dict[str, Any] = {}
+        for (engine, family), stats in self._stats.items():
+            p50 = stats.latency_percentile(50)
+            p95 = stats.latency_percentile(95)
+            cps = stats.chars_per_second()
+            result.setdefault(engine, {})[family] = {
+                "samples": stats.count,
+                "p50": round(p50, 3) if p50 is not None else None,
+                "p95": round(p95, 3) if p95 is not None else None,
+                "error_rate": round(stats.error_rate(), 3),
+                "chars_per_sec": round(cps, 2) if cps is not None else None
+            }
+        return result
+
+
+engine_router = EngineRouter(explore_ratio=settings.tts_routing_explore_ratio)
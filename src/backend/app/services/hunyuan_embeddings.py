@@ -7,6 +7,10 @@ from typing import List
 from langchain_core.embeddings import Embeddings
 import openai
 
+from ..core.http_clients import http_clients
+from .adaptive_limiter import limiter_registry
+from .task_context import raise_if_cancelled
+
 logger = logging.getLogger(__name__)
 
 
@@ -37,7 +41,8 @@ class HunyuanEmbeddings(Embeddings):
         # 创建 OpenAI 客户端
         self.client = openai.OpenAI(
             api_key=api_key,
-            base_url=base_url
+            base_url=base_url,
+            http_client=http_clients.get_sync_client(base_url)
         )
 
         logger.info(f"腾讯混元嵌入模型初始化: {model} (维度: {dimensions})")
@@ -67,13 +72,16 @@ class HunyuanEmbeddings(Embeddings):
             all_embeddings = []
 
             for i in range(0, len(valid_texts), batch_size):
+                # 所属任务已取消时不再发起后续批次
+                raise_if_cancelled()
                 batch = valid_texts[i:i + batch_size]
 
-                # 调用腾讯混元 API
-                response = self.client.embeddings.create(
-                    model=self.model,
-                    input=batch  # 腾讯混元支持字符串数组
-                )
+                # 调用腾讯混元 API（经自适应并发限制）
+                with limiter_registry.get("embeddings").slot_sync():
+                    response = self.client.embeddings.create(
+                        model=self.model,
+                        input=batch  # 腾讯混元支持字符串数组
+                    )
 
                 # 提取嵌入向量
                 batch_embeddings = [item.embedding for item in response.data]
@@ -102,10 +110,11 @@ class HunyuanEmbeddings(Embeddings):
 
         try:
             # 调用腾讯混元 API（单个文本也用列表格式）
-            response = self.client.embeddings.create(
-                model=self.model,
-                input=[text.strip()]  # 使用列表格式
-            )
+            with limiter_registry.get("embeddings").slot_sync():
+                response = self.client.embeddings.create(
+                    model=self.model,
+                    input=[text.strip()]  # 使用列表格式
+                )
 
             embedding = response.data[0].embedding
             logger.debug(f"成功嵌入查询文本: {text[:50]}...")
@@ -8,7 +8,7 @@ import os
 import ssl
 import logging
 import tempfile
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional
 from pydub import AudioSegment
 
 # 【关键修复】在导入gradio_client之前全局禁用SSL验证并配置WebSocket代理
@@ -27,49 +27,10 @@ try:
 except:
     pass
 
-# 【关键修复2】猴子补丁httpx，禁用SSL验证并支持HTTP/SOCKS5代理
-try:
-    import httpx
-
-    # 保存原始类
-    _original_httpx_client = httpx.Client
-    _original_httpx_async_client = httpx.AsyncClient
-
-    # 创建补丁后的Client类
-    class PatchedClient(httpx.Client):
-        def __init__(self, *args, **kwargs):
-            # 强制禁用SSL验证
-            kwargs['verify'] = False
-            # 如果环境变量中有代理配置，使用代理（支持HTTP和SOCKS5）
-            if 'HTTP_PROXY' in os.environ or 'HTTPS_PROXY' in os.environ:
-                proxy = os.environ.get('HTTPS_PROXY') or os.environ.get('HTTP_PROXY')
-                if proxy:
-                    # httpx支持统一代理字符串（http://、https://、socks5://）
-                    kwargs['proxies'] = proxy
-                    logger.info(f"httpx Client 使用代理: {proxy}")
-            super().__init__(*args, **kwargs)
-
-    class PatchedAsyncClient(httpx.AsyncClient):
-        def __init__(self, *args, **kwargs):
-            # 强制禁用SSL验证
-            kwargs['verify'] = False
-            # 如果环境变量中有代理配置，使用代理（支持HTTP和SOCKS5）
-            if 'HTTP_PROXY' in os.environ or 'HTTPS_PROXY' in os.environ:
-                proxy = os.environ.get('HTTPS_PROXY') or os.environ.get('HTTP_PROXY')
-                if proxy:
-                    # httpx支持统一代理字符串（http://、https://、socks5://）
-                    kwargs['proxies'] = proxy
-                    logger.info(f"httpx AsyncClient 使用代理: {proxy}")
-            super().__init__(*args, **kwargs)
-
-    # 替换httpx的Client类
-    httpx.Client = PatchedClient
-    httpx.AsyncClient = PatchedAsyncClient
-
-except Exception as e:
-    logging.warning(f"无法补丁httpx: {e}")
+# httpx的代理和SSL设置在创建Gradio Client时通过 httpx_kwargs / ssl_verify 传入，
+# 不再全局替换httpx类，以免影响其他服务共用的出站连接池
 
-# 【关键修复3】猴子补丁 websockets 库以支持代理
+# 【关键修复2】猴子补丁 websockets 库以支持代理
 # Gradio Client 使用 websockets 库，需要为其配置代理
 try:
     import websockets
@@ -96,9 +57,18 @@ from gradio_client import Client, handle_file
 from ..models.podcast import PodcastScript, CharacterRole, ScriptDialogue
 from ..core.config import settings
 from .audio_effects_service import AudioEffectsService
+from .audio_process_pool import audio_process_pool
 from .voice_sample_manager import voice_sample_manager
 from ..utils.text_cleaner import clean_for_tts
 from .voice_resolver_service import voice_resolver
+from .tts_singleflight import tts_singleflight
+from .tts_hedging import tts_hedger
+from .adaptive_limiter import limiter_registry
+from .engine_router import engine_router
+from .task_checkpoint import TaskCheckpoint, get_task_checkpoint, discard_segment_file
+from .task_context import report_progress
+from .task_progress import PROGRESS_SEGMENTS
+from .retry_policy import RetryPolicy
 
 logger = logging.getLogger(__name__)
 
@@ -108,6 +78,8 @@ class IndexTTS2GradioService:
 
     def __init__(self):
         self.client = None
+        self.hedge_client = None  # 对冲请求使用的备用客户端（按需创建）
+        self.httpx_config: Dict[str, Any] = {'timeout': 120.0}
         self.space_name = getattr(settings, 'indextts2_gradio_space', "IndexTeam/IndexTTS-2-Demo")
         self.initialized = False
         self.voice_samples_dir = "voice_samples"
@@ -221,47 +193,49 @@ class IndexTTS2GradioService:
         else:
             logger.warning("⚠️ 代理未启用，直接连接可能会超时")
 
-        last_error = None
-        for attempt in range(max_retries):
-            try:
-                logger.info(f"正在连接IndexTTS-2 Gradio服务: {self.space_name} (尝试 {attempt + 1}/{max_retries})")
-                logger.info(f"httpx配置: timeout={httpx_config['timeout']}s, proxy={httpx_config.get('proxies', 'None')}, ssl_verify=False")
+        # 备用客户端复用同样的连接配置
+        self.httpx_config = httpx_config
+
+        async def connect(timeout: Optional[float]):
+            logger.info(f"正在连接IndexTTS-2 Gradio服务: {self.space_name}")
+            logger.info(f"httpx配置: timeout={httpx_config['timeout']}s, proxy={httpx_config.get('proxies', 'None')}, ssl_verify=False")
 
-                # 【关键修复】创建客户端时传递 httpx_kwargs 和 ssl_verify
-                # Gradio Client会使用这些参数配置所有HTTP请求
-                self.client = Client(
+            # 【关键修复】创建客户端时传递 httpx_kwargs 和 ssl_verify
+            # Gradio Client会使用这些参数配置所有HTTP请求
+            # 构造时会同步拉取Space配置，放入线程池并受本次调用超时约束
+            return await asyncio.wait_for(
+                asyncio.to_thread(
+                    Client,
                     self.space_name,
                     httpx_kwargs=httpx_config,
                     ssl_verify=False,  # 禁用SSL证书验证
                     verbose=True
-                )
-                self.initialized = True
+                ),
+                timeout=timeout
+            )
 
-                logger.info("✅ IndexTTS-2 Gradio客户端初始化成功")
-                return True
+        # 统一重试策略：截止时间、抖动退避和全局重试预算
+        policy = RetryPolicy("indextts2_gradio_connect", max_attempts=max_retries, call_timeout=httpx_config['timeout'])
+        try:
+            self.client = await policy.run(connect)
+            self.initialized = True
+            logger.info("✅ IndexTTS-2 Gradio客户端初始化成功")
+            return True
 
-            except Exception as e:
-                last_error = e
-                error_msg = str(e)[:300]
-                logger.warning(f"❌ 第{attempt + 1}次尝试失败: {error_msg}")
-
-                # 如果是SSL超时错误，提供额外提示
-                if 'handshake' in error_msg.lower() or 'timeout' in error_msg.lower():
-                    logger.error("💡 检测到连接超时，请确认：")
-                    logger.error(f"  1. 代理服务运行正常（{os.getenv('HTTP_PROXY', 'None')}）")
-                    logger.error("  2. 代理可以访问 https://huggingface.co")
-                    logger.error("  3. 防火墙未阻止连接")
-                    logger.error(f"  4. 超时时间: {httpx_config['timeout']}秒")
-
-                if attempt < max_retries - 1:
-                    wait_time = 2 ** attempt  # 指数退避: 1s, 2s, 4s
-                    logger.info(f"⏳ 等待{wait_time}秒后重试...")
-                    await asyncio.sleep(wait_time)
-                    self.initialized = False
-
-        logger.error(f"❌ IndexTTS-2 Gradio客户端初始化最终失败 (共{max_retries}次尝试)")
-        logger.error(f"最后错误: {str(last_error)[:300]}")
-        return False
+        except Exception as e:
+            error_msg = str(e)[:300]
+
+            # 如果是SSL超时错误，提供额外提示
+            if 'handshake' in error_msg.lower() or 'timeout' in error_msg.lower():
+                logger.error("💡 检测到连接超时，请确认：")
+                logger.error(f"  1. 代理服务运行正常（{os.getenv('HTTP_PROXY', 'None')}）")
+                logger.error("  2. 代理可以访问 https://huggingface.co")
+                logger.error("  3. 防火墙未阻止连接")
+                logger.error(f"  4. 超时时间: {httpx_config['timeout']}秒")
+
+            logger.error(f"❌ IndexTTS-2 Gradio客户端初始化最终失败")
+            logger.error(f"最后错误: {error_msg}")
+            return False
 
     def get_voice_sample_path(self, voice_description: str, voice_file: Optional[str] = None) -> str:
         """
@@ -347,107 +321,159 @@ class IndexTTS2GradioService:
         # 获取情感向量
         emotion_vectors = self.get_emotion_vectors(emotion or "")
 
-        # 重试机制
-        last_error = None
-        for attempt in range(max_retries):
-            try:
-                # 【关键修复】使用 asyncio.wait_for 增加超时控制
-                logger.info(f"开始音频合成... (超时设置: 180秒)")
-                
-                # 调用IndexTTS-2 API（使用异步超时包装）
-                result = await asyncio.wait_for(
-                    asyncio.get_event_loop().run_in_executor(
-                        None,
-                        lambda: self.client.predict(
-                            emo_control_method="Same as the voice reference",  # HuggingFace官方：英文枚举值
-                            prompt=handle_file(voice_sample_path),  # 语音参考文件
-                            text=cleaned_text,  # 使用清理后的文本
-                            emo_ref_path=handle_file(voice_sample_path),  # 情绪参考（使用同样的语音文件）
-                            emo_weight=0.8,  # 情绪权重
-                            vec1=emotion_vectors["vec1"],
-                            vec2=emotion_vectors["vec2"],
-                            vec3=emotion_vectors["vec3"],
-                            vec4=emotion_vectors["vec4"],
-                            vec5=emotion_vectors["vec5"],
-                            vec6=emotion_vectors["vec6"],
-                            vec7=emotion_vectors["vec7"],
-                            vec8=emotion_vectors["vec8"],
-                            emo_text="",  # 情绪文本描述
-                            emo_random=False,  # 不使用随机情绪
-                            max_text_tokens_per_segment=120,  # 每段最大token数
-                            param_16=True,  # do_sample
-                            param_17=0.8,   # top_p
-                            param_18=30,    # top_k
-                            param_19=0.8,   # temperature
-                            param_20=0,     # length_penalty
-                            param_21=3,     # num_beams
-                            param_22=10,    # repetition_penalty
-                            param_23=1500,  # max_mel_tokens
-                            api_name="/gen_single"
-                        )
-                    ),
-                    timeout=180  # 180秒超时
+        # 记录单句耗时和结果，供引擎路由使用
+        async with engine_router.track("indextts2_gradio", voice_sample_path, cleaned_text):
+            # 单飞去重：相同音色、情感和文本的并发请求共享一次上游调用
+            flight_key = tts_singleflight.make_key("indextts2_gradio", voice_sample_path, emotion, cleaned_text)
+            result_path = await tts_singleflight.run_to_file(
+                flight_key,
+                output_path,
+                lambda path: tts_hedger.run_to_file(
+                    "indextts2_gradio",
+                    path,
+                    primary=lambda p: self._predict_with_retries(cleaned_text, voice_sample_path, emotion_vectors, p, max_retries),
+                    hedge=lambda p: self._predict_hedged(cleaned_text, voice_sample_path, emotion_vectors, p)
                 )
+            )
+            if not result_path:
+                raise Exception(f"共享的音频合成结果不可用: {output_path}")
+        return result_path
 
-                # 结果是音频文件路径，需要下载到本地
-                logger.info(f"IndexTTS-2 API调用完成，结果类型: {type(result)}")
-                logger.info(f"结果内容: {result}")
-                
-                if result:
-                    # 检查result的属性和方法
-                    logger.info(f"Result属性: {dir(result) if hasattr(result, '__dict__') else 'No attributes'}")
-                    
-                    # 尝试多种方式获取文件路径
-                    file_path = None
-                    if hasattr(result, 'path'):
-                        file_path = result.path
-                        logger.info(f"使用result.path: {file_path}")
-                    elif hasattr(result, 'file'):
-                        file_path = result.file
-                        logger.info(f"使用result.file: {file_path}")
-                    elif isinstance(result, str):
-                        file_path = result
-                        logger.info(f"result是字符串路径: {file_path}")
-                    elif isinstance(result, (list, tuple)) and len(result) > 0:
-                        file_path = result[0]
-                        logger.info(f"result是列表，取第一个: {file_path}")
-                    
-                    if file_path and os.path.exists(file_path):
-                        # 复制文件到指定输出路径
-                        import shutil
-                        shutil.copy2(file_path, output_path)
-                        
-                        # 验证复制的文件
-                        if os.path.exists(output_path):
-                            file_size = os.path.getsize(output_path)
-                            logger.info(f"✅ 音频合成成功: {output_path} (大小: {file_size} bytes)")
-                            return output_path
-                        else:
-                            raise Exception(f"文件复制失败: {output_path}")
-                    else:
-                        raise Exception(f"无法找到有效的音频文件路径: {file_path}")
-                else:
-                    raise Exception("IndexTTS-2返回空结果")
+    async def _predict_with_retries(self, cleaned_text: str, voice_sample_path: str,
+                                    emotion_vectors: Dict[str, float], output_path: str,
+                                    max_retries: int = 3) -> str:
+        """调用IndexTTS-2 API并写入输出文件（统一重试策略，失败后重建客户端）"""
+        async def reconnect(attempt: int, error: BaseException):
+            # 重新初始化客户端（只连接一次，重试次数由外层策略统一控制）
+            self.initialized = False
+            if not await self.initialize_client(max_retries=1):
+                logger.error("❌ 重新初始化客户端失败")
+
+        policy = RetryPolicy("indextts2_gradio", max_attempts=max_retries, call_timeout=180)
+        return await policy.run(
+            lambda timeout: self._predict_once(
+                self.client, cleaned_text, voice_sample_path, emotion_vectors, output_path, timeout
+            ),
+            on_retry=reconnect
+        )
 
-            except Exception as e:
-                last_error = e
-                logger.warning(f"❌ 音频合成第{attempt + 1}次尝试失败: {str(e)}")
+    async def _predict_hedged(self, cleaned_text: str, voice_sample_path: str,
+                              emotion_vectors: Dict[str, float], output_path: str) -> str:
+        """对冲通道：使用独立的备用客户端发起一次请求（不重试）"""
+        hedge_client = await self._get_hedge_client()
+        if hedge_client is None:
+            raise Exception("IndexTTS-2备用客户端不可用")
+
+        policy = RetryPolicy("indextts2_gradio_hedge", max_attempts=1, call_timeout=180)
+        return await policy.run(
+            lambda timeout: self._predict_once(
+                hedge_client, cleaned_text, voice_sample_path, emotion_vectors, output_path, timeout
+            )
+        )
 
-                if attempt < max_retries - 1:
-                    wait_time = 2 ** attempt  # 指数退避: 1s, 2s, 4s
-                    logger.info(f"⏳ 等待{wait_time}秒后重试...")
-                    await asyncio.sleep(wait_time)
+    async def _get_hedge_client(self):
+        """获取对冲用的备用Gradio客户端（独立连接，可指向另一个Space）"""
+        if self.hedge_client is not None:
+            return self.hedge_client
 
-                    # 重新初始化客户端
-                    self.initialized = False
-                    if not await self.initialize_client():
-                        logger.error("❌ 重新初始化客户端失败")
-                        continue
+        hedge_space = getattr(settings, 'indextts2_gradio_hedge_space', '') or self.space_name
+        try:
+            logger.info(f"正在连接IndexTTS-2备用客户端: {hedge_space}")
+            self.hedge_client = await asyncio.to_thread(
+                Client,
+                hedge_space,
+                httpx_kwargs=self.httpx_config,
+                ssl_verify=False,
+                verbose=False
+            )
+        except Exception as e:
+            logger.error(f"IndexTTS-2备用客户端初始化失败: {str(e)[:300]}")
+            self.hedge_client = None
+        return self.hedge_client
+
+    async def _predict_once(self, client, cleaned_text: str, voice_sample_path: str,
+                            emotion_vectors: Dict[str, float], output_path: str,
+                            timeout: Optional[float] = 180) -> str:
+        """使用指定客户端调用一次IndexTTS-2 API并写入输出文件"""
+        # 【关键修复】使用 asyncio.wait_for 增加超时控制（超时由重试策略按任务剩余时间给出）
+        logger.info(f"开始音频合成... (超时设置: {timeout or 0:.0f}秒)")
+
+        # 调用IndexTTS-2 API（使用异步超时包装，并发数由自适应限制器控制）
+        limiter = limiter_registry.get("indextts2_gradio", initial_limit=settings.tts_max_concurrency)
+        async with limiter.slot():
+            result = await asyncio.wait_for(
+                asyncio.get_event_loop().run_in_executor(
+                    None,
+                    lambda: client.predict(
+                        emo_control_method="Same as the voice reference",  # HuggingFace官方：英文枚举值
+                        prompt=handle_file(voice_sample_path),  # 语音参考文件
+                        text=cleaned_text,  # 使用清理后的文本
+                        emo_ref_path=handle_file(voice_sample_path),  # 情绪参考（使用同样的语音文件）
+                        emo_weight=0.8,  # 情绪权重
+                        vec1=emotion_vectors["vec1"],
+                        vec2=emotion_vectors["vec2"],
+                        vec3=emotion_vectors["vec3"],
+                        vec4=emotion_vectors["vec4"],
+                        vec5=emotion_vectors["vec5"],
+                        vec6=emotion_vectors["vec6"],
+                        vec7=emotion_vectors["vec7"],
+                        vec8=emotion_vectors["vec8"],
+                        emo_text="",  # 情绪文本描述
+                        emo_random=False,  # 不使用随机情绪
+                        max_text_tokens_per_segment=120,  # 每段最大token数
+                        param_16=True,  # do_sample
+                        param_17=0.8,   # top_p
+                        param_18=30,    # top_k
+                        param_19=0.8,   # temperature
+                        param_20=0,     # length_penalty
+                        param_21=3,     # num_beams
+                        param_22=10,    # repetition_penalty
+                        param_23=1500,  # max_mel_tokens
+                        api_name="/gen_single"
+                    )
+                ),
+                timeout=timeout
+            )
 
-        # 所有重试都失败
-        error_msg = f"音频合成最终失败 (共{max_retries}次尝试): {str(last_error)}"
-        logger.error(f"❌ {error_msg}")
-        raise Exception(error_msg)
+        # 结果是音频文件路径，需要下载到本地
+        logger.info(f"IndexTTS-2 API调用完成，结果类型: {type(result)}")
+        logger.info(f"结果内容: {result}")
+
+        if not result:
+            raise Exception("IndexTTS-2返回空结果")
+
+        # 检查result的属性和方法
+        logger.info(f"Result属性: {dir(result) if hasattr(result, '__dict__') else 'No attributes'}")
+
+        # 尝试多种方式获取文件路径
+        file_path = None
+        if hasattr(result, 'path'):
+            file_path = result.path
+            logger.info(f"使用result.path: {file_path}")
+        elif hasattr(result, 'file'):
+            file_path = result.file
+            logger.info(f"使用result.file: {file_path}")
+        elif isinstance(result, str):
+            file_path = result
+            logger.info(f"result是字符串路径: {file_path}")
+        elif isinstance(result, (list, tuple)) and len(result) > 0:
+            file_path = result[0]
+            logger.info(f"result是列表，取第一个: {file_path}")
+
+        if not (file_path and os.path.exists(file_path)):
+            raise Exception(f"无法找到有效的音频文件路径: {file_path}")
+
+        # 复制文件到指定输出路径
+        import shutil
+        shutil.copy2(file_path, output_path)
+
+        # 验证复制的文件
+        if not os.path.exists(output_path):
+            raise Exception(f"文件复制失败: {output_path}")
+
+        file_size = os.path.getsize(output_path)
+        logger.info(f"✅ 音频合成成功: {output_path} (大小: {file_size} bytes)")
+        return output_path
 
     async def synthesize_script_audio(self, script: PodcastScript, characters: List[CharacterRole],
                                      task_id: str, atmosphere: str = "轻松幽默",
@@ -474,10 +500,13 @@ class IndexTTS2GradioService:
             else:
                 logger.warning(f"角色 {char.name} 缺少音色样本")
 
-        # 合成每个对话片段
+        # 合成每个对话片段（音效只做分析，实际叠加在进程池中完成）
         audio_segments = []
+        segment_effects = []
+        checkpoint = get_task_checkpoint()
 
         for i, dialogue in enumerate(script.dialogues):
+            report_progress(PROGRESS_SEGMENTS, i, len(script.dialogues))
             voice_sample_path = character_voice_samples.get(dialogue.character_name)
             if not voice_sample_path:
                 logger.warning(f"跳过角色 {dialogue.character_name} - 无音色样本")
@@ -486,19 +515,26 @@ class IndexTTS2GradioService:
             output_path = os.path.join(task_dir, f"segment_{i:03d}.wav")
 
             try:
-                # 合成基础音频
-                result_path = await self.synthesize_single_audio(
-                    text=dialogue.content,
-                    voice_sample_path=voice_sample_path,
-                    emotion=dialogue.emotion,
-                    output_path=output_path
-                )
+                # 检查点中已有该句音频时直接复用（进程重启前已合成）
+                segment_key = TaskCheckpoint.segment_key(f"{voice_sample_path}|{dialogue.emotion}", dialogue.content)
+                result_path = checkpoint.get_segment(i, segment_key) if checkpoint else None
+                if not result_path:
+                    # 合成基础音频
+                    result_path = await self.synthesize_single_audio(
+                        text=dialogue.tts_text(),
+                        voice_sample_path=voice_sample_path,
+                        emotion=dialogue.emotion,
+                        output_path=output_path
+                    )
+                    if checkpoint and result_path and os.path.exists(result_path):
+                        checkpoint.record_segment(i, segment_key, result_path)
 
                 if result_path and os.path.exists(result_path):
                     # 加载生成的音频
                     segment = AudioSegment.from_wav(result_path)
 
-                    # 添加音效处理
+                    # 分析音效
+                    effects = []
                     if enable_effects:
                         # 分析对话确定位置
                         position = None
@@ -514,79 +550,50 @@ class IndexTTS2GradioService:
                             position=position
                         )
 
-                        # 应用音效
-                        segment = self.audio_effects.add_effects_to_segment(segment, effects)
-
                     audio_segments.append(segment)
+                    segment_effects.append(effects)
                     logger.info(f"成功合成片段 {i}: {dialogue.character_name}")
 
-                    # 清理临时文件
-                    try:
-                        os.remove(result_path)
-                    except:
-                        pass
+                    # 清理临时文件（启用检查点时由任务完成时统一清理）
+                    discard_segment_file(result_path)
 
             except Exception as e:
                 logger.error(f"片段合成失败 {i}: {dialogue.character_name} - {str(e)}")
                 continue
 
+        report_progress(PROGRESS_SEGMENTS, len(script.dialogues), len(script.dialogues))
+
         if not audio_segments:
             raise Exception("所有音频片段合成失败")
 
         # 拼接音频并应用高级处理
         final_audio = await self.concatenate_audio_with_advanced_effects(
-            audio_segments, task_dir, task_id, atmosphere, enable_bgm
+            audio_segments, task_dir, task_id, atmosphere, enable_bgm, segment_effects
         )
 
         return final_audio
 
     async def concatenate_audio_with_advanced_effects(self, audio_segments: List[AudioSegment],
                                                      task_dir: str, task_id: str, atmosphere: str,
-                                                     enable_bgm: bool = True) -> str:
-        """拼接音频片段并应用高级音效处理"""
+                                                     enable_bgm: bool = True,
+                                                     segment_effects: Optional[List[List[str]]] = None) -> str:
+        """拼接音频片段并应用高级音效处理（在音频进程池中执行，不阻塞事件循环）"""
         try:
-            # 生成开场和结尾音效
-            intro_audio, outro_audio = self.audio_effects.create_intro_outro(atmosphere=atmosphere)
-
-            # 开始拼接
-            combined = AudioSegment.empty()
-
-            # 添加开场音效（如果存在）
-            if intro_audio:
-                combined += intro_audio
-
-            # 拼接主要内容
-            for i, segment in enumerate(audio_segments):
-                # 智能停顿时长：根据上下文调整
-                if i > 0:  # 不在第一个片段前添加停顿
-                    pause_duration = self._calculate_smart_pause_duration(i, len(audio_segments))
-                    pause = self.audio_effects.generate_silence_with_ambience(
-                        duration=pause_duration,
-                        atmosphere="studio"
-                    )
-                    combined += pause
-
-                combined += segment
-
-            # 添加结尾音效（如果存在）
-            if outro_audio:
-                combined += outro_audio
+            # 智能停顿时长：根据上下文调整（第一个片段前不加停顿）
+            pause_durations = [
+                self._calculate_smart_pause_duration(i, len(audio_segments)) if i > 0 else 0
+                for i in range(len(audio_segments))
+            ]
 
-            # 应用专业级后处理
-            combined = self.audio_effects.apply_professional_mastering(combined)
-
-            # 添加背景音乐
-            if enable_bgm:
-                combined = self.audio_effects.add_background_music(
-                    audio=combined,
-                    atmosphere=atmosphere,
-                    fade_in_duration=3000,
-                    fade_out_duration=3000
-                )
-
-            # 保存最终音频
             final_path = os.path.join(task_dir, f"podcast_{task_id}.mp3")
-            combined.export(final_path, format="mp3", bitrate="192k")
+            await audio_process_pool.render_master(
+                segments=audio_segments,
+                segment_effects=segment_effects or [[] for _ in audio_segments],
+                pause_durations=pause_durations,
+                atmosphere=atmosphere,
+                enable_bgm=enable_bgm,
+                output_path=final_path
+            )
 
             logger.info(f"完成IndexTTS-2高级音效处理，输出: {final_path}")
             return final_path
@@ -6,6 +6,12 @@ from pydub import AudioSegment
 from ..models.podcast import PodcastScript, CharacterRole, ScriptDialogue
 from ..core.config import settings
 from .audio_effects_service import AudioEffectsService
+from .audio_process_pool import audio_process_pool
+from .tts_singleflight import tts_singleflight
+from .engine_router import engine_router
+from .task_checkpoint import TaskCheckpoint, get_task_checkpoint, discard_segment_file
+from .task_context import report_progress
+from .task_progress import PROGRESS_SEGMENTS
 from ..utils.text_cleaner import clean_for_tts
 
 # 设置日志
@@ -171,32 +177,60 @@ class IndexTTSService:
             if cleaned_text != text:
                 logger.info(f"文本清理: [{text[:50]}...] -> [{cleaned_text[:50]}...]")
 
-            # 准备合成参数
-            infer_params = {
-                'spk_audio_prompt': voice_sample_path,
-                'text': cleaned_text,  # 使用清理后的文本
-                'output_path': output_path,
-                'verbose': False
-            }
-
-            # 添加情感控制
-            if emotion_sample_path:
-                infer_params['emo_audio_prompt'] = emotion_sample_path
-
-            # 添加时长控制
-            if target_duration:
-                infer_params['use_speed'] = True
-                infer_params['target_dur'] = target_duration
+            # 记录单句耗时和结果，供引擎路由使用
+            async with engine_router.track("indextts2", voice_sample_path, cleaned_text) as tracker:
+                # 单飞去重：情感样本和目标时长也会影响输出，一并纳入情感维度
+                flight_key = tts_singleflight.make_key(
+                    "indextts",
+                    voice_sample_path,
+                    f"{emotion_sample_path or ''}|{target_duration or ''}",
+                    cleaned_text
+                )
+                result_path = await tts_singleflight.run_to_file(
+                    flight_key,
+                    output_path,
+                    lambda path: asyncio.to_thread(
+                        self._infer_to_file, cleaned_text, voice_sample_path,
+                        emotion_sample_path, path, target_duration
+                    )
+                )
 
-            # 执行合成
-            self.tts_model.infer(**infer_params)
+                success = bool(result_path) and os.path.exists(output_path)
+                if not success:
+                    tracker.mark_failed()
 
-            return os.path.exists(output_path)
+            return success
 
         except Exception as e:
             logger.error(f"音频合成失败 {output_path}: {str(e)}")
             return False
 
+    def _infer_to_file(self, cleaned_text: str, voice_sample_path: str,
+                       emotion_sample_path: Optional[str], output_path: str,
+                       target_duration: Optional[float] = None) -> Optional[str]:
+        """执行本地模型推理（同步，在线程池中运行）"""
+        # 准备合成参数
+        infer_params = {
+            'spk_audio_prompt': voice_sample_path,
+            'text': cleaned_text,  # 使用清理后的文本
+            'output_path': output_path,
+            'verbose': False
+        }
+
+        # 添加情感控制
+        if emotion_sample_path:
+            infer_params['emo_audio_prompt'] = emotion_sample_path
+
+        # 添加时长控制
+        if target_duration:
+            infer_params['use_speed'] = True
+            infer_params['target_dur'] = target_duration
+
+        # 执行合成
+        self.tts_model.infer(**infer_params)
+
+        return output_path if os.path.exists(output_path) else None
+
     async def synthesize_script_audio(self, script: PodcastScript, characters: List[CharacterRole], task_id: str,
                                      atmosphere: str = "轻松幽默", enable_effects: bool = True, enable_bgm: bool = True) -> str:
         """合成完整播客音频（带音效和BGM）"""
@@ -216,10 +250,13 @@ class IndexTTSService:
             else:
                 logger.warning(f"角色 {char.name} 缺少音色样本")
 
-        # 合成每个对话片段
+        # 合成每个对话片段（音效只做分析，实际叠加在进程池中完成）
         audio_segments = []
+        segment_effects = []
+        checkpoint = get_task_checkpoint()
 
         for i, dialogue in enumerate(script.dialogues):
+            report_progress(PROGRESS_SEGMENTS, i, len(script.dialogues))
             voice_sample_path = character_voice_samples.get(dialogue.character_name)
             if not voice_sample_path:
                 logger.warning(f"跳过角色 {dialogue.character_name} - 无音色样本")
@@ -228,19 +265,29 @@ class IndexTTSService:
             emotion_sample_path = self.get_emotion_sample_path(dialogue.emotion)
             output_path = os.path.join(task_dir, f"segment_{i:03d}.wav")
 
-            # 合成基础音频
-            success = await self.synthesize_single_audio(
-                text=dialogue.content,
-                voice_sample_path=voice_sample_path,
-                emotion_sample_path=emotion_sample_path,
-                output_path=output_path
-            )
+            # 检查点中已有该句音频时直接复用（进程重启前已合成）
+            segment_key = TaskCheckpoint.segment_key(f"{voice_sample_path}|{emotion_sample_path}", dialogue.content)
+            saved_path = checkpoint.get_segment(i, segment_key) if checkpoint else None
+            if saved_path:
+                success = True
+                output_path = saved_path
+            else:
+                # 合成基础音频
+                success = await self.synthesize_single_audio(
+                    text=dialogue.tts_text(),
+                    voice_sample_path=voice_sample_path,
+                    emotion_sample_path=emotion_sample_path,
+                    output_path=output_path
+                )
+                if success and checkpoint:
+                    checkpoint.record_segment(i, segment_key, output_path)
 
             if success:
                 # 加载生成的音频
                 segment = AudioSegment.from_wav(output_path)
 
-                # 添加音效处理
+                # 分析音效
+                effects = []
                 if enable_effects:
                     # 分析对话确定位置
                     position = None
@@ -256,85 +303,27 @@ class IndexTTSService:
                         position=position
                     )
 
-                    # 应用音效
-                    segment = self.audio_effects.add_effects_to_segment(segment, effects)
-
                 audio_segments.append(segment)
+                segment_effects.append(effects)
                 logger.info(f"成功合成片段 {i}: {dialogue.character_name}")
 
-                # 清理临时文件
-                try:
-                    os.remove(output_path)
-                except:
-                    pass
+                # 清理临时文件（启用检查点时由任务完成时统一清理）
+                discard_segment_file(output_path)
             else:
                 logger.error(f"片段合成失败 {i}: {dialogue.character_name}")
 
+        report_progress(PROGRESS_SEGMENTS, len(script.dialogues), len(script.dialogues))
+
         if not audio_segments:
             raise Exception("所有音频片段合成失败")
 
         # 拼接音频并应用高级处理
         final_audio = await self.concatenate_audio_with_advanced_effects(
-            audio_segments, task_dir, task_id, atmosphere, enable_bgm
+            audio_segments, task_dir, task_id, atmosphere, enable_bgm, segment_effects
         )
 
         return final_audio
 
-    async def concatenate_audio_with_effects(self, audio_files: List[str], task_dir: str, task_id: str) -> str:
-        """拼接音频文件并添加效果"""
-        try:
-            # 加载第一个音频文件
-            combined = AudioSegment.from_wav(audio_files[0])
-
-            # 依次拼接其他音频文件
-            for i, audio_file in enumerate(audio_files[1:]):
-                if os.path.exists(audio_file):
-                    segment = AudioSegment.from_wav(audio_file)
-
-                    # 智能停顿时长：根据上下文调整
-                    pause_duration = self._calculate_pause_duration(i)
-                    pause = AudioSegment.silent(duration=pause_duration)
-
-                    combined = combined + pause + segment
-
-            # 应用音频后处理
-            combined = self._apply_audio_processing(combined)
-
-            # 保存最终音频
-            final_path = os.path.join(task_dir, f"podcast_{task_id}.mp3")
-            combined.export(final_path, format="mp3", bitrate="128k")
-
-            return final_path
-
-        except Exception as e:
-            logger.error(f"音频拼接失败: {str(e)}")
-            raise Exception(f"音频拼接失败: {str(e)}")
-
-    def _calculate_pause_duration(self, segment_index: int) -> int:
-        """计算智能停顿时长"""
-        # 基础停顿：500ms
-        base_pause = 500
-
-        # 每5个片段增加一个长停顿（模拟段落间隔）
-        if segment_index % 5 == 0:
-            return base_pause + 300
-
-        return base_pause
-
-    def _apply_audio_processing(self, audio: AudioSegment) -> AudioSegment:
-        """应用音频后处理"""
-        # 标准化音量
-        audio = audio.normalize()
-
-        # 轻微压缩动态范围
-        audio = audio.compress_dynamic_range(threshold=-20.0, ratio=2.0)
-
-        # 添加轻微的淡入淡出
-        fade_duration = 100  # 100ms
-        audio = audio.fade_in(fade_duration).fade_out(fade_duration)
-
-        return audio
-
     def get_audio_duration(self, audio_path: str) -> int:
         """获取音频时长（秒）"""
         try:
@@ -357,51 +346,25 @@ class IndexTTSService:
 
     async def concatenate_audio_with_advanced_effects(self, audio_segments: List[AudioSegment],
                                                      task_dir: str, task_id: str, atmosphere: str,
-                                                     enable_bgm: bool = True) -> str:
-        """拼接音频片段并应用高级音效处理"""
+                                                     enable_bgm: bool = True,
+                                                     segment_effects: Optional[List[List[str]]] = None) -> str:
+        """拼接音频片段并应用高级音效处理（在音频进程池中执行，不阻塞事件循环）"""
         try:
-            # 生成开场和结尾音效
-            intro_audio, outro_audio = self.audio_effects.create_intro_outro(atmosphere=atmosphere)
-
-            # 开始拼接
-            combined = AudioSegment.empty()
-
-            # 添加开场音效（如果存在）
-            if intro_audio:
-                combined += intro_audio
-
-            # 拼接主要内容
-            for i, segment in enumerate(audio_segments):
-                # 智能停顿时长：根据上下文调整
-                if i > 0:  # 不在第一个片段前添加停顿
-                    pause_duration = self._calculate_smart_pause_duration(i, len(audio_segments))
-                    pause = self.audio_effects.generate_silence_with_ambience(
-                        duration=pause_duration,
-                        atmosphere="studio"
-                    )
-                    combined += pause
-
-                combined += segment
+            # 智能停顿时长：根据上下文调整（第一个片段前不加停顿）
+            pause_durations = [
+                self._calculate_smart_pause_duration(i, len(audio_segments)) if i > 0 else 0
+                for i in range(len(audio_segments))
+            ]
 
-            # 添加结尾音效（如果存在）
-            if outro_audio:
-                combined += outro_audio
-
-            # 应用专业级后处理
-            combined = self.audio_effects.apply_professional_mastering(combined)
-
-            # 添加背景音乐
-            if enable_bgm:
-                combined = self.audio_effects.add_background_music(
-                    audio=combined,
-                    atmosphere=atmosphere,
-                    fade_in_duration=3000,
-                    fade_out_duration=3000
-                )
-
-            # 保存最终音频
             final_path = os.path.join(task_dir, f"podcast_{task_id}.mp3")
-            combined.export(final_path, format="mp3", bitrate="192k")
+            await audio_process_pool.render_master(
+                segments=audio_segments,
+                segment_effects=segment_effects or [[] for _ in audio_segments],
+                pause_durations=pause_durations,
+                atmosphere=atmosphere,
+                enable_bgm=enable_bgm,
+                output_path=final_path
+            )
 
             logger.info(f"完成高级音效处理，输出: {final_path}")
             return final_path
@@ -0,0 +1,176 @@
+"""
+LLM响应持久缓存
+素材分析、结构规划、结束语/集体道别这类低温度调用，输入相同时结果可以直接复用。
+结果按"调用类型 + 模型 + 提示词"的内容哈希存入SQLite：
+- 进程重启后仍然有效，同一台机器上的多个worker进程共享（WAL模式）
+- 按TTL过期，超过条目数或总大小上限时按最近访问时间淘汰（LRU）
+- 统计各调用类型的命中率
+只缓存解析、校验通过的结果，失败和回退模板的输出不会写入
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 缓存的调用类型
+KIND_MATERIAL_ANALYSIS = "material_analysis"
+KIND_STRUCTURE_PLAN = "structure_plan"
+KIND_ENDING = "ending"
+KIND_FAREWELL = "farewell"
+
+
+class LLMResponseCache:
+    """基于SQLite的LLM结果缓存（读写在线程中执行，不阻塞事件循环）"""
+
+    def __init__(self, path: str, ttl: float = 604800, max_entries: int = 5000,
+                 max_bytes: int = 100 * 1024 * 1024, enabled: bool = True):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    @staticmethod
+    def make_key(kind: str, model: str, prompt: str, **params) -> str:
+        """缓存键：调用类型、模型、提示词和生成参数的SHA-256"""
+        payload = json.dumps({"kind": kind, "model": model, "prompt": prompt, "params": params},
+                             ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                " key TEXT PRIMARY KEY, kind TEXT NOT NULL, value TEXT NOT NULL, size INTEGER NOT NULL,"
+                " created_at REAL NOT NULL, expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_access ON llm_cache (last_access)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _count(self, kind: str, field: str):
+        self.stats.setdefault(kind, {"hits": 0, "misses": 0, "stores": 0})[field] += 1
+
+    # ---------- 同步实现（在线程中执行） ----------
+
+    def _get_sync(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                conn.commit()
+                return None
+            conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+            conn.commit()
+        return json.loads(row[0])
+
+    def _set_sync(self, key: str, kind: str, value: Any):
+        encoded = json.dumps(value, ensure_ascii=False, default=str)
+        size = len(encoded.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, kind, value, size, created_at, expires_at, last_access)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, kind, encoded, size, now, now + self.ttl, now)
+            )
+            self._evict(conn, now)
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """删除过期条目，再按最近访问时间从旧到新淘汰，直到满足条目数和总大小上限"""
+        conn.execute("DELETE FROM llm_cache WHERE expires_at < ?", (now,))
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        evicted = 0
+        for key, size in conn.execute("SELECT key, size FROM llm_cache ORDER BY last_access").fetchall():
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            count -= 1
+            total -= size
+            evicted += 1
+        logger.info(f"[LLM缓存] 淘汰 {evicted} 条最久未使用的结果")
+
+    # ---------- 异步接口 ----------
+
+    async def get(self, kind: str, key: str) -> Optional[Any]:
+        """读取缓存结果（未命中、已过期或缓存不可用时返回None）"""
+        if not self.enabled:
+            return None
+        try:
+            value = await asyncio.to_thread(self._get_sync, key)
+        except (sqlite3.Error, ValueError) as e:
+            logger.warning(f"[LLM缓存] 读取失败，按未命中处理: {e}")
+            value = None
+        self._count(kind, "hits" if value is not None else "misses")
+        return value
+
+    async def set(self, kind: str, key: str, value: Any):
+        """写入结果（写入失败只记录日志，不影响调用方）"""
+        if not self.enabled or value is None:
+            return
+        try:
+            await asyncio.to_thread(self._set_sync, key, kind, value)
+            self._count(kind, "stores")
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logger.warning(f"[LLM缓存] 写入失败: {e}")
+
+    def _size_sync(self) -> tuple:
+        with self._lock:
+            return self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache"
+            ).fetchone()
+
+    async def get_stats(self) -> Dict[str, Any]:
+        """命中率统计和缓存库大小（查询库大小在线程中执行，不阻塞事件循环）"""
+        stats: Dict[str, Any] = {"enabled": self.enabled}
+        for kind, counts in self.stats.items():
+            lookups = counts["hits"] + counts["misses"]
+            stats[kind] = {**counts, "hit_rate": round(counts["hits"] / lookups, 3) if lookups else 0.0}
+
+        if self.enabled:
+            try:
+                count, total = await asyncio.to_thread(self._size_sync)
+                stats["entries"] = count
+                stats["bytes"] = total
+            except sqlite3.Error as e:
+                stats["error"] = str(e)
+        return stats
+
+llm_cache = LLMResponseCache(
+    path=settings.llm_cache_path,
+    ttl=settings.llm_cache_ttl_seconds,
+    max_entries=settings.llm_cache_max_entries,
+    max_bytes=settings.llm_cache_max_mb * 1024 * 1024,
+    enabled=settings.llm_cache_enabled
+)
@@ -0,0 +1,231 @@
+"""
+LLM多端点路由
+剧本生成可配置多个OpenAI兼容端点（混元、DeepSeek、OpenAI或本地服务），每次调用：
+- 按各端点的滚动延迟（EWMA）和当前在途请求数加权随机排序，较快、较空闲的端点优先
+- 失败时立即转到下一个端点；连续失败达到阈值的端点熔断一段时间（多次熔断时冷却时间翻倍），
+  冷却结束后只放行一个探测请求，成功即恢复
+- 每个端点使用独立的自适应并发限制器
+只有全部端点都不可用时，调用方才回退到模板客户端
+"""
+
+import asyncio
+import json
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+import httpx
+import openai
+
+from ..core.config import settings
+from .adaptive_limiter import limiter_registry
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class LLMEndpointsUnavailable(Exception):
+    """所有LLM端点都处于熔断中（或未配置任何端点）"""
+
+
+def is_endpoint_failure(error: BaseException) -> bool:
+    """
+    判断异常是否说明端点本身不健康（计入熔断）：连接失败、超时、429限流和5xx
+
+    400等其他4xx说明请求本身有问题（换任何端点都一样），不应让端点熔断
+    """
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError,
+                          openai.APIConnectionError, httpx.TransportError)):
+        return True
+
+    status_code = getattr(error, "status_code", None)
+    if isinstance(status_code, int):
+        return status_code == 429 or status_code >= 500
+    return False
+
+
+def parse_llm_endpoints(raw: str) -> List[Dict[str, Any]]:
+    """
+    解析额外端点配置：JSON数组，每项包含 name、base_url、api_key、model，可选 max_concurrency
+
+    缺少必填字段或格式错误的条目会被忽略
+    """
+    if not raw or not raw.strip():
+        return []
+    try:
+        items = json.loads(raw)
+    except ValueError as e:
+        logger.warning(f"忽略无效的LLM端点配置: {e}")
+        return []
+
+    endpoints = []
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict) or not all(item.get(key) for key in ("name", "base_url", "api_key", "model")):
+            logger.warning(f"忽略不完整的LLM端点配置: {item}")
+            continue
+        endpoints.append(item)
+    return endpoints
+
+
+class LLMEndpoint:
+    """单个OpenAI兼容端点及其健康状态"""
+
+    def __init__(self, name: str, client: Any, model: str, base_url: str = "",
+                 max_concurrency: Optional[int] = None):
+        self.name = name
+        self.client = client
+        self.model = model
+        self.base_url = base_url
+        self.limiter = limiter_registry.get(f"llm:{name}", initial_limit=max_concurrency)
+        self.json_mode_supported = True  # 服务商拒绝 response_format 后置为False
+
+        self.latency: Optional[float] = None  # 成功请求耗时的EWMA（秒）
+        self.in_flight = 0
+        self.consecutive_failures = 0
+        self.trips = 0  # 连续熔断次数（决定冷却时间）
+        self.down_until = 0.0
+        self.stats = {"requests": 0, "successes": 0, "failures": 0, "request_errors": 0, "trips": 0}
+
+
+class LLMRouter:
+    """按延迟加权选择端点，带熔断和恢复探测"""
+
+    def __init__(self, failure_threshold: int = 3, cooldown: float = 30.0,
+                 max_cooldown: float = 300.0, latency_alpha: float = 0.2):
+        """
+        Args:
+            failure_threshold: 连续失败多少次后熔断
+            cooldown: 首次熔断的冷却时间（秒），再次熔断时翻倍
+            max_cooldown: 冷却时间上限（秒）
+            latency_alpha: 延迟EWMA的平滑系数
+        """
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.max_cooldown = max(cooldown, max_cooldown)
+        self.latency_alpha = latency_alpha
+        self.endpoints: List[LLMEndpoint] = []
+
+    def add_endpoint(self, endpoint: LLMEndpoint):
+        """注册端点（同名端点会被替换）"""
+        self.endpoints = [item for item in self.endpoints if item.name != endpoint.name] + [endpoint]
+        logger.info(f"[LLM路由] 注册端点 {endpoint.name}: {endpoint.base_url} ({endpoint.model})")
+
+    def _is_available(self, endpoint: LLMEndpoint, now: float) -> bool:
+        if endpoint.down_until > now:
+            return False
+        # 冷却结束后的半开状态：同一时间只放行一个探测请求
+        if endpoint.consecutive_failures >= self.failure_threshold:
+            return endpoint.in_flight == 0
+        return True
+
+    def _weight(self, endpoint: LLMEndpoint, default_latency: float) -> float:
+        latency = endpoint.latency if endpoint.latency is not None else default_latency
+        return 1.0 / (max(latency, 0.01) * (1 + endpoint.in_flight))
+
+    def candidates(self) -> List[LLMEndpoint]:
+        """当前可用的端点，按延迟和负载加权随机排序（无测量数据的端点按已测端点的最低延迟估计）"""
+        now = time.monotonic()
+        available = [endpoint for endpoint in self.endpoints if self._is_available(endpoint, now)]
+        if len(available) <= 1:
+            return available
+
+        measured = [endpoint.latency for endpoint in available if endpoint.latency is not None]
+        default_latency = min(measured) if measured else 1.0
+        # 加权随机排列（Efraimidis-Spirakis）：权重越大越可能排在前面
+        keyed = [
+            (random.random() ** (1.0 / self._weight(endpoint, default_latency)), endpoint)
+            for endpoint in available
+        ]
+        return [endpoint for _, endpoint in sorted(keyed, key=lambda item: item[0], reverse=True)]
+
+    def _record_success(self, endpoint: LLMEndpoint, latency: float):
+        endpoint.stats["successes"] += 1
+        if endpoint.consecutive_failures >= self.failure_threshold:
+            logger.info(f"[LLM路由] 端点 {endpoint.name} 已恢复")
+        endpoint.consecutive_failures = 0
+        endpoint.trips = 0
+        if endpoint.latency is None:
+            endpoint.latency = latency
+        else:
+            endpoint.latency += self.latency_alpha * (latency - endpoint.latency)
+
+    def _record_failure(self, endpoint: LLMEndpoint, error: BaseException):
+        endpoint.stats["failures"] += 1
+        endpoint.consecutive_failures += 1
+        if endpoint.consecutive_failures >= self.failure_threshold:
+            cooldown = min(self.max_cooldown, self.cooldown * (2 ** endpoint.trips))
+            endpoint.trips += 1
+            endpoint.stats["trips"] += 1
+            endpoint.down_until = time.monotonic() + cooldown
+            logger.warning(f"[LLM路由] 端点 {endpoint.name} 连续失败{endpoint.consecutive_failures}次，"
+                           f"熔断{cooldown:.0f}秒: {error}")
+
+    @asynccontextmanager
+    async def _track(self, endpoint: LLMEndpoint):
+        """占用端点的并发名额，按结果更新延迟和健康状态（取消和请求本身的错误不计入失败）"""
+        endpoint.in_flight += 1
+        endpoint.stats["requests"] += 1
+        try:
+            async with endpoint.limiter.slot():
+                started = time.monotonic()
+                try:
+                    yield
+                except Exception as error:
+                    if is_endpoint_failure(error):
+                        self._record_failure(endpoint, error)
+                    else:
+                        endpoint.stats["request_errors"] += 1
+                    raise
+                else:
+                    self._record_success(endpoint, time.monotonic() - started)
+        finally:
+            endpoint.in_flight -= 1
+
+    async def run(self, func: Callable[[LLMEndpoint], Awaitable[T]]) -> T:
+        """
+        依次在候选端点上执行调用，直到成功
+
+        Raises:
+            LLMEndpointsUnavailable: 没有可用端点
+            Exception: 所有候选端点都失败时抛出最后一个端点的异常
+        """
+        endpoints = self.candidates()
+        if not endpoints:
+            raise LLMEndpointsUnavailable("所有LLM端点均不可用")
+
+        last_error: Optional[Exception] = None
+        for index, endpoint in enumerate(endpoints):
+            try:
+                async with self._track(endpoint):
+                    return await func(endpoint)
+            except Exception as error:
+                last_error = error
+                if index + 1 < len(endpoints):
+                    logger.warning(f"[LLM路由] 端点 {endpoint.name} 请求失败，转到下一个端点: {error}")
+        raise last_error
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            endpoint.name: {
+                "model": endpoint.model,
+                "available": self._is_available(endpoint, now),
+                "latency": round(endpoint.latency, 3) if endpoint.latency is not None else None,
+                "in_flight": endpoint.in_flight,
+                "consecutive_failures": endpoint.consecutive_failures,
+                "cooldown_remaining": max(0, round(endpoint.down_until - now, 1)),
+                "json_mode": endpoint.json_mode_supported,
+                **endpoint.stats
+            }
+            for endpoint in self.endpoints
+        }
+
+
+llm_router = LLMRouter(
+    failure_threshold=settings.llm_endpoint_failure_threshold,
+    cooldown=settings.llm_endpoint_cooldown_seconds,
+    max_cooldown=settings.llm_endpoint_max_cooldown_seconds
+)
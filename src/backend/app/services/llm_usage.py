@@ -0,0 +1,76 @@
+"""
+LLM Token用量统计
+从OpenAI兼容接口的 usage 字段提取每次调用的输入/输出Token数和前缀缓存命中数
+（DeepSeek 返回 prompt_cache_hit_tokens，OpenAI/混元返回 prompt_tokens_details.cached_tokens），
+按调用类型（开场、续写轮次、结束语等）累计，用于评估提示词前缀缓存的效果
+"""
+
+import threading
+from typing import Any, Dict
+
+
+def extract_usage(response: Any) -> Dict[str, int]:
+    """提取一次响应的Token用量（回退模板客户端等没有 usage 时全部为0）"""
+    usage = getattr(response, "usage", None)
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+
+    cached_tokens = getattr(usage, "prompt_cache_hit_tokens", None)
+    if cached_tokens is None:
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = getattr(details, "cached_tokens", 0) if details is not None else 0
+
+    return {
+        "prompt_tokens": prompt_tokens,
+        "cached_tokens": cached_tokens or 0,
+        "completion_tokens": completion_tokens
+    }
+
+
+class LLMUsageTracker:
+    """按调用类型累计Token用量和耗时"""
+
+    def __init__(self):
+        self._totals: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, label: str, response: Any, elapsed: float) -> Dict[str, Any]:
+        """
+        记录一次调用
+
+        Args:
+            label: 调用类型（opening / round / ending 等）
+            response: 聊天补全响应
+            elapsed: 调用耗时（秒）
+
+        Returns:
+            本次调用的用量：{"label", "prompt_tokens", "cached_tokens", "completion_tokens", "latency_ms"}，
+            流式调用另有首个token的延迟 "ttft_ms"
+        """
+        entry = {"label": label, **extract_usage(response), "latency_ms": int(elapsed * 1000)}
+        time_to_first_token = getattr(response, "time_to_first_token", None)
+        if time_to_first_token is not None:
+            entry["ttft_ms"] = int(time_to_first_token * 1000)
+        with self._lock:
+            totals = self._totals.setdefault(label, {
+                "calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0, "latency_ms": 0
+            })
+            totals["calls"] += 1
+            for key in ("prompt_tokens", "cached_tokens", "completion_tokens", "latency_ms"):
+                totals[key] += entry[key]
+        return entry
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {}
+            for label, totals in self._totals.items():
+                stats[label] = {
+                    **totals,
+                    "cache_hit_ratio": round(totals["cached_tokens"] / totals["prompt_tokens"], 3)
+                    if totals["prompt_tokens"] else 0.0,
+                    "avg_latency_ms": int(totals["latency_ms"] / totals["calls"])
+                }
+            return stats
+
+
+llm_usage = LLMUsageTracker()
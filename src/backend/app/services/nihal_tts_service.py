@@ -15,6 +15,15 @@ from ..models.podcast import PodcastScript, CharacterRole
 from ..core.config import settings
 from ..utils.text_cleaner import clean_for_tts
 from .voice_resolver_service import voice_resolver
+from .tts_singleflight import tts_singleflight
+from .tts_hedging import tts_hedger
+from .adaptive_limiter import limiter_registry
+from .engine_router import engine_router
+from .retry_policy import RetryPolicy
+from .audio_process_pool import audio_process_pool
+from .task_checkpoint import TaskCheckpoint, get_task_checkpoint, discard_segment_file
+from .task_context import report_progress
+from .task_progress import PROGRESS_SEGMENTS
 
 logger = logging.getLogger(__name__)
 
@@ -24,8 +33,10 @@ class NihalTTSService:
 
     def __init__(self):
         self.client = None
+        self.hedge_client = None  # 对冲请求使用的备用客户端（按需创建）
         self.space_name = getattr(settings, 'nihal_tts_space', "NihalGazi/Text-To-Speech-Unlimited")
         self.initialized = False
+        self.connect_timeout = 120  # 连接Space（拉取配置）的超时（秒）
 
         # 13个预设音色
         self.available_voices = [
@@ -119,7 +130,10 @@ class NihalTTSService:
             import os
             os.environ['GRADIO_SSL_VERIFY'] = 'false'
 
-            self.client = Client(self.space_name)
+            # 构造时会同步拉取Space配置，放入线程池避免阻塞事件循环
+            self.client = await asyncio.wait_for(
+                asyncio.to_thread(Client, self.space_name), timeout=self.connect_timeout
+            )
             self.initialized = True
             logger.info("NihalGazi TTS客户端初始化成功")
             return True
@@ -192,53 +206,97 @@ class NihalTTSService:
         # 获取情感字符串
         emotion_str = self.get_emotion_string(emotion)
 
-        # 重试机制
-        last_error = None
-        for attempt in range(max_retries):
-            try:
-                # 调用NihalGazi TTS API
-                logger.info(f"调用NihalGazi TTS API (尝试{attempt+1}/{max_retries}): text=[{cleaned_text[:30]}...], voice={voice}, emotion={emotion_str}")
-                result = self.client.predict(
+        # 记录单句耗时和结果，供引擎路由使用
+        async with engine_router.track("nihal_tts", voice, cleaned_text):
+            # 单飞去重：相同音色、情感和文本的并发请求共享一次上游调用
+            flight_key = tts_singleflight.make_key("nihal_tts", voice, emotion_str, cleaned_text)
+            result_path = await tts_singleflight.run_to_file(
+                flight_key,
+                output_path,
+                lambda path: tts_hedger.run_to_file(
+                    "nihal_tts",
+                    path,
+                    primary=lambda p: self._predict_with_retries(
+                        cleaned_text, voice, emotion_str, use_random_seed, specific_seed, p, max_retries
+                    ),
+                    hedge=lambda p: self._predict_hedged(
+                        cleaned_text, voice, emotion_str, use_random_seed, specific_seed, p
+                    )
+                )
+            )
+            if not result_path:
+                raise Exception("NihalGazi TTS共享结果不可用")
+        return result_path
+
+    async def _predict_with_retries(self, cleaned_text: str, voice: str, emotion_str: str,
+                                    use_random_seed: bool, specific_seed: float,
+                                    output_path: str, max_retries: int = 3) -> str:
+        """调用NihalGazi TTS API并写入输出文件（统一重试策略，失败后重建客户端）"""
+        logger.info(f"调用NihalGazi TTS API: text=[{cleaned_text[:30]}...], voice={voice}, emotion={emotion_str}")
+
+        async def reconnect(attempt: int, error: BaseException):
+            # 重新初始化客户端（只连接一次，重试次数由外层策略统一控制）
+            self.initialized = False
+            if not await self.initialize_client():
+                logger.error("重新初始化客户端失败")
+
+        policy = RetryPolicy("nihal_tts", max_attempts=max_retries, call_timeout=180)
+        return await policy.run(
+            lambda timeout: self._predict_once(
+                self.client, cleaned_text, voice, emotion_str,
+                use_random_seed, specific_seed, output_path, timeout
+            ),
+            on_retry=reconnect
+        )
+
+    async def _predict_hedged(self, cleaned_text: str, voice: str, emotion_str: str,
+                              use_random_seed: bool, specific_seed: float,
+                              output_path: str) -> str:
+        """对冲通道：使用独立的备用客户端发起同一请求"""
+        if self.hedge_client is None:
+            hedge_space = getattr(settings, 'nihal_tts_hedge_space', '') or self.space_name
+            logger.info(f"正在连接NihalGazi TTS备用客户端: {hedge_space}")
+            self.hedge_client = await asyncio.to_thread(Client, hedge_space)
+        policy = RetryPolicy("nihal_tts_hedge", max_attempts=1, call_timeout=180)
+        return await policy.run(
+            lambda timeout: self._predict_once(
+                self.hedge_client, cleaned_text, voice, emotion_str,
+                use_random_seed, specific_seed, output_path, timeout
+            )
+        )
+
+    async def _predict_once(self, client, cleaned_text: str, voice: str, emotion_str: str,
+                            use_random_seed: bool, specific_seed: float,
+                            output_path: str, timeout: Optional[float] = None) -> str:
+        """使用指定客户端调用一次NihalGazi TTS API并写入输出文件"""
+        # predict为同步阻塞调用，放入线程池避免阻塞事件循环；并发数由自适应限制器控制
+        limiter = limiter_registry.get("nihal_tts", initial_limit=settings.tts_max_concurrency)
+        async with limiter.slot():
+            result = await asyncio.wait_for(
+                asyncio.to_thread(
+                    client.predict,
                     prompt=cleaned_text,  # 使用清理后的文本
                     voice=voice,
                     emotion=emotion_str,
                     use_random_seed=use_random_seed,
                     specific_seed=specific_seed,
                     api_name="/text_to_speech_app"
-                )
-
-                # result是一个元组 (音频文件路径, 状态字符串)
-                audio_path, status = result
-                logger.info(f"NihalGazi TTS状态: {status}")
-
-                if audio_path and os.path.exists(audio_path):
-                    # 复制到指定输出路径
-                    import shutil
-                    shutil.copy2(audio_path, output_path)
-                    logger.info(f"音频合成成功: {output_path}")
-                    return output_path
-                else:
-                    raise Exception("NihalGazi TTS返回无效结果")
+                ),
+                timeout=timeout
+            )
 
-            except Exception as e:
-                last_error = e
-                logger.warning(f"第{attempt+1}次尝试失败: {str(e)}")
-
-                if attempt < max_retries - 1:
-                    # 等待后重试（指数退避）
-                    wait_time = 2 ** attempt  # 1s, 2s, 4s...
-                    logger.info(f"等待{wait_time}秒后重试...")
-                    await asyncio.sleep(wait_time)
+        # result是一个元组 (音频文件路径, 状态字符串)
+        audio_path, status = result
+        logger.info(f"NihalGazi TTS状态: {status}")
 
-                    # 重新初始化客户端
-                    self.initialized = False
-                    if not await self.initialize_client():
-                        logger.error("重新初始化客户端失败")
-                        continue
+        if audio_path and os.path.exists(audio_path):
+            # 复制到指定输出路径
+            import shutil
+            shutil.copy2(audio_path, output_path)
+            logger.info(f"音频合成成功: {output_path}")
+            return output_path
 
-        # 所有重试都失败
-        logger.error(f"NihalGazi TTS音频合成失败（已重试{max_retries}次）: {str(last_error)}")
-        raise Exception(f"音频合成失败: {str(last_error)}")
+        raise Exception("NihalGazi TTS返回无效结果")
 
     async def synthesize_script_audio(
         self,
@@ -263,23 +321,31 @@ class NihalTTSService:
             character_voices[char.name] = self.get_voice_for_character(char.voice_description)
             logger.info(f"角色 {char.name} 使用音色: {character_voices[char.name]}")
 
-        # 合成每个对话片段
+        # 合成每个对话片段（启用检查点时跳过重启前已合成的片段）
         audio_files = []
+        checkpoint = get_task_checkpoint()
 
         # 使用固定种子确保角色音色一致性
         base_seed = 42000  # 基础种子
 
         for i, dialogue in enumerate(script.dialogues):
+            report_progress(PROGRESS_SEGMENTS, i, len(script.dialogues))
             voice = character_voices.get(dialogue.character_name, "alloy")
             output_path = os.path.join(task_dir, f"segment_{i:03d}.wav")
 
+            segment_key = TaskCheckpoint.segment_key(f"{voice}|{dialogue.emotion}", dialogue.content)
+            saved_path = checkpoint.get_segment(i, segment_key) if checkpoint else None
+            if saved_path:
+                audio_files.append(saved_path)
+                continue
+
             # 为每个片段计算种子（同角色使用相似种子）
             character_index = list(character_voices.keys()).index(dialogue.character_name) if dialogue.character_name in character_voices else 0
             segment_seed = base_seed + character_index * 1000 + i
 
             try:
                 result_path = await self.synthesize_single_audio(
-                    text=dialogue.content,
+                    text=dialogue.tts_text(),
                     voice=voice,
                     emotion=dialogue.emotion,
                     use_random_seed=False,  # 使用固定种子确保一致性
@@ -289,6 +355,8 @@ class NihalTTSService:
 
                 if result_path and os.path.exists(result_path):
                     audio_files.append(result_path)
+                    if checkpoint:
+                        checkpoint.record_segment(i, segment_key, result_path)
                     logger.info(f"成功合成片段 {i}: {dialogue.character_name}")
                 else:
                     logger.error(f"音频合成失败: {output_path}")
@@ -297,41 +365,30 @@ class NihalTTSService:
                 logger.error(f"片段合成失败 {i}: {dialogue.character_name} - {str(e)}")
                 continue
 
+        report_progress(PROGRESS_SEGMENTS, len(script.dialogues), len(script.dialogues))
+
         if not audio_files:
             raise Exception("所有音频片段合成失败")
 
         # 拼接音频
         final_audio_path = await self.concatenate_audio(audio_files, task_dir, task_id)
 
-        # 清理临时文件
+        # 清理临时文件（启用检查点时由任务完成时统一清理）
         for audio_file in audio_files:
-            try:
-                os.remove(audio_file)
-            except:
-                pass
+            discard_segment_file(audio_file)
 
         return final_audio_path
 
     async def concatenate_audio(self, audio_files: List[str], task_dir: str, task_id: str) -> str:
-        """拼接音频文件"""
+        """拼接音频文件（解码、拼接、音量标准化和导出都在音频进程池中执行）"""
         try:
-            # 加载第一个音频文件
-            combined = AudioSegment.from_file(audio_files[0])
-
-            # 依次拼接其他音频文件
-            for audio_file in audio_files[1:]:
-                if os.path.exists(audio_file):
-                    segment = AudioSegment.from_file(audio_file)
-                    # 添加短暂停顿（500ms）
-                    pause = AudioSegment.silent(duration=500)
-                    combined = combined + pause + segment
-
-            # 标准化音量
-            combined = combined.normalize()
-
-            # 保存最终音频
-            final_path = os.path.join(task_dir, f"podcast_{task_id}.mp3")
-            combined.export(final_path, format="mp3", bitrate="192k")
+            # 片段间添加短暂停顿（500ms），标准化音量后导出
+            final_path = await audio_process_pool.concat_files(
+                audio_files,
+                os.path.join(task_dir, f"podcast_{task_id}.mp3"),
+                pause_duration=500,
+                normalize=True
+            )
 
             logger.info(f"NihalGazi TTS音频拼接完成: {final_path}")
             return final_path
@@ -0,0 +1,89 @@
+"""
+共享预处理缓存
+RAG知识检索和Gemini素材分析的结果只取决于输入（主题+角色 / 背景素材），
+相同输入的任务（批量任务中尤为常见）共享同一次计算：
+- 并发的相同请求只计算一次，其余等待结果（单飞）
+- 计算结果按TTL缓存，稍后提交的相同请求直接复用
+"""
+
+import copy
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from ..core.config import settings
+from ..utils.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# 预处理类型
+KIND_RAG_CONTEXT = "rag_context"
+KIND_ANALYSIS = "analysis"
+
+
+class SharedPreprocessCache:
+    """跨任务共享的预处理结果"""
+
+    def __init__(self, ttl: float = 3600, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Any]]" = OrderedDict()
+        self._flights = SingleFlight()
+        self.stats = {"computed": 0, "cache_hits": 0, "shared_flights": 0}
+
+    @staticmethod
+    def make_key(kind: str, material: str) -> Tuple[str, str]:
+        return kind, hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _lookup(self, key: Tuple[str, str]) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at < time.time():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    async def get_or_compute(self, kind: str, material: str,
+                             producer: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        获取预处理结果，未缓存时调用 producer 计算（结果为None或TTL为0时不缓存，只合并并发请求）
+
+        Args:
+            kind: 预处理类型
+            material: 决定结果的全部输入（序列化后的字符串）
+            producer: 实际计算函数
+        """
+        key = self.make_key(kind, material)
+        found, value = self._lookup(key)
+        if found:
+            self.stats["cache_hits"] += 1
+            logger.info(f"[预处理缓存] 复用{kind}结果")
+            return copy.deepcopy(value)
+
+        value, shared = await self._flights.do(key, lambda: self._compute(key, producer))
+        if shared:
+            self.stats["shared_flights"] += 1
+            return copy.deepcopy(value)
+        return value
+
+    async def _compute(self, key: Tuple[str, str], producer: Callable[[], Awaitable[Any]]) -> Any:
+        value = await producer()
+        self.stats["computed"] += 1
+        if value is not None and self.ttl > 0:
+            # 缓存副本，调用方修改返回值不影响其他任务
+            self._entries[key] = (time.time() + self.ttl, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "in_flight": len(self._flights), **self.stats}
+
+
+preprocess_cache = SharedPreprocessCache(ttl=settings.preprocess_cache_ttl_seconds)
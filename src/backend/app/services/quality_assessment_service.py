@@ -33,6 +33,9 @@ from transformers import pipeline
 import librosa
 import soundfile as sf
 
+from ..utils.shingle_index import find_repeated_texts
+from ..utils.keyword_matcher import get_matcher
+
 class QualityLevel(Enum):
     """质量等级枚举"""
     EXCELLENT = "excellent"  # 优秀 (90-100)
@@ -606,6 +609,14 @@ class PodcastQualityAssessment:
 
         # 检查结构问题
         dialogues = script.get('dialogues', [])
+        for position, source, ratio in find_repeated_texts([d.get('content', '') for d in dialogues]):
+            issues.append({
+                'type': 'repetition',
+                'metric': 'dialogue_repetition',
+                'severity': 'medium',
+                'description': f'第{position + 1}段对话与第{source + 1}段高度重复（{ratio:.0%}）'
+            })
+
         if len(dialogues) < 3:
             issues.append({
                 'type': 'structure',
@@ -624,7 +635,9 @@ class PodcastQualityAssessment:
         for issue in issues:
             metric = issue.get('metric', '')
 
-            if 'content' in metric:
+            if issue.get('type') == 'repetition':
+                suggestions.append("部分对话与前文高度重复，建议重新生成这些段落")
+            elif 'content' in metric:
                 suggestions.append("建议增加更多专业观点和深入分析")
             elif 'dialogue' in metric:
                 suggestions.append("建议加强角色间的互动和回应")
@@ -760,13 +773,10 @@ class PodcastQualityAssessment:
 
         # 检查开头吸引力
         first_dialogue = dialogues[0].get('content', '')
-        attraction_keywords = ['有趣', '惊人', '令人', '想象', '发现', '揭秘', '探讨']
+        attraction_matcher = get_matcher(('有趣', '惊人', '令人', '想象', '发现', '揭秘', '探讨'))
 
         attraction_score = 60.0  # 基础分数
-
-        for keyword in attraction_keywords:
-            if keyword in first_dialogue:
-                attraction_score += 8
+        attraction_score += 8 * len(attraction_matcher.matched(first_dialogue))
 
         # 检查问题引导
         questions = sum(1 for d in dialogues if '？' in d.get('content', '') or '?' in d.get('content', ''))
@@ -800,13 +810,10 @@ class PodcastQualityAssessment:
         entertainment_score = 60.0  # 基础分数
 
         # 检查娱乐性元素
-        entertainment_keywords = ['有趣', '好玩', '搞笑', '幽默', '惊喜', '奇特', '神奇']
+        entertainment_matcher = get_matcher(('有趣', '好玩', '搞笑', '幽默', '惊喜', '奇特', '神奇'))
 
         for dialogue in dialogues:
-            content = dialogue.get('content', '')
-            for keyword in entertainment_keywords:
-                if keyword in content:
-                    entertainment_score += 5
+            entertainment_score += 5 * len(entertainment_matcher.matched(dialogue.get('content', '')))
 
         return min(100.0, max(0.0, entertainment_score))
 
@@ -818,13 +825,10 @@ class PodcastQualityAssessment:
         value_score = 70.0  # 基础分数
 
         # 检查价值性元素
-        value_keywords = ['学习', '启发', '思考', '建议', '方法', '经验', '教训', '收获']
+        value_matcher = get_matcher(('学习', '启发', '思考', '建议', '方法', '经验', '教训', '收获'))
 
         for dialogue in dialogues:
-            content = dialogue.get('content', '')
-            for keyword in value_keywords:
-                if keyword in content:
-                    value_score += 4
+            value_score += 4 * len(value_matcher.matched(dialogue.get('content', '')))
 
         return min(100.0, max(0.0, value_score))
 
@@ -16,6 +16,15 @@ from ..models.podcast import PodcastScript, CharacterRole
 from ..core.config import settings
 from ..utils.text_cleaner import clean_for_tts
 from .voice_resolver_service import voice_resolver
+from .tts_singleflight import tts_singleflight
+from .tts_hedging import tts_hedger
+from .adaptive_limiter import limiter_registry
+from .engine_router import engine_router
+from .retry_policy import RetryPolicy
+from .audio_process_pool import audio_process_pool
+from .task_checkpoint import TaskCheckpoint, get_task_checkpoint, discard_segment_file
+from .task_context import report_progress
+from .task_progress import PROGRESS_SEGMENTS
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +34,7 @@ class Qwen3TTSService:
 
     def __init__(self):
         self.client = None
+        self.hedge_client = None  # 对冲请求使用的备用客户端（按需创建）
         self.space_name = getattr(settings, 'qwen3_tts_space', "Qwen/Qwen3-TTS-Demo")
         self.initialized = False
 
@@ -145,29 +155,75 @@ class Qwen3TTSService:
             if cleaned_text != text:
                 logger.info(f"文本清理: [{text[:50]}...] -> [{cleaned_text[:50]}...]")
 
-            # 调用Qwen3-TTS API
-            logger.info(f"调用Qwen3-TTS API: text=[{cleaned_text[:30]}...], voice={voice}")
-            result = self.client.predict(
-                text=cleaned_text,  # 使用清理后的文本
-                voice_display=voice,
-                language_display="Auto / 自动",  # 自动检测语言
-                api_name="/tts_interface"
-            )
-
-            # result是音频文件路径
-            if result and os.path.exists(result):
-                # 复制到指定输出路径
-                import shutil
-                shutil.copy2(result, output_path)
-                logger.info(f"音频合成成功: {output_path}")
-                return output_path
-            else:
-                raise Exception("Qwen3-TTS返回无效结果")
+            # 记录单句耗时和结果，供引擎路由使用
+            async with engine_router.track("qwen3_tts", voice, cleaned_text):
+                # 单飞去重：相同音色和文本的并发请求共享一次上游调用
+                flight_key = tts_singleflight.make_key("qwen3_tts", voice, None, cleaned_text)
+                result_path = await tts_singleflight.run_to_file(
+                    flight_key,
+                    output_path,
+                    lambda path: tts_hedger.run_to_file(
+                        "qwen3_tts",
+                        path,
+                        primary=lambda p: self._predict_with_retries(cleaned_text, voice, p),
+                        hedge=lambda p: self._predict_hedged(cleaned_text, voice, p)
+                    )
+                )
+                if not result_path:
+                    raise Exception("Qwen3-TTS共享结果不可用")
+            return result_path
 
         except Exception as e:
             logger.error(f"Qwen3-TTS音频合成失败: {str(e)}")
             raise Exception(f"音频合成失败: {str(e)}")
 
+    async def _predict_hedged(self, cleaned_text: str, voice: str, output_path: str) -> str:
+        """对冲通道：使用独立的备用客户端发起同一请求"""
+        if self.hedge_client is None:
+            hedge_space = getattr(settings, 'qwen3_tts_hedge_space', '') or self.space_name
+            logger.info(f"正在连接Qwen3-TTS备用客户端: {hedge_space}")
+            self.hedge_client = await asyncio.to_thread(Client, hedge_space)
+        policy = RetryPolicy("qwen3_tts_hedge", max_attempts=1, call_timeout=180)
+        return await policy.run(
+            lambda timeout: self._predict_to_file(self.hedge_client, cleaned_text, voice, output_path, timeout)
+        )
+
+    async def _predict_with_retries(self, cleaned_text: str, voice: str, output_path: str) -> str:
+        """主通道：调用Qwen3-TTS API并写入输出文件（统一重试策略）"""
+        policy = RetryPolicy("qwen3_tts", max_attempts=3, call_timeout=180)
+        return await policy.run(
+            lambda timeout: self._predict_to_file(self.client, cleaned_text, voice, output_path, timeout)
+        )
+
+    async def _predict_to_file(self, client, cleaned_text: str, voice: str, output_path: str,
+                               timeout: Optional[float] = None) -> str:
+        """使用指定客户端调用Qwen3-TTS API并写入输出文件"""
+        logger.info(f"调用Qwen3-TTS API: text=[{cleaned_text[:30]}...], voice={voice}")
+
+        # predict为同步阻塞调用，放入线程池避免阻塞事件循环；并发数由自适应限制器控制
+        limiter = limiter_registry.get("qwen3_tts", initial_limit=settings.tts_max_concurrency)
+        async with limiter.slot():
+            result = await asyncio.wait_for(
+                asyncio.to_thread(
+                    client.predict,
+                    text=cleaned_text,  # 使用清理后的文本
+                    voice_display=voice,
+                    language_display="Auto / 自动",  # 自动检测语言
+                    api_name="/tts_interface"
+                ),
+                timeout=timeout
+            )
+
+        # result是音频文件路径
+        if result and os.path.exists(result):
+            # 复制到指定输出路径
+            import shutil
+            shutil.copy2(result, output_path)
+            logger.info(f"音频合成成功: {output_path}")
+            return output_path
+
+        raise Exception("Qwen3-TTS返回无效结果")
+
     async def synthesize_script_audio(self, script: PodcastScript, characters: List[CharacterRole],
                                      task_id: str, atmosphere: str = "轻松幽默",
                                      enable_effects: bool = True, enable_bgm: bool = True) -> str:
@@ -185,22 +241,32 @@ class Qwen3TTSService:
             character_voices[char.name] = self.get_voice_for_character(char.voice_description)
             logger.info(f"角色 {char.name} 使用音色: {character_voices[char.name]}")
 
-        # 合成每个对话片段
+        # 合成每个对话片段（启用检查点时跳过重启前已合成的片段）
         audio_files = []
+        checkpoint = get_task_checkpoint()
 
         for i, dialogue in enumerate(script.dialogues):
+            report_progress(PROGRESS_SEGMENTS, i, len(script.dialogues))
             voice = character_voices.get(dialogue.character_name, "Cherry / 芊悦")
             output_path = os.path.join(task_dir, f"segment_{i:03d}.wav")
 
+            segment_key = TaskCheckpoint.segment_key(voice, dialogue.content)
+            saved_path = checkpoint.get_segment(i, segment_key) if checkpoint else None
+            if saved_path:
+                audio_files.append(saved_path)
+                continue
+
             try:
                 result_path = await self.synthesize_single_audio(
-                    text=dialogue.content,
+                    text=dialogue.tts_text(),
                     voice=voice,
                     output_path=output_path
                 )
 
                 if result_path and os.path.exists(result_path):
                     audio_files.append(result_path)
+                    if checkpoint:
+                        checkpoint.record_segment(i, segment_key, result_path)
                     logger.info(f"成功合成片段 {i}: {dialogue.character_name}")
                 else:
                     logger.error(f"音频合成失败: {output_path}")
@@ -209,41 +275,30 @@ class Qwen3TTSService:
                 logger.error(f"片段合成失败 {i}: {dialogue.character_name} - {str(e)}")
                 continue
 
+        report_progress(PROGRESS_SEGMENTS, len(script.dialogues), len(script.dialogues))
+
         if not audio_files:
             raise Exception("所有音频片段合成失败")
 
         # 拼接音频
         final_audio_path = await self.concatenate_audio(audio_files, task_dir, task_id)
 
-        # 清理临时文件
+        # 清理临时文件（启用检查点时由任务完成时统一清理）
         for audio_file in audio_files:
-            try:
-                os.remove(audio_file)
-            except:
-                pass
+            discard_segment_file(audio_file)
 
         return final_audio_path
 
     async def concatenate_audio(self, audio_files: List[str], task_dir: str, task_id: str) -> str:
-        """拼接音频文件"""
+        """拼接音频文件（解码、拼接、音量标准化和导出都在音频进程池中执行）"""
         try:
-            # 加载第一个音频文件
-            combined = AudioSegment.from_file(audio_files[0])
-
-            # 依次拼接其他音频文件
-            for audio_file in audio_files[1:]:
-                if os.path.exists(audio_file):
-                    segment = AudioSegment.from_file(audio_file)
-                    # 添加短暂停顿（500ms）
-                    pause = AudioSegment.silent(duration=500)
-                    combined = combined + pause + segment
-
-            # 标准化音量
-            combined = combined.normalize()
-
-            # 保存最终音频
-            final_path = os.path.join(task_dir, f"podcast_{task_id}.mp3")
-            combined.export(final_path, format="mp3", bitrate="192k")
+            # 片段间添加短暂停顿（500ms），标准化音量后导出
+            final_path = await audio_process_pool.concat_files(
+                audio_files,
+                os.path.join(task_dir, f"podcast_{task_id}.mp3"),
+                pause_duration=500,
+                normalize=True
+            )
 
             logger.info(f"Qwen3-TTS音频拼接完成: {final_path}")
             return final_path
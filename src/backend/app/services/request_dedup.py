@@ -0,0 +1,160 @@
+"""
+请求幂等与结果缓存
+按"租户 + 规范化定制单 + 引擎配置"计算请求指纹：
+- 相同指纹的任务正在执行时直接返回该任务（重试、重复点击、批量演示）
+- 已完成的结果按TTL缓存，重复请求立即返回
+- 客户端可通过 Idempotency-Key 请求头显式声明幂等，同一key对应不同请求内容时拒绝
+指纹和 Idempotency-Key 都按租户隔离，一个租户拿不到其他租户的任务ID
+"""
+
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from ..core.config import settings
+
+
+class IdempotencyConflict(Exception):
+    """同一个 Idempotency-Key 被用于内容不同的请求"""
+
+
+def _normalize(value: Any) -> Any:
+    """规范化：字符串去首尾空白并合并连续空白，丢弃空值"""
+    if isinstance(value, str):
+        return re.sub(r'\s+', ' ', value).strip()
+    if isinstance(value, dict):
+        normalized = {key: _normalize(item) for key, item in value.items()}
+        return {key: item for key, item in normalized.items() if item not in (None, "", [], {})}
+    if isinstance(value, list):
+        return [_normalize(item) for item in value]
+    return value
+
+
+def _engine_config() -> Dict[str, Any]:
+    """影响生成结果的引擎配置：配置变化后相同定制单也应重新生成"""
+    return {
+        "tts_engine": settings.tts_engine,
+        "tts_routing_enabled": settings.tts_routing_enabled,
+        "tts_routing_engines": settings.tts_routing_engines,
+        "llm_model": settings.deepseek_model,
+        "script_generation_mode": settings.script_generation_mode,
+        "analysis_model": settings.gemini_model,
+        "rag_enabled": settings.rag_enabled,
+        "enable_audio_generation": settings.enable_audio_generation,
+    }
+
+
+def form_fingerprint(form, tenant: str) -> str:
+    """计算定制单指纹（PodcastCustomForm 规范化后连同租户和引擎配置取SHA-256）"""
+    payload = {
+        "tenant": tenant,
+        "form": _normalize(form.model_dump(mode="json")),
+        "engine": _engine_config()
+    }
+    encoded = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class RequestDeduplicator:
+    """进行中任务索引、Idempotency-Key 索引与已完成结果的TTL缓存"""
+
+    def __init__(self, result_ttl: float = 86400, key_ttl: float = 86400, max_results: int = 500):
+        self.result_ttl = result_ttl
+        self.key_ttl = key_ttl
+        self.max_results = max_results
+        self._in_flight: Dict[str, str] = {}  # 指纹 -> task_id
+        self._keys: Dict[Tuple[str, str], Tuple[str, str, float]] = {}  # (租户, key) -> (指纹, task_id, 过期时间)
+        self._results: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()  # 指纹 -> 结果
+        self._lock = threading.Lock()
+        self.stats = {"in_flight_hits": 0, "result_hits": 0, "key_hits": 0}
+
+    # ---------- 查询 ----------
+
+    def task_for_key(self, tenant: str, idempotency_key: str, fingerprint: str) -> Optional[str]:
+        """按租户的 Idempotency-Key 查找任务（key 已用于不同内容时抛出 IdempotencyConflict）"""
+        with self._lock:
+            entry = self._keys.get((tenant, idempotency_key))
+            if entry is None:
+                return None
+            key_fingerprint, task_id, expires_at = entry
+            if expires_at < time.time():
+                del self._keys[(tenant, idempotency_key)]
+                return None
+            if key_fingerprint != fingerprint:
+                raise IdempotencyConflict("Idempotency-Key 已用于内容不同的请求")
+            self.stats["key_hits"] += 1
+            return task_id
+
+    def task_in_flight(self, fingerprint: str) -> Optional[str]:
+        """相同指纹的进行中任务"""
+        with self._lock:
+            task_id = self._in_flight.get(fingerprint)
+            if task_id:
+                self.stats["in_flight_hits"] += 1
+            return task_id
+
+    def get_result(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """未过期的已完成结果：{"task_id", "script", "audio_path"}"""
+        with self._lock:
+            entry = self._results.get(fingerprint)
+            if entry is None:
+                return None
+            if entry["expires_at"] < time.time():
+                del self._results[fingerprint]
+                return None
+            self._results.move_to_end(fingerprint)
+            self.stats["result_hits"] += 1
+            return entry
+
+    # ---------- 登记 ----------
+
+    def register(self, fingerprint: str, task_id: str, tenant: str, idempotency_key: Optional[str] = None):
+        """登记新建（或恢复）的进行中任务"""
+        with self._lock:
+            self._in_flight[fingerprint] = task_id
+            if idempotency_key:
+                now = time.time()
+                if len(self._keys) >= 1000:
+                    # 顺带清理过期的key
+                    self._keys = {key: entry for key, entry in self._keys.items() if entry[2] >= now}
+                self._keys[(tenant, idempotency_key)] = (fingerprint, task_id, now + self.key_ttl)
+
+    def store_result(self, fingerprint: str, task_id: str, script: Optional[Dict[str, Any]],
+                     audio_path: Optional[str]):
+        """任务完成：移出进行中索引并写入结果缓存"""
+        with self._lock:
+            if self._in_flight.get(fingerprint) == task_id:
+                del self._in_flight[fingerprint]
+            self._results[fingerprint] = {
+                "task_id": task_id,
+                "script": script,
+                "audio_path": audio_path,
+                "expires_at": time.time() + self.result_ttl
+            }
+            self._results.move_to_end(fingerprint)
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+
+    def forget(self, fingerprint: str, task_id: str):
+        """任务失败或取消：后续相同请求重新生成"""
+        with self._lock:
+            if self._in_flight.get(fingerprint) == task_id:
+                del self._in_flight[fingerprint]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._in_flight),
+            "cached_results": len(self._results),
+            "idempotency_keys": len(self._keys),
+            **self.stats
+        }
+
+
+request_deduplicator = RequestDeduplicator(
+    result_ttl=settings.result_cache_ttl_seconds,
+    key_ttl=settings.idempotency_key_ttl_seconds
+)
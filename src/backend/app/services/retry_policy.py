@@ -0,0 +1,158 @@
+"""
+统一重试策略
+所有远端调用（TTS引擎、Gradio客户端初始化、Gemini、LLM）共用的重试子系统：
+- 单次调用超时取 min(调用超时, 任务剩余时间)
+- 指数退避 + 全抖动（full jitter）
+- 全局重试预算，防止故障期间重试流量放大
+- 任务已无法在截止时间内完成时立即停止重试
+"""
+
+import asyncio
+import logging
+import random
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from ..core.config import settings
+from .task_context import get_task_context, raise_if_cancelled
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(Exception):
+    """任务剩余时间不足以完成本次调用"""
+
+
+class RetryBudget:
+    """全局重试预算（令牌桶）：每次首发调用存入 ratio 个令牌，每次重试消耗1个"""
+
+    def __init__(self, ratio: float = 0.2, min_tokens: float = 10.0, max_tokens: float = 100.0):
+        self.ratio = ratio
+        self.max_tokens = max(min_tokens, max_tokens)
+        self._tokens = float(min_tokens)
+        self._lock = threading.Lock()
+        self.stats = {"retries": 0, "denied": 0}
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                self.stats["retries"] += 1
+                return True
+            self.stats["denied"] += 1
+            return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"tokens": round(self._tokens, 2), **self.stats}
+
+
+retry_budget = RetryBudget(
+    ratio=settings.retry_budget_ratio,
+    min_tokens=settings.retry_budget_min_tokens
+)
+
+
+class RetryPolicy:
+    """单类远端调用的重试策略"""
+
+    def __init__(self, name: str, max_attempts: int = 3, base_delay: float = 1.0,
+                 max_delay: float = 8.0, call_timeout: Optional[float] = None,
+                 min_call_timeout: float = 5.0, budget: Optional[RetryBudget] = None):
+        """
+        Args:
+            name: 策略名称（用于日志）
+            max_attempts: 最大尝试次数（含首次）
+            base_delay: 退避基数（秒）
+            max_delay: 单次退避上限（秒）
+            call_timeout: 单次调用超时（秒），None表示只受任务截止时间约束
+            min_call_timeout: 剩余时间低于此值时不再发起调用
+            budget: 重试预算，默认使用全局预算
+        """
+        self.name = name
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.call_timeout = call_timeout
+        self.min_call_timeout = min_call_timeout
+        self.budget = budget or retry_budget
+
+    def _attempt_timeout(self) -> Optional[float]:
+        """根据任务剩余时间计算本次调用的超时"""
+        context = get_task_context()
+        remaining = context.remaining() if context else None
+
+        if remaining is not None and remaining < self.min_call_timeout:
+            raise DeadlineExceeded(
+                f"[{self.name}] 任务 {context.task_id} 剩余 {max(0.0, remaining):.1f}s，不足以发起调用"
+            )
+
+        if remaining is None:
+            return self.call_timeout
+        if self.call_timeout is None:
+            return remaining
+        return min(self.call_timeout, remaining)
+
+    def _backoff(self, attempt: int) -> float:
+        # 全抖动：在 [0, min(上限, 基数*2^n)] 内均匀取值，避免多个任务同步重试
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def run(self, func: Callable[[Optional[float]], Awaitable[T]],
+                  retry_on: Optional[Callable[[BaseException], bool]] = None,
+                  on_retry: Optional[Callable[[int, BaseException], Awaitable[None]]] = None) -> T:
+        """
+        执行带重试的调用
+
+        Args:
+            func: 异步调用，参数为本次尝试的超时秒数（None表示不限），由调用方在
+                  并发限制名额内自行应用超时，使超时能被自适应限流器感知
+            retry_on: 判断异常是否可重试，默认所有异常都可重试
+            on_retry: 重试前的回调（如重建客户端），参数为 (已失败次数, 异常)
+
+        Returns:
+            调用结果
+        """
+        self.budget.deposit()
+
+        for attempt in range(self.max_attempts):
+            raise_if_cancelled()
+            timeout = self._attempt_timeout()
+            try:
+                return await func(timeout)
+
+            except (asyncio.CancelledError, DeadlineExceeded):
+                raise
+            except Exception as error:
+                if isinstance(error, asyncio.TimeoutError):
+                    logger.warning(f"[{self.name}] 第{attempt + 1}次调用超时 ({timeout or 0:.1f}s)")
+                else:
+                    logger.warning(f"[{self.name}] 第{attempt + 1}次调用失败: {str(error)[:200]}")
+
+                if attempt >= self.max_attempts - 1:
+                    raise
+                if retry_on is not None and not retry_on(error):
+                    raise
+
+                delay = self._backoff(attempt)
+                context = get_task_context()
+                remaining = context.remaining() if context else None
+                if remaining is not None and remaining < delay + self.min_call_timeout:
+                    logger.warning(f"[{self.name}] 任务剩余时间不足，停止重试")
+                    raise DeadlineExceeded(f"[{self.name}] 任务剩余时间不足，停止重试: {error}") from error
+
+                if not self.budget.withdraw():
+                    logger.warning(f"[{self.name}] 全局重试预算耗尽，停止重试")
+                    raise
+
+                logger.info(f"[{self.name}] {delay:.1f}秒后进行第{attempt + 2}次尝试")
+                await asyncio.sleep(delay)
+
+                if on_retry is not None:
+                    await on_retry(attempt + 1, error)
+
+        raise RuntimeError(f"[{self.name}] 重试循环异常退出")
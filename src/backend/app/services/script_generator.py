@@ -1,12 +1,96 @@
+import asyncio
+import time
 import openai
 import google.generativeai as genai
 import json
 import re
-from typing import Dict, Any, List, Optional
+from typing import Callable, Dict, Any, List, Optional, Tuple
 from ..models.podcast import PodcastCustomForm, PodcastScript, ScriptDialogue
 from ..core.config import settings
+from ..core.http_clients import http_clients
 from .rag_knowledge_service import RAGKnowledgeService
 from ..utils.text_cleaner import clean_for_tts
+from ..utils.json_stream import DialogueStreamParser, extract_dialogues, loads_tolerant
+from ..utils.shingle_index import ShingleIndex
+from ..utils.keyword_matcher import get_matcher
+from .adaptive_limiter import limiter_registry, is_overload_error
+from .retry_policy import RetryPolicy
+from .task_checkpoint import (
+    get_task_checkpoint, STAGE_RAG_CONTEXT, STAGE_ANALYSIS, STAGE_SCRIPT_ROUNDS
+)
+from .task_context import report_progress, report_dialogues
+from .task_progress import PROGRESS_SCRIPT_WORDS
+from .preprocess_cache import preprocess_cache, KIND_RAG_CONTEXT, KIND_ANALYSIS
+from .llm_usage import llm_usage
+from .llm_router import llm_router, LLMEndpoint, parse_llm_endpoints
+from .llm_cache import llm_cache, KIND_MATERIAL_ANALYSIS, KIND_STRUCTURE_PLAN, KIND_ENDING, KIND_FAREWELL
+
+
+# 剧本生成模式
+SCRIPT_MODE_SEQUENTIAL = "sequential"  # 逐轮续写
+SCRIPT_MODE_PARALLEL_STAGES = "parallel_stages"  # 先规划阶段，再并发生成各阶段
+
+ANALYSIS_LIST_FIELDS = (
+    "key_arguments",
+    "supporting_data_or_examples",
+    "potential_counterarguments",
+    "discussion_questions",
+    "podcast_hooks",
+)
+
+
+def _split_materials(text: str, chunk_chars: int, max_chunks: int) -> List[str]:
+    """按段落把长素材切分为不超过 chunk_chars 字符的分片（分片数超过 max_chunks 时放大分片）"""
+    text = text.strip()
+    if chunk_chars <= 0 or len(text) <= chunk_chars:
+        return [text]
+    if max_chunks > 0:
+        chunk_chars = max(chunk_chars, -(-len(text) // max_chunks))
+
+    # 先按段落，过长的段落再按句子切分
+    pieces: List[str] = []
+    for paragraph in re.split(r'\n\s*\n', text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= chunk_chars:
+            pieces.append(paragraph)
+            continue
+        for sentence in re.split(r'(?<=[。！？!?；;.])\s*', paragraph):
+            while len(sentence) > chunk_chars:
+                pieces.append(sentence[:chunk_chars])
+                sentence = sentence[chunk_chars:]
+            if sentence:
+                pieces.append(sentence)
+
+    chunks: List[str] = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + len(piece) + 2 > chunk_chars:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    if max_chunks > 0 and len(chunks) > max_chunks:
+        # 段落边界导致分片偏多时放大分片重新切分
+        return _split_materials(text, int(chunk_chars * 1.25) + 1, max_chunks)
+    return chunks
+
+
+def _merge_analyses(partials: List[Dict[str, Any]], max_items: int = 6) -> Dict[str, Any]:
+    """本地合并分段分析结果（reduce 调用失败时使用）：主张取第一段，列表字段按段轮流取并去重"""
+    merged: Dict[str, Any] = {"main_thesis": partials[0].get("main_thesis", "")}
+    for field in ANALYSIS_LIST_FIELDS:
+        columns = [partial.get(field) or [] for partial in partials]
+        items: List[Any] = []
+        for row in range(max(len(column) for column in columns)):
+            for column in columns:
+                if row < len(column) and column[row] not in items:
+                    items.append(column[row])
+        merged[field] = items[:max_items]
+    return merged
 
 
 class FallbackResponse:
@@ -27,16 +111,23 @@ class FallbackMessage:
         self.content = content
 
 
+class StreamedResponse(FallbackResponse):
+    """流式输出拼接后的响应（与非流式响应的读取方式一致）"""
+    def __init__(self, content: str, usage: Any = None, time_to_first_token: Optional[float] = None):
+        super().__init__(content)
+        self.usage = usage
+        self.time_to_first_token = time_to_first_token
+
+
 class FallbackCompletions:
     """回退聊天完成服务"""
     async def create(self, model: str, messages: List[Dict], temperature: float = 0.8, **kwargs):
         """生成回退内容"""
-        # 获取用户的输入
+        # 获取本轮用户的输入（多轮对话时取最后一条用户消息）
         user_input = ""
         for message in messages:
             if message.get("role") == "user":
                 user_input = message.get("content", "")
-                break
 
         # 从输入中提取角色信息
         characters = self._extract_characters(user_input)
@@ -151,13 +242,32 @@ class FallbackClient:
         self.completions = FallbackCompletions()
 
 
+class GenerationState:
+    """
+    单次剧本生成的状态化循环状态
+
+    ScriptGenerator 由任务管理器的多个工作协程和批量任务共用，每次 generate_script
+    新建一个状态对象并沿调用链传递，并发生成的剧本互不干扰
+    """
+
+    def __init__(self, characters_list: List[str], target_word_count: int):
+        self.conversation_history: List[ScriptDialogue] = []
+        self.characters_list: List[str] = characters_list
+        self.current_speaker_index: int = 0
+        self.target_word_count: int = target_word_count
+        self.current_word_count: int = 0
+        self.chat_messages: List[Dict[str, str]] = []  # 系统提示词 + 已完成的对话轮次
+        self.token_usage: List[Dict[str, Any]] = []  # 本次生成每次LLM调用的Token用量
+        self.repetition_index = ShingleIndex()  # 对话历史的重复检测索引
+
+
 class ScriptGenerator:
     def __init__(self):
         # 配置Gemini用于素材分析
         if settings.gemini_api_key:
             genai.configure(api_key=settings.gemini_api_key)
 
-        # 配置DeepSeek用于剧本生成
+        # 配置剧本生成的LLM端点（主端点 + LLM_ENDPOINTS 中的额外端点，由路由器按延迟和健康状态选择）
         # 临时强制使用回退模式，避免Gradio Space问题
         use_gradio = False  # 强制禁用
 
@@ -165,129 +275,229 @@ class ScriptGenerator:
             # 使用Gradio Space模式
             try:
                 from .gradio_adapter import MockOpenAIClient
-                self.deepseek_client = MockOpenAIClient(
-                    api_key="gradio_mode",
-                    base_url="gradio_mode"
-                )
+                llm_router.add_endpoint(LLMEndpoint(
+                    "gradio",
+                    MockOpenAIClient(api_key="gradio_mode", base_url="gradio_mode"),
+                    model=settings.deepseek_model,
+                    base_url=settings.gradio_space_name
+                ))
                 print("使用Gradio Space模式")
             except ImportError:
                 print("Gradio适配器导入失败，回退到标准API模式")
-                # 如果没有配置有效的DeepSeek密钥，使用一个默认的错误处理客户端
-                self.deepseek_client = self._create_fallback_client()
         else:
-            # 使用标准OpenAI兼容API模式或回退模式
-            # 定义无效的API key列表（仅占位符）
-            invalid_keys = [
-                "",
-                "your_actual_deepseek_api_key_here",
-                "your_valid_hunyuan_api_key_here",
-                "your_openai_api_key_here"
-            ]
+            # 使用标准OpenAI兼容API模式
+            self._add_openai_endpoint("primary", settings.deepseek_api_key, settings.deepseek_base_url,
+                                      settings.deepseek_model)
+            for config in parse_llm_endpoints(settings.llm_endpoints):
+                self._add_openai_endpoint(config["name"], config["api_key"], config["base_url"],
+                                          config["model"], config.get("max_concurrency"))
+
+        if llm_router.endpoints:
+            print(f"[配置] LLM端点: {', '.join(endpoint.name for endpoint in llm_router.endpoints)}")
+        else:
+            print("[配置] 未配置有效API Key，使用回退模板模式")
 
-            # 检查API key是否有效
-            if settings.deepseek_api_key and settings.deepseek_api_key not in invalid_keys:
-                try:
-                    # 使用异步客户端（AsyncOpenAI）用于异步函数
-                    self.deepseek_client = openai.AsyncOpenAI(
-                        api_key=settings.deepseek_api_key,
-                        base_url=settings.deepseek_base_url
-                    )
-                    print(f"[配置] 使用腾讯混元API模式（异步）")
-                    print(f"[配置] Base URL: {settings.deepseek_base_url}")
-                    print(f"[配置] Model: {settings.deepseek_model}")
-                    print(f"[配置] API Key (前10位): {settings.deepseek_api_key[:10]}...")
-                except Exception as e:
-                    print(f"[错误] API客户端初始化失败: {str(e)}")
-                    print("[回退] 使用模板模式")
-                    self.deepseek_client = self._create_fallback_client()
-            else:
-                print("[配置] 未配置有效API Key，使用回退模板模式")
-                self.deepseek_client = self._create_fallback_client()
+        # 所有端点都不可用时使用的模板客户端
+        self.fallback_client = self._create_fallback_client()
 
         # 初始化RAG知识库服务
         self.rag_service = RAGKnowledgeService()
 
-        # 状态化循环生成相关属性
-        self.conversation_history: List[ScriptDialogue] = []
-        self.characters_list: List[str] = []
-        self.current_speaker_index: int = 0
-        self.target_word_count: int = 0
-        self.current_word_count: int = 0
 
-        # 性能优化：缓存机制
-        self._rag_cache = {}  # RAG检索结果缓存
-        self._structure_cache = {}  # 结构规划缓存
-        self._cache_max_size = 50  # 最大缓存条目数
-        self._cache_enabled = True  # 是否启用缓存
-
-    def _get_cache_key(self, prefix: str, *args) -> str:
-        """生成缓存键"""
-        import hashlib
-        content = prefix + "_" + "_".join(str(arg) for arg in args)
-        return hashlib.md5(content.encode()).hexdigest()
-
-    def _get_from_cache(self, cache_dict: dict, key: str):
-        """从缓存获取数据"""
-        if not self._cache_enabled:
-            return None
-        return cache_dict.get(key)
-
-    def _set_to_cache(self, cache_dict: dict, key: str, value: Any):
-        """设置缓存数据"""
-        if not self._cache_enabled:
+    def _add_openai_endpoint(self, name: str, api_key: str, base_url: str, model: str,
+                             max_concurrency: Optional[int] = None):
+        """注册一个OpenAI兼容端点（API Key为空或仍是占位符时跳过）"""
+        # 定义无效的API key列表（仅占位符）
+        invalid_keys = [
+            "",
+            "your_actual_deepseek_api_key_here",
+            "your_valid_hunyuan_api_key_here",
+            "your_openai_api_key_here"
+        ]
+        if not api_key or api_key in invalid_keys:
+            return
+
+        try:
+            # 使用异步客户端（AsyncOpenAI）用于异步函数
+            client = openai.AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                http_client=http_clients.get_async_client(base_url)
+            )
+        except Exception as e:
+            print(f"[错误] LLM端点 {name} 客户端初始化失败: {str(e)}")
             return
 
-        # 简单的LRU策略：如果缓存满了，清除最旧的一半
-        if len(cache_dict) >= self._cache_max_size:
-            keys_to_remove = list(cache_dict.keys())[:self._cache_max_size // 2]
-            for k in keys_to_remove:
-                del cache_dict[k]
+        llm_router.add_endpoint(LLMEndpoint(name, client, model=model, base_url=base_url,
+                                            max_concurrency=max_concurrency))
+        print(f"[配置] LLM端点 {name}: {base_url} ({model})，API Key (前10位): {api_key[:10]}...")
+
+    def _llm_cache_key(self, kind: str, prompt: str, temperature: float, model: str) -> str:
+        """剧本LLM调用的持久缓存键（按实际提供服务的模型区分，模型或温度变化时不复用）"""
+        return llm_cache.make_key(kind, model, prompt, temperature=temperature)
+
+    async def _llm_cache_lookup(self, kind: str, prompt: str, temperature: float) -> Optional[Any]:
+        """按已配置端点的模型依次查找持久缓存（任一端点的模型生成过相同提示词即可复用）"""
+        for model in dict.fromkeys(endpoint.model for endpoint in llm_router.endpoints):
+            cached = await llm_cache.get(kind, self._llm_cache_key(kind, prompt, temperature, model))
+            if cached is not None:
+                return cached
+        return None
+
+    async def _invoke_chat_completion(self, state: GenerationState, messages, temperature: float = 0.7,
+                                      model: Optional[str] = None, usage_label: str = "other",
+                                      on_dialogues: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+                                      **kwargs) -> Tuple[Any, Optional[str]]:
+        """统一的聊天补全调用，记录Token用量（按 usage_label 分类）
+
+        Returns:
+            (响应, 实际提供服务的模型)，本次调用回退到模板客户端时模型为None
+        """
+        started = time.monotonic()
+        response, served_model = await self._request_chat_completion(
+            messages, temperature, model, on_dialogues, **kwargs
+        )
+        usage = llm_usage.record(usage_label, response, time.monotonic() - started)
+        state.token_usage.append(usage)
+        if usage["prompt_tokens"]:
+            print(f"[Token] {usage_label}: 输入{usage['prompt_tokens']}（缓存命中{usage['cached_tokens']}），"
+                  f"输出{usage['completion_tokens']}，耗时{usage['latency_ms']}ms")
+        return response, served_model
+
+    async def _generate_dialogue_turn(self, state: GenerationState, user_content: str,
+                                      temperature: float = 0.7,
+                                      usage_label: str = "round") -> List[Dict[str, Any]]:
+        """在剧本对话中追加一轮：固定的系统提示词 + 已有轮次 + 本轮用户消息
+
+        Returns:
+            本轮解析出的对话（流式输出时边生成边上报草稿）
+
+        Raises:
+            ValueError: 响应中没有可解析的对话（该轮不追加到对话轮次中）
+        """
+        messages = state.chat_messages + [{"role": "user", "content": user_content}]
 
-        cache_dict[key] = value
+        def on_dialogues(drafts: List[Dict[str, Any]]):
+            report_dialogues(state.conversation_history + drafts)
 
-    async def _invoke_chat_completion(self, messages, temperature: float = 0.7,
-                                      model: Optional[str] = None, **kwargs):
-        """统一的聊天补全调用，自动处理连接异常并回退模板客户端"""
+        response, _ = await self._invoke_chat_completion(
+            state, messages, temperature=temperature, usage_label=usage_label, on_dialogues=on_dialogues
+        )
+        result_text = response.choices[0].message.content
+        dialogues = extract_dialogues(result_text)
+        if not dialogues:
+            raise ValueError(f"响应中没有可解析的对话: {result_text[:200]}")
+
+        state.chat_messages = messages + [{"role": "assistant", "content": result_text}]
+        return dialogues
+
+    async def _stream_chat_completion(self, client: Any, request: Dict[str, Any],
+                                      on_dialogues: Callable[[List[Dict[str, Any]]], None]) -> "StreamedResponse":
+        """流式请求：边接收边提取完整的对话对象并回调，同时记录首个token的延迟"""
+        started = time.monotonic()
+        stream = await client.chat.completions.create(stream=True, **request)
+        parser = DialogueStreamParser()
+        first_token = None
+        usage = None
+
+        async for chunk in stream:
+            # 部分服务商在流中返回用量（通常在最后一个分片）
+            if getattr(chunk, "usage", None):
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content or ""
+            if not delta:
+                continue
+            if first_token is None:
+                first_token = time.monotonic() - started
+            if parser.feed(delta):
+                on_dialogues(list(parser.dialogues))
+
+        return StreamedResponse(parser.text, usage, first_token)
+
+    async def _request_chat_completion(self, messages, temperature: float = 0.7, model: Optional[str] = None,
+                                       on_dialogues: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+                                       **kwargs) -> Tuple[Any, Optional[str]]:
+        """聊天补全请求：由路由器选择端点并在失败时切换，支持时使用JSON模式，按需流式输出；
+        所有端点都不可用时本次调用回退模板客户端
+
+        Returns:
+            (响应, 实际提供服务的模型)，回退到模板客户端时模型为None（其输出不得写入持久缓存）
+        """
         if isinstance(messages, str):
             messages = [{"role": "user", "content": messages}]
 
-        if model is None:
-            model = settings.deepseek_model
+        async def send(endpoint: LLMEndpoint, request: Dict[str, Any]):
+            if on_dialogues is not None and settings.llm_stream_dialogues:
+                return await self._stream_chat_completion(endpoint.client, request, on_dialogues)
+            return await endpoint.client.chat.completions.create(**request)
 
-        try:
-            return await self.deepseek_client.chat.completions.create(
-                model=model,
+        async def call_once(timeout: Optional[float]):
+            async def call_endpoint(endpoint: LLMEndpoint):
+                request = dict(model=model or endpoint.model, messages=messages, temperature=temperature,
+                               timeout=timeout, **kwargs)
+                # 剧本生成的所有调用都要求输出JSON对象
+                if settings.llm_json_mode and endpoint.json_mode_supported:
+                    request["response_format"] = {"type": "json_object"}
+
+                try:
+                    return await send(endpoint, request), request["model"]
+                except openai.BadRequestError as error:
+                    if "response_format" not in request:
+                        raise
+                    # 去掉JSON模式重试一次，成功则说明该服务商不支持，本进程内不再对其使用
+                    request.pop("response_format")
+                    response = await send(endpoint, request)
+                    endpoint.json_mode_supported = False
+                    print(f"[LLM] 端点 {endpoint.name} 不支持JSON模式，已关闭: {error}")
+                    return response, request["model"]
+
+            # 真实API调用经过各端点的自适应并发限制，失败时立即切换到下一个端点
+            return await llm_router.run(call_endpoint)
+
+        if not llm_router.endpoints:
+            response = await self.fallback_client.chat.completions.create(
+                model=model or "fallback",
                 messages=messages,
                 temperature=temperature,
                 **kwargs
             )
-        except openai.APIConnectionError as conn_err:
-            print(f"[LLM] 连接失败，启用回退模式: {conn_err}")
-            self.deepseek_client = self._create_fallback_client()
-            return await self.deepseek_client.chat.completions.create(
-                model="fallback",
-                messages=messages,
-                temperature=temperature,
-                **kwargs
+            return response, None
+
+        try:
+            # 所有端点都因限流/超时/连接抖动失败时按统一重试策略重试，仍失败再回退模板客户端
+            policy = RetryPolicy("llm", max_attempts=3, call_timeout=kwargs.pop("timeout", 120))
+            return await policy.run(
+                call_once,
+                retry_on=lambda error: isinstance(error, openai.APIConnectionError) or is_overload_error(error)
             )
+        except asyncio.CancelledError:
+            raise
         except Exception as err:
-            if isinstance(self.deepseek_client, FallbackClient):
-                raise
-
-            print(f"[LLM] 请求异常，切换回退模式: {err}")
-            self.deepseek_client = self._create_fallback_client()
-            return await self.deepseek_client.chat.completions.create(
+            print(f"[LLM] 所有端点请求失败，本次调用使用回退模板: {err}")
+            response = await self.fallback_client.chat.completions.create(
                 model="fallback",
                 messages=messages,
                 temperature=temperature,
                 **kwargs
             )
+            return response, None
+
+    def generate_analysis_prompt(self, materials: str, part: Optional[Tuple[int, int]] = None) -> str:
+        """生成素材分析提示词 - 针对 Gemini 2.5 Flash 优化
 
-    def generate_analysis_prompt(self, materials: str) -> str:
-        """生成素材分析提示词 - 针对 Gemini 2.5 Flash 优化"""
+        Args:
+            materials: 待分析的素材（长素材的分片）
+            part: 分片序号 (第几部分, 共几部分)，整篇分析时为None
+        """
+        part_note = ""
+        if part:
+            part_note = (f"\n\n注意：以下材料是一篇长文的第 {part[0]}/{part[1]} 部分，"
+                         f"只分析本部分的内容，其他部分会单独分析后再合并。")
         return f"""# 任务：深度分析文本素材，为播客创作提供结构化见解
 
-你是一位顶尖的内容分析专家和播客顾问。你将深入分析以下文本材料，提炼出适合播客讨论的核心要点、争议话题和深度问题。
+你是一位顶尖的内容分析专家和播客顾问。你将深入分析以下文本材料，提炼出适合播客讨论的核心要点、争议话题和深度问题。{part_note}
 
 ## 分析方法论
 采用"三层分析法"：
@@ -353,103 +563,152 @@ class ScriptGenerator:
         """使用 Gemini 2.5 Flash 分析素材内容 - 增强版
 
         特性：
-        - 自动重试机制（最多3次）
-        - 优化的生成参数配置
-        - JSON 提取和验证
-        - 详细的错误日志
+        - 异步调用，不阻塞事件循环（与RAG检索真正并行）
+        - 长素材按段落分片并发分析（map），再合并为同一结构（reduce），不再截断
+        - 统一重试策略（最多3次）、JSON 提取和验证
         - 回退机制
         """
         if not materials or not materials.strip():
             print("[分析] 素材为空，跳过分析")
             return {}
 
-        prompt = self.generate_analysis_prompt(materials)
-        max_retries = 3
-
-        for attempt in range(max_retries):
-            try:
-                print(f"[分析] 第 {attempt + 1}/{max_retries} 次尝试使用 Gemini 2.5 Flash 分析素材...")
-
-                # 配置 Gemini 2.5 Flash 的生成参数
-                generation_config = {
-                    "temperature": 0.4,  # 降低温度以获得更稳定的分析结果
-                    "top_p": 0.95,
-                    "top_k": 40,
-                    "max_output_tokens": 4096,  # 允许详细的分析输出
-                    "response_mime_type": "application/json",  # 强制 JSON 输出
-                }
+        chunks = _split_materials(materials, settings.analysis_chunk_chars, settings.analysis_max_chunks)
 
-                # 使用 Gemini 进行分析
-                model = genai.GenerativeModel(
-                    model_name=settings.gemini_model,
-                    generation_config=generation_config
+        try:
+            if len(chunks) == 1:
+                analysis_result = await self._analyze_with_gemini(
+                    self.generate_analysis_prompt(materials), "gemini_analysis"
                 )
+            else:
+                analysis_result = await self._map_reduce_analysis(chunks)
 
-                response = model.generate_content(prompt)
-                result_text = response.text.strip()
-
-                print(f"[分析] Gemini 响应长度: {len(result_text)} 字符")
-
-                # 提取 JSON（处理可能的代码块包裹）
-                result_text = self._extract_json_from_response(result_text)
-
-                # 解析 JSON
-                analysis_result = json.loads(result_text)
-
-                # 验证结果结构
-                if self._validate_analysis_result(analysis_result):
-                    print(f"[分析] 成功完成素材分析")
-                    print(f"  - 核心主张: {analysis_result.get('main_thesis', '')[:50]}...")
-                    print(f"  - 关键论点: {len(analysis_result.get('key_arguments', []))} 个")
-                    print(f"  - 讨论问题: {len(analysis_result.get('discussion_questions', []))} 个")
-                    if 'podcast_hooks' in analysis_result:
-                        print(f"  - 播客钩子: {len(analysis_result.get('podcast_hooks', []))} 个")
-                    return analysis_result
-                else:
-                    print(f"[分析] 第 {attempt + 1} 次结果验证失败，结构不完整")
-                    if attempt < max_retries - 1:
-                        print(f"[分析] 将进行重试...")
-                        continue
+            print(f"[分析] 成功完成素材分析")
+            print(f"  - 核心主张: {analysis_result.get('main_thesis', '')[:50]}...")
+            print(f"  - 关键论点: {len(analysis_result.get('key_arguments', []))} 个")
+            print(f"  - 讨论问题: {len(analysis_result.get('discussion_questions', []))} 个")
+            if 'podcast_hooks' in analysis_result:
+                print(f"  - 播客钩子: {len(analysis_result.get('podcast_hooks', []))} 个")
+            return analysis_result
 
-            except json.JSONDecodeError as e:
-                print(f"[分析] JSON 解析失败 (尝试 {attempt + 1}/{max_retries}): {str(e)}")
-                print(f"[分析] 响应内容前500字符: {result_text[:500] if 'result_text' in locals() else 'N/A'}")
-                if attempt < max_retries - 1:
-                    print(f"[分析] 将进行重试...")
-                    continue
-
-            except Exception as e:
-                print(f"[分析] Gemini 素材分析失败 (尝试 {attempt + 1}/{max_retries}): {str(e)}")
-                print(f"[分析] 错误类型: {type(e).__name__}")
-                if attempt < max_retries - 1:
-                    print(f"[分析] 将进行重试...")
-                    import asyncio
-                    await asyncio.sleep(1)  # 等待1秒后重试
-                    continue
+        except Exception as e:
+            print(f"[分析] Gemini 素材分析失败: {str(e)}")
+            print(f"[分析] 错误类型: {type(e).__name__}")
 
         # 所有重试都失败，返回基础分析结果
         print(f"[分析] 所有重试均失败，返回基础分析模板")
         return self._get_fallback_analysis(materials)
 
-    def _extract_json_from_response(self, text: str) -> str:
-        """从响应中提取 JSON 内容
+    async def _map_reduce_analysis(self, chunks: List[str]) -> Dict[str, Any]:
+        """长素材：各分片并发分析，再合并为一份分析结果"""
+        total = len(chunks)
+        print(f"[分析] 素材较长，分为 {total} 段并发分析")
 
-        处理以下情况：
-        - 纯 JSON
-        - ```json ... ``` 包裹的 JSON
-        - ```... ``` 包裹的 JSON
-        """
-        text = text.strip()
+        partials = await asyncio.gather(
+            *[
+                self._analyze_with_gemini(
+                    self.generate_analysis_prompt(chunk, part=(index + 1, total)),
+                    f"gemini_analysis[{index + 1}/{total}]"
+                )
+                for index, chunk in enumerate(chunks)
+            ],
+            return_exceptions=True
+        )
+
+        valid = []
+        for index, partial in enumerate(partials):
+            if isinstance(partial, asyncio.CancelledError):
+                raise partial
+            if isinstance(partial, Exception):
+                print(f"[分析] 第 {index + 1}/{total} 段分析失败: {str(partial)}")
+            else:
+                valid.append(partial)
+
+        if not valid:
+            raise ValueError("所有分段分析均失败")
+        if len(valid) == 1:
+            return valid[0]
+
+        # reduce：由 Gemini 合并去重；失败时按字段本地合并
+        try:
+            return await self._analyze_with_gemini(self._generate_reduce_prompt(valid), "gemini_analysis_reduce")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[分析] 合并分析失败，改为本地合并: {str(e)}")
+            return _merge_analyses(valid)
+
+    def _generate_reduce_prompt(self, partials: List[Dict[str, Any]]) -> str:
+        """生成合并分段分析结果的提示词（输出与单篇分析相同的 JSON 结构）"""
+        partials_text = json.dumps(partials, ensure_ascii=False, indent=2)
+        return f"""# 任务：合并长文各部分的分析结果
+
+以下是同一篇长文按顺序分段分析得到的 {len(partials)} 份 JSON 结果。请把它们合并为一份针对全文的分析：
+- main_thesis：综合各部分，用一句话（30-50字）概括全文的核心主张
+- 其余列表字段：合并同义条目、去掉重复，保留最有洞察力、最适合播客讨论的条目（每个字段3-6条）
+
+## 各部分分析结果
+{partials_text}
+
+## 输出格式要求
+**必须严格按照与输入相同的 JSON 结构输出（main_thesis、key_arguments、supporting_data_or_examples、
+potential_counterarguments、discussion_questions、podcast_hooks），不要添加任何代码块标记（如 ```json）。**
+
+现在开始合并，直接输出 JSON 结果："""
+
+    async def _analyze_with_gemini(self, prompt: str, policy_name: str) -> Dict[str, Any]:
+        """异步调用 Gemini 并解析、校验 JSON 结果（按统一重试策略重试，最终失败时抛出异常）"""
+        # 配置 Gemini 2.5 Flash 的生成参数
+        generation_config = {
+            "temperature": 0.4,  # 降低温度以获得更稳定的分析结果
+            "top_p": 0.95,
+            "top_k": 40,
+            "max_output_tokens": 4096,  # 允许详细的分析输出
+            "response_mime_type": "application/json",  # 强制 JSON 输出
+        }
+
+        async def analyze_once(timeout: Optional[float]) -> Dict[str, Any]:
+            print(f"[分析] 使用 Gemini 2.5 Flash 分析素材（{policy_name}）...")
+
+            model = genai.GenerativeModel(
+                model_name=settings.gemini_model,
+                generation_config=generation_config
+            )
+
+            # 原生异步接口：等待响应期间不占用事件循环和线程池
+            async with limiter_registry.get("gemini").slot():
+                response = await asyncio.wait_for(
+                    model.generate_content_async(prompt),
+                    timeout=timeout
+                )
+            result_text = response.text.strip()
+
+            print(f"[分析] Gemini 响应长度: {len(result_text)} 字符")
+
+            # 容错解析 JSON（处理代码块包裹、字符串内换行、尾逗号和截断）
+            try:
+                analysis_result = loads_tolerant(result_text)
+            except ValueError as e:
+                print(f"[分析] JSON 解析失败: {str(e)}")
+                print(f"[分析] 响应内容前500字符: {result_text[:500]}")
+                raise
+
+            # 验证结果结构（不完整时抛出异常以触发重试）
+            if not self._validate_analysis_result(analysis_result):
+                raise ValueError("分析结果验证失败，结构不完整")
+            return analysis_result
 
-        # 如果被代码块包裹，提取内容
-        if text.startswith("```"):
-            # 移除开头的 ```json 或 ```
-            text = re.sub(r'^```(?:json)?\s*\n?', '', text)
-            # 移除结尾的 ```
-            text = re.sub(r'\n?```\s*$', '', text)
-            text = text.strip()
+        # 相同提示词（同一素材或分段）的分析结果直接复用持久缓存
+        cache_key = llm_cache.make_key(KIND_MATERIAL_ANALYSIS, settings.gemini_model, prompt, **generation_config)
+        cached_result = await llm_cache.get(KIND_MATERIAL_ANALYSIS, cache_key)
+        if cached_result is not None:
+            print(f"[分析] 使用缓存的分析结果（{policy_name}）")
+            return cached_result
 
-        return text
+        # 统一重试策略：截止时间、抖动退避和全局重试预算
+        policy = RetryPolicy(policy_name, max_attempts=3, call_timeout=120)
+        analysis_result = await policy.run(analyze_once)
+        await llm_cache.set(KIND_MATERIAL_ANALYSIS, cache_key, analysis_result)
+        return analysis_result
 
     def _validate_analysis_result(self, result: Dict[str, Any]) -> bool:
         """验证分析结果的结构完整性"""
@@ -656,10 +915,12 @@ class ScriptGenerator:
 
         detected_issues = []
 
-        # 检测敏感词（生产环境应使用更复杂的算法，如DFA或AC自动机）
+        # 检测敏感词（全部类别的关键词编译为一个AC自动机，扫描一遍内容）
+        matcher = get_matcher(tuple(keyword for keywords in sensitive_keywords.values() for keyword in keywords))
+        hits = set(matcher.matched(content))
         for category, keywords in sensitive_keywords.items():
             for keyword in keywords:
-                if keyword in content:
+                if keyword in hits:
                     detected_issues.append(f"检测到{category}相关内容：{keyword}")
 
         # 2. 事实性检查（结合RAG）
@@ -683,8 +944,8 @@ class ScriptGenerator:
                 detected_issues.append(message)
 
         # 检测过于夸张的陈述
-        exaggeration_keywords = ['100%', '完全', '绝对', '所有', '从不', '永远', '必然']
-        exaggeration_count = sum(1 for keyword in exaggeration_keywords if keyword in content)
+        exaggeration_matcher = get_matcher(('100%', '完全', '绝对', '所有', '从不', '永远', '必然'))
+        exaggeration_count = len(exaggeration_matcher.matched(content))
         if exaggeration_count > 2:
             detected_issues.append(f"检测到过多绝对化表述（{exaggeration_count}处），可能缺乏客观性")
 
@@ -696,7 +957,7 @@ class ScriptGenerator:
         else:
             return False, "内容安全问题：" + "; ".join(detected_issues)
 
-    async def _plan_dialogue_structure(self, form: PodcastCustomForm,
+    async def _plan_dialogue_structure(self, state: GenerationState, form: PodcastCustomForm,
                                      rag_context: Dict[str, Any] = None,
                                      analysis_result: Dict[str, Any] = None) -> Dict[str, Any]:
         """结构化内容生成 - 第一阶段：规划对话结构
@@ -714,21 +975,6 @@ class ScriptGenerator:
         Returns:
             结构化的对话规划字典
         """
-        # 生成缓存键
-        cache_key = self._get_cache_key(
-            "structure",
-            form.topic,
-            form.target_duration,
-            len(form.characters),
-            form.atmosphere.value
-        )
-
-        # 尝试从缓存获取
-        cached_structure = self._get_from_cache(self._structure_cache, cache_key)
-        if cached_structure:
-            print(f"[结构规划] 使用缓存的结构规划")
-            return cached_structure
-
         print(f"[结构规划] 开始生成对话结构...")
 
         # 计算总目标字数
@@ -853,40 +1099,41 @@ class ScriptGenerator:
 
 现在生成结构规划："""
 
+        # 相同的规划提示词（主题、时长、角色、素材要点都相同）直接复用持久缓存
+        cached_structure = await self._llm_cache_lookup(KIND_STRUCTURE_PLAN, structure_prompt, 0.5)
+        if cached_structure:
+            print(f"[结构规划] 使用缓存的结构规划")
+            return cached_structure
+
         try:
             # 调用LLM生成结构规划
-            response = await self._invoke_chat_completion(
+            response, served_model = await self._invoke_chat_completion(
+                state,
                 messages=[{"role": "user", "content": structure_prompt}],
-                temperature=0.5  # 较低温度确保结构合理
+                temperature=0.5,  # 较低温度确保结构合理
+                usage_label="structure"
             )
 
-            result_text = response.choices[0].message.content.strip()
-
-            # 清理JSON
-            if "```json" in result_text:
-                result_text = result_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in result_text:
-                result_text = result_text.split("```")[1].split("```")[0].strip()
-
-            # 解析结构规划
-            structure_plan = json.loads(result_text)
+            # 解析结构规划（容错解析，忽略代码块标记和说明文字）
+            structure_plan = loads_tolerant(response.choices[0].message.content)
+            if not isinstance(structure_plan, dict):
+                raise ValueError("结构规划不是JSON对象")
 
             print(f"[结构规划] 生成成功，共{structure_plan.get('total_stages', 0)}个阶段")
             for stage in structure_plan.get('stages', [])[:3]:
                 print(f"  阶段{stage['stage_number']}: {stage['stage_name']} ({stage['target_words']}字)")
 
-            # 缓存结果
-            self._set_to_cache(self._structure_cache, cache_key, structure_plan)
+            # 缓存结果（只缓存真实模型生成的、包含阶段的有效规划）
+            if structure_plan.get("stages") and served_model:
+                cache_key = self._llm_cache_key(KIND_STRUCTURE_PLAN, structure_prompt, 0.5, served_model)
+                await llm_cache.set(KIND_STRUCTURE_PLAN, cache_key, structure_plan)
 
             return structure_plan
 
         except Exception as e:
             print(f"[结构规划] 生成失败: {str(e)}")
-            # 返回默认结构
-            fallback_structure = self._get_fallback_structure(target_word_count, characters_info)
-            # 缓存默认结构
-            self._set_to_cache(self._structure_cache, cache_key, fallback_structure)
-            return fallback_structure
+            # 返回默认结构（不缓存，下次重新规划）
+            return self._get_fallback_structure(target_word_count, characters_info)
 
     def _get_fallback_structure(self, target_word_count: int, characters: List[str]) -> Dict[str, Any]:
         """生成默认的对话结构（当LLM规划失败时）"""
@@ -956,15 +1203,17 @@ class ScriptGenerator:
             "_fallback": True
         }
 
-    async def _generate_stage_content(self, stage_info: Dict[str, Any],
+    async def _generate_stage_content(self, state: GenerationState, stage_info: Dict[str, Any],
                                      form: PodcastCustomForm,
-                                     rag_context: Dict[str, Any] = None) -> List[ScriptDialogue]:
+                                     rag_context: Dict[str, Any] = None,
+                                     neighbour_context: Optional[str] = None) -> List[ScriptDialogue]:
         """结构化内容生成 - 第二阶段：基于结构规划生成具体对话内容
 
         Args:
             stage_info: 当前阶段的结构信息
             form: 播客定制表单
             rag_context: RAG知识上下文
+            neighbour_context: 前后阶段的规划摘要（各阶段并发生成时代替已有对话作为上下文）
 
         Returns:
             生成的对话列表
@@ -980,13 +1229,20 @@ class ScriptGenerator:
 
         # 构建已有对话上下文（最近3轮）
         recent_history = ""
-        if self.conversation_history:
-            recent_dialogues = self.conversation_history[-3:]
+        if state.conversation_history:
+            recent_dialogues = state.conversation_history[-3:]
             recent_history = "\n".join([
                 f"{d.character_name}：{d.content[:50]}..."
                 for d in recent_dialogues
             ])
 
+        if neighbour_context:
+            context_section = f"""## 前后阶段（注意衔接，不要重复其他阶段的内容）
+{neighbour_context}"""
+        else:
+            context_section = f"""## 已有对话（上下文）
+{recent_history if recent_history else "这是播客的第一阶段"}"""
+
         # 构建RAG知识参考（如果有）
         rag_section = ""
         if rag_context and rag_context.get("knowledge_points"):
@@ -1018,8 +1274,7 @@ class ScriptGenerator:
 ## 参与角色人设
 {chr(10).join(characters_personas)}
 
-## 已有对话（上下文）
-{recent_history if recent_history else "这是播客的第一阶段"}
+{context_section}
 
 {rag_section}
 
@@ -1057,28 +1312,21 @@ class ScriptGenerator:
 
         try:
             # 调用LLM生成本阶段内容
-            response = await self._invoke_chat_completion(
+            response, _ = await self._invoke_chat_completion(
+                state,
                 messages=[{"role": "user", "content": stage_prompt}],
-                temperature=0.7
+                temperature=0.7,
+                usage_label="stage"
             )
 
-            result_text = response.choices[0].message.content.strip()
-
-            # 清理JSON
-            if "```json" in result_text:
-                result_text = result_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in result_text:
-                result_text = result_text.split("```")[1].split("```")[0].strip()
-
-            result_text = result_text.replace('\n', '\\n').replace('\r', '\\r').replace('\t', '\\t')
-            result_text = re.sub(r'\\n\s*\\n', '\\n', result_text)
-
-            # 解析JSON
-            stage_data = json.loads(result_text)
+            # 容错解析：只提取完整的对话对象
+            dialogues_data = extract_dialogues(response.choices[0].message.content)
+            if not dialogues_data:
+                raise ValueError("响应中没有可解析的对话")
 
             # 转换为对话对象列表
             dialogues = []
-            for dialogue_data in stage_data["dialogues"]:
+            for dialogue_data in dialogues_data:
                 # 清理内容
                 original_content = dialogue_data["content"]
                 cleaned_content = clean_for_tts(original_content, emotion=dialogue_data.get("emotion"))
@@ -1121,72 +1369,74 @@ class ScriptGenerator:
         # 一般播客语速约为每分钟150-200字
         return minutes * 175
 
-    def initialize_generation_state(self, form: PodcastCustomForm):
-        """初始化生成状态"""
-        self.conversation_history = []
-        self.characters_list = [char.name for char in form.characters]
-        self.current_speaker_index = 0
-        self.target_word_count = self.estimate_target_word_count(form.target_duration)
-        self.current_word_count = 0
+    def initialize_generation_state(self, form: PodcastCustomForm) -> GenerationState:
+        """初始化本次生成的状态"""
+        return GenerationState(
+            characters_list=[char.name for char in form.characters],
+            target_word_count=self.estimate_target_word_count(form.target_duration)
+        )
 
-    def get_next_speaker(self) -> str:
+    def get_next_speaker(self, state: GenerationState) -> str:
         """智能决定下一位发言者"""
         # 简单轮流策略，后续可以改为AI决定
-        speaker = self.characters_list[self.current_speaker_index]
-        self.current_speaker_index = (self.current_speaker_index + 1) % len(self.characters_list)
+        speaker = state.characters_list[state.current_speaker_index]
+        state.current_speaker_index = (state.current_speaker_index + 1) % len(state.characters_list)
         return speaker
 
-    def should_terminate(self) -> bool:
+    def should_terminate(self, state: GenerationState) -> bool:
         """判断是否应该终止生成"""
         # 检查字数是否达到目标
-        if self.current_word_count >= self.target_word_count:
+        if state.current_word_count >= state.target_word_count:
             return True
 
         # 检查是否有明确的结束标志
-        if self.conversation_history:
-            last_content = self.conversation_history[-1].content
+        if state.conversation_history:
+            last_content = state.conversation_history[-1].content
             end_keywords = ["感谢大家收听", "今天的播客", "我们下期再见", "谢谢收听"]
             if any(keyword in last_content for keyword in end_keywords):
                 return True
 
         return False
 
-    def check_content_repetition(self, new_content: str, window_size: int = 3) -> bool:
-        """检查新内容是否与最近的对话重复
+    def check_content_repetition(self, state: GenerationState, new_content: str, threshold: float = 0.5) -> bool:
+        """检查新内容是否与已有对话重复
+
+        对整段对话历史建立shingle指纹索引（对话历史只追加，这里增量补齐索引），
+        插入和查询都是O(文本长度)，较早的重复内容也能发现
 
         Args:
             new_content: 新生成的内容
-            window_size: 检查最近几轮对话
+            threshold: 新内容的片段出现在同一段旧对话中的比例超过该值即视为重复
 
         Returns:
             True表示有重复，False表示无重复
         """
-        if not self.conversation_history:
-            return False
-
-        # 获取最近几轮对话
-        recent_dialogues = self.conversation_history[-window_size:]
-
-        # 计算相似度（简单的字符串包含检查）
-        new_content_clean = new_content.strip().lower()
-
-        for dialogue in recent_dialogues:
-            old_content_clean = dialogue.content.strip().lower()
-
-            # 如果新内容与旧内容过于相似（超过50%重复）
-            if len(new_content_clean) > 20:  # 只检查足够长的内容
-                overlap = sum(1 for i in range(len(new_content_clean)-10)
-                            if new_content_clean[i:i+10] in old_content_clean)
-                similarity = overlap / (len(new_content_clean) - 10) if len(new_content_clean) > 10 else 0
+        index = state.repetition_index
+        if len(index) > len(state.conversation_history):
+            index.clear()
+        for dialogue in state.conversation_history[len(index):]:
+            index.add(dialogue.content)
 
-                if similarity > 0.5:  # 50%以上相似度认为重复
-                    return True
+        return index.is_repetition(new_content, threshold)
 
-        return False
-
-    def count_words_in_history(self) -> int:
+    def _log_fact_check(self, content: str, rag_context: Dict[str, Any] = None):
+        """对照RAG知识做事实校验并记录结果（当前策略：只记录警告，仍然保留内容）"""
+        if not rag_context or not rag_context.get("knowledge_points"):
+            return
+        validation_result = self._validate_against_knowledge(content, rag_context)
+        if not validation_result["is_valid"]:
+            print(f"[FACT-CHECK] ⚠️ 内容未通过事实校验")
+            print(f"[FACT-CHECK]   - 置信度: {validation_result['confidence']}")
+            print(f"[FACT-CHECK]   - 警告: {validation_result['warnings']}")
+            print(f"[FACT-CHECK]   - 冲突: {validation_result['conflicting_facts']}")
+        elif validation_result["warnings"]:
+            print(f"[FACT-CHECK] ℹ️ 检测到 {len(validation_result['warnings'])} 个提示")
+            for warning in validation_result['warnings'][:2]:  # 只显示前2个
+                print(f"[FACT-CHECK]   - {warning}")
+
+    def count_words_in_history(self, state: GenerationState) -> int:
         """统计对话历史中的字数"""
-        return sum(len(dialogue.content) for dialogue in self.conversation_history)
+        return sum(len(dialogue.content) for dialogue in state.conversation_history)
 
     def generate_character_persona_prompt(self, char) -> str:
         """根据三层角色构建法生成详细的人设描述"""
@@ -1233,92 +1483,77 @@ class ScriptGenerator:
 
         return persona_text
 
-    def generate_initial_prompt(self, form: PodcastCustomForm, analysis_result: Dict[str, Any] = None,
+    def generate_system_prompt(self, form: PodcastCustomForm, analysis_result: Dict[str, Any] = None,
                                rag_context: Dict[str, Any] = None) -> str:
-        """生成初始化Prompt - 整合三层角色构建法，优化播客结构"""
-        # 使用新的角色人设生成方法
-        characters_info = []
-        host_name = None
-        guest_names = []
-
-        for char in form.characters:
-            char_desc = f"* {self.generate_character_persona_prompt(char)}"
-            characters_info.append(char_desc)
-
-            # 识别主持人（第一个角色默认为主持人）
-            if not host_name:
-                host_name = char.name
-            else:
-                guest_names.append(char.name)
+        """生成系统提示词 - 角色人设、知识素材和创作准则
 
-        characters_str = "\n".join(characters_info)
-
-        # 如果没有明确的主持人，使用第一个角色
-        if not host_name:
-            host_name = self.characters_list[0] if self.characters_list else "主持人"
-
-        # 构建嘉宾列表文本
-        guests_intro = "、".join(guest_names) if guest_names else "嘉宾"
+        整个剧本生成过程中保持不变，作为每次对话调用的固定前缀，
+        支持前缀缓存的服务商（混元、DeepSeek等）可复用，不必每轮重新计费和计算
+        """
+        characters_info = [f"* {self.generate_character_persona_prompt(char)}" for char in form.characters]
+        host_name = form.characters[0].name if form.characters else "主持人"
+        guest_names = [char.name for char in form.characters[1:]]
 
-        # 构建知识参考部分
+        # 构建RAG知识参考部分（最多3个知识点）
         knowledge_section = ""
         if rag_context and rag_context.get("knowledge_points"):
-            knowledge_points = rag_context["knowledge_points"][:2]
-            knowledge_texts = [f"- {point['content'][:150]}..." for point in knowledge_points]
-            knowledge_section = f"\n### 可参考的知识\n{chr(10).join(knowledge_texts)}\n"
+            knowledge_items = []
+            for idx, point in enumerate(rag_context["knowledge_points"][:3], 1):
+                # 添加置信度标记（基于source类型）
+                confidence = self._calculate_knowledge_confidence(point)
+                confidence_marker = "🟢" if confidence >= 0.8 else "🟡" if confidence >= 0.6 else "🟠"
+                knowledge_items.append(
+                    f"{idx}. {confidence_marker} {point['content'][:200]}..."
+                    f"\n   来源: {point.get('source', 'unknown')}"
+                )
+
+            knowledge_section = f"""
+## 📚 知识库参考（可选引用，增强论述深度）
+{chr(10).join(knowledge_items)}
+
+**使用指引**：
+- 如果上述知识与当前讨论相关，可自然融入对话（不要生硬引用）
+- 可以挑战或质疑知识库内容，保持批判性思维
+- 绿色🟢=高可信度，黄色🟡=中等可信度，橙色🟠=需验证
+"""
 
         analysis_section = ""
         if analysis_result and analysis_result.get('main_thesis'):
-            analysis_section = f"\n### 素材要点\n核心观点：{analysis_result['main_thesis']}\n"
+            key_arguments = "\n".join(f"- {item}" for item in analysis_result.get("key_arguments", [])[:3])
+            analysis_section = f"\n## 素材要点\n核心观点：{analysis_result['main_thesis']}\n{key_arguments}\n"
 
-        return f"""你是专业播客剧本作家。请为以下播客生成**完整的开场部分**，包括主持人开场、介绍嘉宾和引入话题。
+        return f"""你是专业播客剧本作家，正在分多轮为下面这期播客创作对话剧本。每次按要求生成若干段对话，接在已有对话之后。
 
 ## 基本信息
 主题：{form.topic}
 氛围：{form.atmosphere.value}
 主持人：{host_name}
-嘉宾：{guests_intro}
+嘉宾：{"、".join(guest_names) if guest_names else "嘉宾"}
+总字数目标：约{self.estimate_target_word_count(form.target_duration)}字
 
 ## 角色设定
-{characters_str}
-
+{chr(10).join(characters_info)}
 {knowledge_section}{analysis_section}
+## 🎭 对话要求（核心准则 - 全程遵守）
 
-## 🎙️ 播客开场结构要求
-
-**第1段 - 主持人开场白**：
-- {host_name}自我介绍，欢迎听众
-- 简要说明今天的主题：{form.topic}
-- 营造{form.atmosphere.value}的氛围
-
-**第2段 - 介绍嘉宾**：
-- {host_name}介绍每位嘉宾的身份、专业背景
-- 突出嘉宾在该话题上的专长
-
-**第3-4段 - 引入核心话题**：
-- {host_name}提出核心问题或论点
-- 嘉宾简要回应，表明各自观点
-- 为后续深入讨论铺垫
-
-## 🎭 对话风格（核心要求 - 强制执行）
-
-**1. 严格依据角色深度人设：**
+**【铁律1：严格依据角色深度人设】**
 - 如果角色有"背景故事"，必须在对话中自然融入相关经历或案例
 - 如果角色有"语言习惯"或"口头禅"，必须在对话中体现
 - 如果角色有"内在矛盾"，可在适当时候暗示或流露
 
-**2. 【强制】观点必须配案例/故事：**
-- ❌ 禁止干巴巴陈述："新能源车确实有问题，消费者很担心。"
-- ✅ 必须有具体案例："去年我们处理过一起电池热失控的客诉，车主半夜被消防吵醒，整个人都吓傻了。虽然最后查出来不是质量问题，但这事儿对一个家庭的冲击太大了。"
+**【铁律2：观点必须配案例】**
+- ❌ 绝对禁止："我认为成本是个问题。"（纯观点陈述）
+- ✅ 强制要求：观点 + 具体案例，案例要有数字（如"20人质检组→2台设备"）、场景（如"半夜"、"工厂车间"）和情感冲击（如"整个人都吓傻了"）
+- 示例："说到成本，去年我朋友买电动车花了20万，现在电池衰减到60%，他说感觉像买了个'到期食品'，三年贬值一半。这谁受得了？"
 
-**3. 案例必须具体到细节：**
-- 必须有数字（如"20人质检组→2台设备"）
-- 必须有场景（如"半夜"、"工厂车间"、"质检组"）
-- 必须有情感冲击（如"整个人都吓傻了"、"这对我触动很大"）
+**【铁律3：必须回应前一发言，追问深挖】**
+- ❌ 严禁各说各话："我认为AI会创造新岗位。"（无视对方）
+- ✅ 开头直接回应：认同并补充、部分认同并转折、质疑并反驳或追问细节
+- 对方分享案例时，追问背后的细节或引申问题；对方提出观点时，明确表态（支持/反对/补充）
 
-**4. 真实对话质感：**
+**【铁律4：真实口语化】**
 - 多用"我觉得"、"其实"、"说实话"、"你看"等口语连接词
-- 可以有停顿、转折、自我修正（如"不对，应该说..."）
+- 可以有停顿、转折、自我修正（如"这个事情……怎么说呢……"、"不对，应该这么说..."）
 - 用比喻、类比让抽象观点变具体
 
 ## ⚠️ 输出格式（严格遵守）
@@ -1326,75 +1561,52 @@ class ScriptGenerator:
 {{
   "dialogues": [
     {{
-      "character_name": "{host_name}",
-      "content": "主持人开场白内容（纯文本）",
-      "emotion": "热情"
-    }},
-    {{
-      "character_name": "{host_name}",
-      "content": "介绍嘉宾的内容",
-      "emotion": "友好"
-    }},
-    {{
-      "character_name": "{host_name}",
-      "content": "提出核心话题",
-      "emotion": "好奇"
-    }},
-    {{
-      "character_name": "{guest_names[0] if guest_names else '嘉宾'}",
-      "content": "嘉宾回应",
-      "emotion": "思考"
+      "character_name": "角色名",
+      "content": "对话内容（纯文本）",
+      "emotion": "情绪词"
     }}
   ]
 }}
 
 注意：
 - 直接输出JSON，不要用```包裹
-- content必须是纯文本，不含特殊字符
-- 生成4-5段开场对话
+- content必须是纯文本，不含括号标注或特殊字符"""
 
-现在生成开场："""
+    def generate_initial_prompt(self, form: PodcastCustomForm) -> str:
+        """生成开场轮次的用户消息 - 角色人设和创作准则已在系统提示词中"""
+        host_name = form.characters[0].name if form.characters else "主持人"
+        guest_names = [char.name for char in form.characters[1:]]
 
-    def generate_continue_prompt(self, form: PodcastCustomForm, next_speaker: str,
-                                rag_context: Dict[str, Any] = None) -> str:
-        """生成循环Prompt - 引导嘉宾深入讨论各自观点（集成RAG知识支持）"""
-        # 构建对话历史（只保留最近4轮）
-        history_text = "\n".join([
-            f"{dialogue.character_name}：{dialogue.content}"
-            for dialogue in self.conversation_history[-4:]
-        ])
+        return f"""请生成播客的**完整开场部分**，包括主持人开场白、介绍嘉宾和引入话题。
 
-        # 构建RAG知识参考部分
-        rag_knowledge_section = ""
-        if rag_context and rag_context.get("knowledge_points"):
-            # 获取相关的知识点（最多3个）
-            relevant_knowledge = rag_context["knowledge_points"][:3]
-            if relevant_knowledge:
-                knowledge_items = []
-                for idx, point in enumerate(relevant_knowledge, 1):
-                    # 添加置信度标记（基于source类型）
-                    confidence = self._calculate_knowledge_confidence(point)
-                    confidence_marker = "🟢" if confidence >= 0.8 else "🟡" if confidence >= 0.6 else "🟠"
-                    knowledge_items.append(
-                        f"{idx}. {confidence_marker} {point['content'][:200]}..."
-                        f"\n   来源: {point.get('source', 'unknown')}"
-                    )
+## 🎙️ 播客开场结构要求
 
-                rag_knowledge_section = f"""
-## 📚 知识库参考（可选引用，增强论述深度）
-{chr(10).join(knowledge_items)}
+**第1段 - 主持人开场白**：
+- {host_name}自我介绍，欢迎听众
+- 简要说明今天的主题：{form.topic}
+- 营造{form.atmosphere.value}的氛围
 
-**使用指引**：
-- 如果上述知识与当前讨论相关，可自然融入对话（不要生硬引用）
-- 可以挑战或质疑知识库内容，保持批判性思维
-- 绿色🟢=高可信度，黄色🟡=中等可信度，橙色🟠=需验证
-"""
+**第2段 - 介绍嘉宾**：
+- {host_name}介绍每位嘉宾的身份、专业背景
+- 突出嘉宾在该话题上的专长
+
+**第3-4段 - 引入核心话题**：
+- {host_name}提出核心问题或论点
+- 嘉宾简要回应，表明各自观点
+- 为后续深入讨论铺垫
+
+生成4-5段开场对话，前3段由{host_name}发言，第4段起由{guest_names[0] if guest_names else "嘉宾"}等嘉宾回应。
+
+现在生成开场："""
 
+    def generate_continue_prompt(self, state: GenerationState, form: PodcastCustomForm,
+                                 next_speaker: str) -> str:
+        """生成续写轮次的用户消息 - 已有对话作为前面的对话轮次发送，这里只给出本轮的进度和发言安排"""
         # 计算进度
-        progress_ratio = self.current_word_count / self.target_word_count if self.target_word_count > 0 else 0
+        progress_ratio = state.current_word_count / state.target_word_count if state.target_word_count > 0 else 0
 
         # 识别主持人和嘉宾
-        host_name = self.characters_list[0] if self.characters_list else "主持人"
+        host_name = state.characters_list[0] if state.characters_list else "主持人"
         is_host = (next_speaker == host_name)
 
         # 根据进度给出内容建议
@@ -1417,89 +1629,20 @@ class ScriptGenerator:
             else:
                 content_guide = f"{next_speaker}总结自己的核心观点"
 
-        # 获取最近的发言内容，用于引导互动
-        last_speaker = ""
-        last_content_snippet = ""
-        if self.conversation_history:
-            last_dialogue = self.conversation_history[-1]
-            last_speaker = last_dialogue.character_name
-            last_content_snippet = last_dialogue.content[:80] + "..." if len(last_dialogue.content) > 80 else last_dialogue.content
-
+        # 上一位发言者不同时，要求先回应再展开
         interaction_guide = ""
-        if last_speaker and last_speaker != next_speaker:
-            interaction_guide = f"""
-## 🎯【核心规则1：回应与反驳】必须基于前一发言进行互动
-上一位发言者（{last_speaker}）说了："{last_content_snippet}"
-
-**{next_speaker}的发言必须遵循"乒乓球规则"：**
-
-1. **开头必须直接回应**（选择其一）：
-   - 认同并补充："对，{last_speaker}说的这个我深有感触/完全同意。我还想补充的是..."
-   - 部分认同并转折："您说的XX这点我认同，但关于XX，我有不同看法..."
-   - 质疑并反驳："您提到的XX，我有个疑问/我觉得可能不完全是这样。您看..."
-   - 追问深挖："您刚才说的XX特别有意思，能不能展开说说？比如..."
-
-2. **严禁自说自话**：
-   - ❌ 禁止："我认为XX是个问题。"（完全无视{last_speaker}的发言）
-   - ✅ 必须："您刚才提到XX，这让我想到我们公司去年的一个案例..."
-
-3. **制造思想碰撞**：
-   - 如果{last_speaker}提供了案例，{next_speaker}必须追问细节或提出质疑
-   - 如果{last_speaker}提出了观点，{next_speaker}必须表态（支持/反对/补充）
-"""
+        if state.conversation_history:
+            last_speaker = state.conversation_history[-1].character_name
+            if last_speaker != next_speaker:
+                interaction_guide = f"- 互动要求：{next_speaker}开头必须直接回应{last_speaker}刚才的发言（认同补充/转折/质疑/追问），严禁自说自话\n"
 
-        return f"""继续播客对话。当前进度：{self.current_word_count}/{self.target_word_count}字
+        return f"""继续对话。当前进度：{state.current_word_count}/{state.target_word_count}字
 
-## 已有对话（最近4轮）
-{history_text}
-{rag_knowledge_section}
-{interaction_guide}
 ## 下一步生成
 - 当前阶段：{stage_hint}
 - 下一位发言者：【{next_speaker}】
 - 内容方向：{content_guide}
-- 生成2-3段对话
-
-## 🎭 对话要求（核心准则 - 三大铁律）
-
-**【铁律1：观点必须配案例】**
-- ❌ 绝对禁止："我认为成本是个问题。"（纯观点陈述）
-- ✅ 强制要求：观点 + 具体案例（含数字、场景、情感）
-- 示例："说到成本，去年我朋友买电动车花了20万，现在电池衰减到60%，他说感觉像买了个'到期食品'，三年贬值一半。这谁受得了？"
-
-**【铁律2：必须回应前一发言】**
-- ❌ 严禁各说各话："我认为AI会创造新岗位。"（无视对方）
-- ✅ 强制开头回应："您刚才说的那个质检组案例，我特别有共鸣。我们公司去年..."
-- 必须使用的互动句式：
-  * 追问："您提到XX，能详细说说那19个员工后来怎么样了吗？"
-  * 质疑："但我有个疑问，您说的新岗位，真能弥补失去的那么多传统岗位吗？"
-  * 补充："对，我完全同意。而且我还想补充的是..."
-
-**【铁律3：追问深挖，制造思想火花】**
-- 当对方分享案例时，必须追问背后的细节或引申问题
-- 示例对话流：
-  * A："我们工厂20人质检组被2台设备替代了。"
-  * B：【必须追问】"那19个人后来怎么办的？转岗成功率高吗？"
-  * A：【必须回应】"说实话，只有3-4个成功转岗，剩下的..."
-  * B：【必须深挖】"这就是我担心的！3-4个成功率太低了，这说明..."
-
-**【铁律4：真实口语化】**
-- 用"你看"、"其实"、"说白了"、"说实话"开头
-- 有停顿感："这个事情……怎么说呢……""不对，应该这么说..."
-
-## ⚠️ 输出格式
-
-{{
-  "dialogues": [
-    {{
-      "character_name": "{next_speaker}",
-      "content": "对话内容",
-      "emotion": "思考"
-    }}
-  ]
-}}
-
-注意：直接输出JSON，不要用```包裹
+{interaction_guide}- 生成2-3段对话，第一段由{next_speaker}发言
 
 现在生成："""
 
@@ -1507,11 +1650,14 @@ class ScriptGenerator:
         """使用状态化循环生成机制生成播客剧本（集成RAG知识检索）"""
         print(f"[DEBUG] 开始生成脚本，主题: {form.topic}")
         print(f"[DEBUG] 角色数量: {len(form.characters)}")
-        print(f"[DEBUG] 使用的客户端类型: {type(self.deepseek_client).__name__}")
+        print(f"[DEBUG] 可用的LLM端点: {[endpoint.name for endpoint in llm_router.candidates()] or '无（回退模板）'}")
 
         # 初始化生成状态
-        self.initialize_generation_state(form)
-        print(f"[DEBUG] 生成状态初始化完成，目标字数: {self.target_word_count}")
+        state = self.initialize_generation_state(form)
+        print(f"[DEBUG] 生成状态初始化完成，目标字数: {state.target_word_count}")
+
+        # 阶段检查点：进程重启后跳过已完成的检索、分析和对话轮次
+        checkpoint = get_task_checkpoint()
 
         # 第一步+第二步：并行执行RAG知识检索和Gemini素材分析（性能优化）
         rag_context = None
@@ -1527,16 +1673,14 @@ class ScriptGenerator:
                 print("[RAG] RAG功能已禁用")
                 return None
 
+            if checkpoint and checkpoint.has_stage(STAGE_RAG_CONTEXT):
+                print("[RAG] 从检查点恢复知识检索结果")
+                return checkpoint.get_stage(STAGE_RAG_CONTEXT)
+
             try:
-                await self.rag_service.ensure_ready()
-                print(f"[RAG] 正在检索相关知识: {form.topic}")
-                character_names = [char.name for char in form.characters]
-                context = await self.rag_service.get_podcast_context(form.topic, character_names)
-
-                if context and context.get("knowledge_points"):
-                    print(f"[RAG] 成功获取 {len(context['knowledge_points'])} 个知识点")
-                else:
-                    print(f"[RAG] 未找到相关知识")
+                context = await self.get_shared_rag_context(form)
+                if checkpoint and context is not None:
+                    checkpoint.save_stage(STAGE_RAG_CONTEXT, context)
                 return context
             except Exception as e:
                 print(f"[RAG] 知识检索失败: {str(e)}")
@@ -1549,10 +1693,14 @@ class ScriptGenerator:
                 print("[分析] 无背景素材，跳过分析")
                 return None
 
+            if checkpoint and checkpoint.has_stage(STAGE_ANALYSIS):
+                print("[分析] 从检查点恢复素材分析结果")
+                return checkpoint.get_stage(STAGE_ANALYSIS)
+
             try:
-                print(f"[分析] 开始分析背景素材...")
-                result = await self.analyze_materials(form.background_materials)
-                print(f"[分析] 素材分析完成")
+                result = await self.get_shared_analysis(form.background_materials)
+                if checkpoint and result is not None:
+                    checkpoint.save_stage(STAGE_ANALYSIS, result)
                 return result
             except Exception as e:
                 print(f"[分析] 素材分析失败: {str(e)}")
@@ -1596,132 +1744,111 @@ class ScriptGenerator:
         else:
             print("[INFO] 无需执行RAG检索或素材分析")
 
-        # 第三步：生成开场白和第一轮对话
-        try:
-            print(f"[DEBUG] 开始生成初始对话...")
-            initial_prompt = self.generate_initial_prompt(form, analysis_result, rag_context)
-            print(f"[DEBUG] 初始Prompt生成完成，长度: {len(initial_prompt)}")
-
-            print(f"[DEBUG] 调用客户端生成初始对话...")
-            response = await self._invoke_chat_completion(
-                messages=[{"role": "user", "content": initial_prompt}],
-                temperature=0.7  # 降低temperature，减少随机性和重复
-            )
-
-            print(f"[DEBUG] 客户端响应收到，类型: {type(response)}")
-            result_text = response.choices[0].message.content
-            print(f"[DEBUG] 响应内容长度: {len(result_text)}, 前100字符: {result_text[:100]}")
-
-            # 清理JSON字符串（移除控制字符和修复格式）
-            result_text = result_text.strip()
-
-            # 提取JSON部分（如果LLM输出了额外的文本）
-            if "```json" in result_text:
-                # 移除markdown代码块标记
-                result_text = result_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in result_text:
-                result_text = result_text.split("```")[1].split("```")[0].strip()
-
-            # 替换控制字符为转义序列
-            import re
-            # 替换未转义的换行符、制表符等
-            result_text = result_text.replace('\n', '\\n').replace('\r', '\\r').replace('\t', '\\t')
-            # 但要保留JSON结构中的换行
-            result_text = re.sub(r'\\n\s*\\n', '\\n', result_text)  # 合并多余换行
-
-            print(f"[DEBUG] 清理后的JSON前200字符: {result_text[:200]}")
+        # 固定的系统提示词（人设、知识、准则），之后每轮只追加简短的用户消息和模型回复
+        state.chat_messages = [
+            {"role": "system", "content": self.generate_system_prompt(form, analysis_result, rag_context)}
+        ]
 
+        # 第三步：生成开场白和第一轮对话（检查点中已有对话轮次时直接恢复）
+        saved_rounds = checkpoint.get_stage(STAGE_SCRIPT_ROUNDS) if checkpoint else None
+        stages_completed = bool(saved_rounds and saved_rounds.get("mode") == SCRIPT_MODE_PARALLEL_STAGES)
+        if saved_rounds:
+            state.conversation_history = [ScriptDialogue(**item) for item in saved_rounds["dialogues"]]
+            state.current_speaker_index = saved_rounds["speaker_index"]
+            state.current_word_count = self.count_words_in_history(state)
+            # 已恢复的对话合并为一轮，作为后续续写的上下文
+            state.chat_messages += [
+                {"role": "user", "content": self.generate_initial_prompt(form)},
+                {"role": "assistant", "content": json.dumps(
+                    {"dialogues": [dialogue.model_dump() for dialogue in state.conversation_history]},
+                    ensure_ascii=False
+                )}
+            ]
+            print(f"[DEBUG] 从检查点恢复 {len(state.conversation_history)} 段对话（已完成 {saved_rounds['iteration']} 轮）")
+        elif (settings.script_generation_mode == SCRIPT_MODE_PARALLEL_STAGES
+              and await self._generate_script_by_stages(state, form, rag_context, analysis_result)):
+            # 分阶段并发生成已产出完整剧本（含收尾阶段），不再逐轮续写
+            stages_completed = True
+            self._save_rounds_checkpoint(state, checkpoint, 0, mode=SCRIPT_MODE_PARALLEL_STAGES)
+        else:
             try:
-                initial_data = json.loads(result_text)
-            except json.JSONDecodeError as je:
-                print(f"[DEBUG] JSON解析失败，尝试修复...")
-                # 尝试移除所有换行和多余空格
-                result_text_clean = re.sub(r'\\[nrt]', ' ', result_text)
-                result_text_clean = re.sub(r'\s+', ' ', result_text_clean)
-                print(f"[DEBUG] 再次尝试解析，清理后: {result_text_clean[:200]}")
-                try:
-                    initial_data = json.loads(result_text_clean)
-                except:
-                    print(f"[DEBUG] 完整响应内容:\n{result_text}")
-                    raise je  # 重新抛出原始错误
+                print(f"[DEBUG] 开始生成初始对话...")
+                initial_prompt = self.generate_initial_prompt(form)
+                print(f"[DEBUG] 初始Prompt生成完成，长度: {len(initial_prompt)}")
+
+                print(f"[DEBUG] 调用客户端生成初始对话...")
+                dialogues_data = await self._generate_dialogue_turn(
+                    state,
+                    initial_prompt,
+                    temperature=0.7,  # 降低temperature，减少随机性和重复
+                    usage_label="opening"
+                )
+                print(f"[DEBUG] JSON解析成功，对话数量: {len(dialogues_data)}")
 
-            print(f"[DEBUG] JSON解析成功，对话数量: {len(initial_data.get('dialogues', []))}")
+                # 添加初始对话到历史
+                for dialogue_data in dialogues_data:
+                    # 【重要】清理LLM生成的文本，移除可能混入的情绪标注
+                    original_content = dialogue_data["content"]
+                    cleaned_content = clean_for_tts(original_content, emotion=dialogue_data.get("emotion"))
 
-            # 添加初始对话到历史
-            for dialogue_data in initial_data["dialogues"]:
-                # 【重要】清理LLM生成的文本，移除可能混入的情绪标注
-                original_content = dialogue_data["content"]
-                cleaned_content = clean_for_tts(original_content, emotion=dialogue_data.get("emotion"))
+                    # 记录清理情况（便于调试）
+                    if cleaned_content != original_content:
+                        print(f"[CLEAN] 剧本生成阶段清理: [{original_content[:50]}...] -> [{cleaned_content[:50]}...]")
 
-                # 记录清理情况（便于调试）
-                if cleaned_content != original_content:
-                    print(f"[CLEAN] 剧本生成阶段清理: [{original_content[:50]}...] -> [{cleaned_content[:50]}...]")
+                    dialogue = ScriptDialogue(
+                        character_name=dialogue_data["character_name"],
+                        content=cleaned_content,  # 使用清理后的内容
+                        emotion=dialogue_data.get("emotion")
+                    )
+                    state.conversation_history.append(dialogue)
 
-                dialogue = ScriptDialogue(
-                    character_name=dialogue_data["character_name"],
-                    content=cleaned_content,  # 使用清理后的内容
-                    emotion=dialogue_data.get("emotion")
-                )
-                self.conversation_history.append(dialogue)
+                # 更新字数统计
+                state.current_word_count = self.count_words_in_history(state)
+                print(f"[DEBUG] 初始对话添加完成，当前字数: {state.current_word_count}")
 
-            # 更新字数统计
-            self.current_word_count = self.count_words_in_history()
-            print(f"[DEBUG] 初始对话添加完成，当前字数: {self.current_word_count}")
+            except Exception as e:
+                print(f"[DEBUG] 初始对话生成失败: {str(e)}")
+                print(f"[DEBUG] 异常类型: {type(e).__name__}")
+                import traceback
+                print(f"[DEBUG] 异常详细: {traceback.format_exc()}")
+                raise Exception(f"初始对话生成失败: {str(e)}")
 
-        except Exception as e:
-            print(f"[DEBUG] 初始对话生成失败: {str(e)}")
-            print(f"[DEBUG] 异常类型: {type(e).__name__}")
-            import traceback
-            print(f"[DEBUG] 异常详细: {traceback.format_exc()}")
-            raise Exception(f"初始对话生成失败: {str(e)}")
+            self._save_rounds_checkpoint(state, checkpoint, 0)
 
+        self._report_progress(state)
         print(f"[DEBUG] 开始循环生成对话...")
         # 第四步：循环生成对话直到满足终止条件
         max_iterations = 15  # 防止无限循环
-        iteration = 0
+        iteration = saved_rounds["iteration"] if saved_rounds else 0
+        failed_rounds = 0  # 连续失败的轮数
 
-        while not self.should_terminate() and iteration < max_iterations:
+        while not stages_completed and not self.should_terminate(state) and iteration < max_iterations:
             try:
                 print(f"[DEBUG] 循环第 {iteration + 1} 轮...")
                 # 决定下一位发言者
-                next_speaker = self.get_next_speaker()
+                next_speaker = self.get_next_speaker(state)
                 print(f"[DEBUG] 下一位发言者: {next_speaker}")
 
-                # 生成继续对话的prompt（可能包含RAG知识）
-                continue_prompt = self.generate_continue_prompt(form, next_speaker, rag_context)
+                # 生成继续对话的用户消息（RAG知识已在系统提示词中）
+                continue_prompt = self.generate_continue_prompt(state, form, next_speaker)
 
-                # 调用LLM生成下一轮对话
-                response = await self._invoke_chat_completion(
-                    messages=[{"role": "user", "content": continue_prompt}],
-                    temperature=0.7  # 降低temperature，减少随机性
+                # 调用LLM生成下一轮对话（追加在已有对话轮次之后，前缀不变可命中缓存）
+                # 容错解析：外层JSON损坏或输出被截断时，已完整的对话仍然保留
+                dialogues_data = await self._generate_dialogue_turn(
+                    state,
+                    continue_prompt,
+                    temperature=0.7,  # 降低temperature，减少随机性
+                    usage_label="round"
                 )
 
-                result_text = response.choices[0].message.content.strip()
-
-                # 清理JSON（同初始对话）
-                if "```json" in result_text:
-                    result_text = result_text.split("```json")[1].split("```")[0].strip()
-                elif "```" in result_text:
-                    result_text = result_text.split("```")[1].split("```")[0].strip()
-
-                result_text = result_text.replace('\n', '\\n').replace('\r', '\\r').replace('\t', '\\t')
-                result_text = re.sub(r'\\n\s*\\n', '\\n', result_text)
-
-                try:
-                    continue_data = json.loads(result_text)
-                except json.JSONDecodeError:
-                    result_text_clean = re.sub(r'\\[nrt]', ' ', result_text)
-                    result_text_clean = re.sub(r'\s+', ' ', result_text_clean)
-                    continue_data = json.loads(result_text_clean)
-
                 # 添加新对话到历史（带去重检查、事实校验和安全守护）
-                for dialogue_data in continue_data["dialogues"]:
+                for dialogue_data in dialogues_data:
                     # 【重要】清理LLM生成的文本，移除可能混入的情绪标注
                     original_content = dialogue_data["content"]
                     cleaned_content = clean_for_tts(original_content, emotion=dialogue_data.get("emotion"))
 
                     # 【新增】检查内容重复
-                    if self.check_content_repetition(cleaned_content):
+                    if self.check_content_repetition(state, cleaned_content):
                         print(f"[WARN] 检测到重复内容，跳过: {cleaned_content[:50]}...")
                         continue
 
@@ -1734,18 +1861,7 @@ class ScriptGenerator:
                         # continue  # 取消注释此行以在检测到安全问题时跳过内容
 
                     # 【新增】RAG事实校验层
-                    if rag_context and rag_context.get("knowledge_points"):
-                        validation_result = self._validate_against_knowledge(cleaned_content, rag_context)
-                        if not validation_result["is_valid"]:
-                            print(f"[FACT-CHECK] ⚠️ 内容未通过事实校验")
-                            print(f"[FACT-CHECK]   - 置信度: {validation_result['confidence']}")
-                            print(f"[FACT-CHECK]   - 警告: {validation_result['warnings']}")
-                            print(f"[FACT-CHECK]   - 冲突: {validation_result['conflicting_facts']}")
-                            # 当前策略：记录警告但仍然保留内容（可根据需要调整为跳过）
-                        elif validation_result["warnings"]:
-                            print(f"[FACT-CHECK] ℹ️ 检测到 {len(validation_result['warnings'])} 个提示")
-                            for warning in validation_result['warnings'][:2]:  # 只显示前2个
-                                print(f"[FACT-CHECK]   - {warning}")
+                    self._log_fact_check(cleaned_content, rag_context)
 
                     # 记录清理情况（便于调试）
                     if cleaned_content != original_content:
@@ -1756,54 +1872,289 @@ class ScriptGenerator:
                         content=cleaned_content,  # 使用清理后的内容
                         emotion=dialogue_data.get("emotion")
                     )
-                    self.conversation_history.append(dialogue)
+                    state.conversation_history.append(dialogue)
 
                 # 更新字数统计
-                self.current_word_count = self.count_words_in_history()
-                print(f"[DEBUG] 第{iteration + 1}轮完成，当前字数: {self.current_word_count}")
+                state.current_word_count = self.count_words_in_history(state)
+                print(f"[DEBUG] 第{iteration + 1}轮完成，当前字数: {state.current_word_count}")
 
                 iteration += 1
+                failed_rounds = 0
+                self._save_rounds_checkpoint(state, checkpoint, iteration)
+                self._report_progress(state)
 
             except Exception as e:
                 print(f"循环生成第{iteration+1}轮失败: {str(e)}")
-                break
+                # 偶发的解析失败重试一次，连续失败才结束循环
+                failed_rounds += 1
+                if failed_rounds >= 2:
+                    break
 
         print(f"[DEBUG] 对话循环完成，总计 {iteration} 轮")
 
         # 第五步：如果没有自然结束，生成结束语
-        if self.conversation_history and not any(
-            keyword in self.conversation_history[-1].content
+        if state.conversation_history and not any(
+            keyword in state.conversation_history[-1].content
             for keyword in ["感谢大家收听", "今天的播客", "我们下期再见", "谢谢收听"]
         ):
             print(f"[DEBUG] 生成结束语...")
-            await self._generate_ending(form)
+            await self._generate_ending(state, form)
 
         # 第六步：构建最终剧本（包含RAG来源信息）
         script = PodcastScript(
             title=form.title or form.topic,
             topic=form.topic,
-            dialogues=self.conversation_history
+            dialogues=state.conversation_history
         )
 
         # 如果使用了RAG知识，添加到元数据
+        metadata = {}
         if rag_context and rag_context.get("knowledge_points"):
-            script.metadata = {
+            metadata.update({
                 "rag_enabled": True,
                 "knowledge_sources": len(rag_context.get("source_summary", {})),
                 "knowledge_points_used": len(rag_context["knowledge_points"]),
                 "source_summary": rag_context.get("source_summary", {})
+            })
+
+        # 每次LLM调用的Token用量（按调用顺序），以及合计
+        if state.token_usage:
+            metadata["token_usage"] = {
+                "calls": state.token_usage,
+                **{
+                    key: sum(entry[key] for entry in state.token_usage)
+                    for key in ("prompt_tokens", "cached_tokens", "completion_tokens")
+                }
             }
+        script.metadata = metadata or None
 
         print(f"[DEBUG] 脚本生成完成，总对话数: {len(script.dialogues)}")
         return script
 
-    async def _generate_ending(self, form: PodcastCustomForm):
+    async def get_shared_rag_context(self, form: PodcastCustomForm) -> Optional[Dict[str, Any]]:
+        """RAG知识检索（主题和角色相同的任务共享同一次检索）"""
+        character_names = [char.name for char in form.characters]
+
+        async def retrieve():
+            await self.rag_service.ensure_ready()
+            print(f"[RAG] 正在检索相关知识: {form.topic}")
+            context = await self.rag_service.get_podcast_context(form.topic, character_names)
+
+            if context and context.get("knowledge_points"):
+                print(f"[RAG] 成功获取 {len(context['knowledge_points'])} 个知识点")
+            else:
+                print(f"[RAG] 未找到相关知识")
+            return context
+
+        material = json.dumps({"topic": form.topic, "characters": character_names}, ensure_ascii=False)
+        return await preprocess_cache.get_or_compute(KIND_RAG_CONTEXT, material, retrieve)
+
+    async def get_shared_analysis(self, materials: str) -> Optional[Dict[str, Any]]:
+        """Gemini素材分析（背景素材相同的任务共享同一次分析）"""
+        async def analyze():
+            print(f"[分析] 开始分析背景素材...")
+            result = await self.analyze_materials(materials)
+            print(f"[分析] 素材分析完成")
+            return result
+
+        return await preprocess_cache.get_or_compute(KIND_ANALYSIS, materials, analyze)
+
+    async def prefetch_preprocessing(self, forms: List[PodcastCustomForm]):
+        """
+        提前并发执行一批定制单的RAG检索和素材分析（批量任务提交时调用），
+        相同输入只计算一次，任务开始执行时直接命中缓存
+        """
+        jobs = []
+        for form in forms:
+            if getattr(settings, 'rag_enabled', False):
+                jobs.append(self.get_shared_rag_context(form))
+            if form.background_materials:
+                jobs.append(self.get_shared_analysis(form.background_materials))
+
+        for result in await asyncio.gather(*jobs, return_exceptions=True):
+            if isinstance(result, Exception):
+                print(f"[预处理] 批量预热失败: {str(result)}")
+
+    def _report_progress(self, state: GenerationState):
+        """上报已生成的对话和字数进度（状态接口按游标增量返回）"""
+        report_dialogues(state.conversation_history)
+        report_progress(PROGRESS_SCRIPT_WORDS, state.current_word_count, state.target_word_count)
+
+    def _save_rounds_checkpoint(self, state: GenerationState, checkpoint, iteration: int, mode: str = SCRIPT_MODE_SEQUENTIAL):
+        """保存已完成的对话轮次（重启后从下一轮继续；分阶段模式保存的是完整剧本）"""
+        if checkpoint is None:
+            return
+        checkpoint.save_stage(STAGE_SCRIPT_ROUNDS, {
+            "dialogues": [dialogue.model_dump() for dialogue in state.conversation_history],
+            "speaker_index": state.current_speaker_index,
+            "iteration": iteration,
+            "mode": mode
+        })
+
+    async def _generate_script_by_stages(self, state: GenerationState, form: PodcastCustomForm,
+                                         rag_context: Dict[str, Any] = None,
+                                         analysis_result: Dict[str, Any] = None) -> bool:
+        """分阶段并发生成剧本：规划阶段 -> 各阶段并发生成 -> 统一补充阶段间过渡
+
+        逐轮续写需要十余次串行LLM调用，这里只有三步相互依赖，长时长播客的剧本耗时大幅缩短。
+        各阶段生成时还看不到相邻阶段的对话，只能拿到相邻阶段的规划摘要，衔接由最后的过渡步骤完成。
+
+        Returns:
+            是否成功生成（没有任何阶段产出对话时返回False，由调用方回退到逐轮续写）
+        """
+        structure = await self._plan_dialogue_structure(state, form, rag_context, analysis_result)
+        stages = [stage for stage in structure.get("stages", []) if isinstance(stage, dict)]
+        if not stages:
+            print("[分阶段生成] 结构规划没有阶段，回退到逐轮续写")
+            return False
+
+        print(f"[分阶段生成] 并发生成 {len(stages)} 个阶段...")
+        results = await asyncio.gather(*[
+            self._generate_stage_content(
+                state, stage, form, rag_context,
+                neighbour_context=self._describe_stage_neighbours(stages, index)
+            )
+            for index, stage in enumerate(stages)
+        ])
+
+        results = self._merge_stage_dialogues(state, results, rag_context)
+        if not any(results):
+            print("[分阶段生成] 所有阶段生成失败，回退到逐轮续写")
+            return False
+
+        state.current_word_count = self.count_words_in_history(state)
+        self._report_progress(state)
+
+        state.conversation_history = await self._stitch_stages(state, form, stages, results)
+        state.current_word_count = self.count_words_in_history(state)
+        self._report_progress(state)
+        print(f"[分阶段生成] 完成，共{len(state.conversation_history)}段对话，{state.current_word_count}字")
+        return True
+
+    def _merge_stage_dialogues(self, state: GenerationState, results: List[List[ScriptDialogue]],
+                               rag_context: Dict[str, Any] = None) -> List[List[ScriptDialogue]]:
+        """按阶段顺序把各阶段对话并入对话历史，与逐轮续写一样做去重检查和事实校验
+
+        各阶段并发生成、彼此看不到对方的对话，阶段之间内容重叠的可能性最大，
+        与前面阶段重复的对话在这里跳过
+
+        Returns:
+            各阶段去重后保留的对话
+        """
+        state.conversation_history = []
+        merged = []
+        for dialogues in results:
+            kept = []
+            for dialogue in dialogues:
+                if self.check_content_repetition(state, dialogue.content):
+                    print(f"[WARN] 检测到与其他阶段重复的内容，跳过: {dialogue.content[:50]}...")
+                    continue
+                self._log_fact_check(dialogue.content, rag_context)
+                state.conversation_history.append(dialogue)
+                kept.append(dialogue)
+            merged.append(kept)
+        return merged
+
+    @staticmethod
+    def _summarize_stage(stage: Dict[str, Any]) -> str:
+        """阶段规划的一行摘要"""
+        objectives = "、".join(str(item) for item in stage.get("objectives", []))
+        points = "、".join(str(item) for item in stage.get("discussion_points", []))
+        return f"阶段{stage.get('stage_number', '')}「{stage.get('stage_name', '')}」：目标 {objectives}；重点 {points}"
+
+    def _describe_stage_neighbours(self, stages: List[Dict[str, Any]], index: int) -> str:
+        """并发生成时提供给某一阶段的上下文：前后相邻阶段的规划摘要"""
+        lines = []
+        if index > 0:
+            lines.append(f"- 上一阶段（内容另行生成）：{self._summarize_stage(stages[index - 1])}")
+        else:
+            lines.append("- 这是播客的第一阶段，由主持人开场")
+
+        if index < len(stages) - 1:
+            lines.append(f"- 下一阶段（内容另行生成）：{self._summarize_stage(stages[index + 1])}")
+        else:
+            lines.append("- 这是播客的最后一个阶段，请以致谢道别收尾，最后一句包含“感谢大家收听”")
+        return "\n".join(lines)
+
+    async def _stitch_stages(self, state: GenerationState, form: PodcastCustomForm, stages: List[Dict[str, Any]],
+                             results: List[List[ScriptDialogue]]) -> List[ScriptDialogue]:
+        """过渡步骤：一次调用为所有相邻阶段的衔接处生成过渡语，插入到阶段之间（失败时直接拼接）"""
+        generated = [(stage, dialogues) for stage, dialogues in zip(stages, results) if dialogues]
+        merged = [dialogue for _, dialogues in generated for dialogue in dialogues]
+        if len(generated) < 2:
+            return merged
+
+        host_name = state.characters_list[0] if state.characters_list else "主持人"
+        boundaries = []
+        for number, ((stage, dialogues), (next_stage, next_dialogues)) in enumerate(zip(generated, generated[1:]), start=1):
+            before = "\n".join(f"  {d.character_name}：{d.content[:60]}" for d in dialogues[-2:])
+            after = "\n".join(f"  {d.character_name}：{d.content[:60]}" for d in next_dialogues[:2])
+            boundaries.append(
+                f"衔接处{number}（{stage.get('stage_name', '')} -> {next_stage.get('stage_name', '')}）\n"
+                f"前一阶段结尾：\n{before}\n后一阶段开头：\n{after}"
+            )
+
+        stitch_prompt = f"""# 任务：为播客各阶段之间补充过渡语
+
+播客主题："{form.topic}"，各阶段是分别生成的，衔接处可能比较生硬。
+请为每个衔接处写一句自然的过渡语（20-50字），一般由主持人{host_name}说出，
+承上启下，不要重复前后已有的内容。
+
+{chr(10).join(boundaries)}
+
+## 输出格式（JSON）
+{{
+  "transitions": [
+    {{"boundary": 1, "character_name": "{host_name}", "content": "过渡语", "emotion": "情绪词"}}
+  ]
+}}
+
+**注意**：直接输出JSON，不要用```包裹；衔接已经很自然时可以省略该衔接处"""
+
+        try:
+            response, _ = await self._invoke_chat_completion(
+                state,
+                messages=[{"role": "user", "content": stitch_prompt}],
+                temperature=0.5,
+                usage_label="stitch"
+            )
+            transitions = loads_tolerant(response.choices[0].message.content).get("transitions", [])
+        except Exception as e:
+            print(f"[分阶段生成] 过渡语生成失败，直接拼接各阶段: {str(e)}")
+            return merged
+
+        by_boundary = {}
+        for item in transitions:
+            try:
+                boundary = int(item.get("boundary"))
+                content = clean_for_tts(item["content"], emotion=item.get("emotion"))
+            except (AttributeError, KeyError, TypeError, ValueError):
+                continue
+            speaker = item.get("character_name")
+            if speaker not in state.characters_list:
+                speaker = host_name
+            if content:
+                by_boundary[boundary] = ScriptDialogue(
+                    character_name=speaker,
+                    content=content,
+                    emotion=item.get("emotion")
+                )
+
+        stitched = []
+        for number, (_, dialogues) in enumerate(generated, start=1):
+            stitched.extend(dialogues)
+            if number in by_boundary and number < len(generated):
+                stitched.append(by_boundary[number])
+        print(f"[分阶段生成] 插入 {sum(1 for n in by_boundary if n < len(generated))} 处过渡语")
+        return stitched
+
+    async def _generate_ending(self, state: GenerationState, form: PodcastCustomForm):
         """生成播客结束语 - 优化为主持人总结+集体道别"""
         # 找到主持人角色（第一个角色）
-        host_name = self.characters_list[0] if self.characters_list else "主持人"
+        host_name = state.characters_list[0] if state.characters_list else "主持人"
 
         # 构建所有角色列表用于集体道别
-        all_characters = self.characters_list if self.characters_list else ["主持人"]
+        all_characters = state.characters_list if state.characters_list else ["主持人"]
 
         ending_prompt = f"""# 任务：为播客生成专业的结束部分
 
@@ -1866,48 +2217,23 @@ class ScriptGenerator:
 现在生成结束语："""
 
         try:
-            response = await self._invoke_chat_completion(
-                messages=[{"role": "user", "content": ending_prompt}],
-                temperature=0.6  # 结束语更稳定
-            )
-
-            result_text = response.choices[0].message.content.strip()
-
-            # 清理JSON（同初始对话）
-            if "```json" in result_text:
-                result_text = result_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in result_text:
-                result_text = result_text.split("```")[1].split("```")[0].strip()
-
-            result_text = result_text.replace('\n', '\\n').replace('\r', '\\r').replace('\t', '\\t')
-            result_text = re.sub(r'\\n\s*\\n', '\\n', result_text)
-
-            try:
-                ending_data = json.loads(result_text)
-            except json.JSONDecodeError:
-                result_text_clean = re.sub(r'\\[nrt]', ' ', result_text)
-                result_text_clean = re.sub(r'\s+', ' ', result_text_clean)
-                ending_data = json.loads(result_text_clean)
-
-            # 添加结束语
-            for dialogue_data in ending_data["dialogues"]:
-                # 【重要】清理LLM生成的文本
-                original_content = dialogue_data["content"]
-                cleaned_content = clean_for_tts(original_content, emotion=dialogue_data.get("emotion"))
-
-                if cleaned_content != original_content:
-                    print(f"[CLEAN] 结束语清理: [{original_content[:50]}...] -> [{cleaned_content[:50]}...]")
-
-                dialogue = ScriptDialogue(
-                    character_name=dialogue_data["character_name"],
-                    content=cleaned_content,  # 使用清理后的内容
-                    emotion=dialogue_data.get("emotion")
+            # 结束语只取决于主题和角色，相同时直接复用持久缓存
+            ending_data = await self._llm_cache_lookup(KIND_ENDING, ending_prompt, 0.6)
+            served_model = None
+            if ending_data is None:
+                ending_data, served_model = await self._request_dialogues_data(
+                    state, ending_prompt, 0.6, "ending"  # 结束语更稳定
                 )
-                self.conversation_history.append(dialogue)
+
+            # 添加结束语（解析成功后才写入缓存，模板回退的输出不缓存）
+            state.conversation_history.extend(self._build_ending_dialogues(ending_data))
+            if served_model:
+                cache_key = self._llm_cache_key(KIND_ENDING, ending_prompt, 0.6, served_model)
+                await llm_cache.set(KIND_ENDING, cache_key, ending_data)
 
             # 生成集体道别
             print(f"[DEBUG] 生成集体道别...")
-            await self._generate_group_farewell()
+            await self._generate_group_farewell(state)
 
         except Exception as e:
             print(f"生成结束语失败: {str(e)}")
@@ -1917,12 +2243,45 @@ class ScriptGenerator:
                 content="感谢大家收听今天的播客，我们下期再见！",
                 emotion="温暖"
             )
-            self.conversation_history.append(default_ending)
+            state.conversation_history.append(default_ending)
+
+    async def _request_dialogues_data(self, state: GenerationState, prompt: str, temperature: float,
+                                      usage_label: str) -> Tuple[Dict[str, Any], Optional[str]]:
+        """调用LLM生成一组对话并容错解析为 {"dialogues": [...]}，同时返回实际提供服务的模型"""
+        response, served_model = await self._invoke_chat_completion(
+            state,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=temperature,
+            usage_label=usage_label
+        )
 
-    async def _generate_group_farewell(self):
+        dialogues = extract_dialogues(response.choices[0].message.content)
+        if not dialogues:
+            raise ValueError("响应中没有可解析的对话")
+        return {"dialogues": dialogues}, served_model
+
+    def _build_ending_dialogues(self, data: Dict[str, Any]) -> List[ScriptDialogue]:
+        """把结束语/道别的JSON转换为对话列表（清理LLM文本中混入的情绪标注）"""
+        dialogues = []
+        for dialogue_data in data["dialogues"]:
+            # 【重要】清理LLM生成的文本
+            original_content = dialogue_data["content"]
+            cleaned_content = clean_for_tts(original_content, emotion=dialogue_data.get("emotion"))
+
+            if cleaned_content != original_content:
+                print(f"[CLEAN] 结束语清理: [{original_content[:50]}...] -> [{cleaned_content[:50]}...]")
+
+            dialogues.append(ScriptDialogue(
+                character_name=dialogue_data["character_name"],
+                content=cleaned_content,  # 使用清理后的内容
+                emotion=dialogue_data.get("emotion")
+            ))
+        return dialogues
+
+    async def _generate_group_farewell(self, state: GenerationState):
         """生成集体道别环节"""
         # 所有角色一起说再见
-        all_characters = self.characters_list if self.characters_list else ["主持人"]
+        all_characters = state.characters_list if state.characters_list else ["主持人"]
 
         farewell_prompt = f"""# 任务：生成集体道别环节
 
@@ -1957,41 +2316,18 @@ class ScriptGenerator:
 现在生成："""
 
         try:
-            response = await self._invoke_chat_completion(
-                messages=[{"role": "user", "content": farewell_prompt}],
-                temperature=0.6
-            )
-
-            result_text = response.choices[0].message.content.strip()
-
-            # 清理JSON
-            if "```json" in result_text:
-                result_text = result_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in result_text:
-                result_text = result_text.split("```")[1].split("```")[0].strip()
-
-            result_text = result_text.replace('\n', '\\n').replace('\r', '\\r').replace('\t', '\\t')
-            result_text = re.sub(r'\\n\s*\\n', '\\n', result_text)
-
-            try:
-                farewell_data = json.loads(result_text)
-            except json.JSONDecodeError:
-                result_text_clean = re.sub(r'\\[nrt]', ' ', result_text)
-                result_text_clean = re.sub(r'\s+', ' ', result_text_clean)
-                farewell_data = json.loads(result_text_clean)
-
-            # 添加集体道别
-            for dialogue_data in farewell_data["dialogues"]:
-                original_content = dialogue_data["content"]
-                cleaned_content = clean_for_tts(original_content, emotion=dialogue_data.get("emotion"))
-
-                dialogue = ScriptDialogue(
-                    character_name=dialogue_data["character_name"],
-                    content=cleaned_content,
-                    emotion=dialogue_data.get("emotion")
+            farewell_data = await self._llm_cache_lookup(KIND_FAREWELL, farewell_prompt, 0.6)
+            served_model = None
+            if farewell_data is None:
+                farewell_data, served_model = await self._request_dialogues_data(
+                    state, farewell_prompt, 0.6, "farewell"
                 )
-                self.conversation_history.append(dialogue)
 
+            # 添加集体道别
+            state.conversation_history.extend(self._build_ending_dialogues(farewell_data))
+            if served_model:
+                cache_key = self._llm_cache_key(KIND_FAREWELL, farewell_prompt, 0.6, served_model)
+                await llm_cache.set(KIND_FAREWELL, cache_key, farewell_data)
             print(f"[DEBUG] 集体道别生成完成")
 
         except Exception as e:
@@ -2003,4 +2339,4 @@ class ScriptGenerator:
                     content="再见！",
                     emotion="开心"
                 )
-                self.conversation_history.append(default_farewell)
\ No newline at end of file
+                state.conversation_history.append(default_farewell)
\ No newline at end of file
@@ -0,0 +1,216 @@
+"""
+任务阶段检查点
+把流水线各阶段（RAG上下文、素材分析、剧本轮次、逐句音频片段、最终母带）的产物
+连同清单（manifest.json）写入任务目录。进程重启后工作协程从最后完成的阶段继续，
+已付费的LLM和TTS结果不会重新生成
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from typing import Any, Dict, List, Optional
+
+from ..core.config import settings
+from .task_context import get_task_context
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+STAGE_DIR_NAME = "checkpoint"
+
+# 阶段名称
+STAGE_RAG_CONTEXT = "rag_context"
+STAGE_ANALYSIS = "analysis"
+STAGE_SCRIPT_ROUNDS = "script_rounds"
+STAGE_SCRIPT = "script"
+STAGE_MASTER = "master"
+
+# 已结束的任务不再恢复
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+
+
+def write_json_atomic(path: str, data: Any):
+    """先写临时文件再替换，进程在写入中途退出也不会留下半个文件"""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, default=str)
+    os.replace(temp_path, path)
+
+
+class TaskCheckpoint:
+    """单个任务的检查点清单"""
+
+    def __init__(self, task_id: str, manifest: Dict[str, Any]):
+        self.task_id = task_id
+        self.task_dir = os.path.join(settings.audio_output_dir, task_id)
+        self.manifest = manifest
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.task_dir, MANIFEST_NAME)
+
+    def _stage_path(self, name: str) -> str:
+        return os.path.join(self.task_dir, STAGE_DIR_NAME, f"{name}.json")
+
+    def _flush(self):
+        self.manifest["updated_at"] = time.time()
+        write_json_atomic(self.manifest_path, self.manifest)
+
+    # ---------- 创建/加载 ----------
+
+    @classmethod
+    def create(cls, task_id: str, form: Dict[str, Any], tenant: str, priority: int,
+               callback_urls: Optional[List[str]] = None) -> "TaskCheckpoint":
+        """任务创建时写入清单（保存定制单和回调地址，重启后据此重建任务）"""
+        checkpoint = cls(task_id, {
+            "task_id": task_id,
+            "status": "queued",
+            "form": form,
+            "tenant": tenant,
+            "priority": priority,
+            "callback_urls": list(callback_urls or []),
+            "created_at": time.time(),
+            "stages": {},
+            "segments": {}
+        })
+        os.makedirs(os.path.join(checkpoint.task_dir, STAGE_DIR_NAME), exist_ok=True)
+        checkpoint._flush()
+        return checkpoint
+
+    @classmethod
+    def load(cls, task_id: str) -> Optional["TaskCheckpoint"]:
+        """读取任务清单（不存在或损坏时返回None）"""
+        path = os.path.join(settings.audio_output_dir, task_id, MANIFEST_NAME)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return cls(task_id, json.load(f))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"[Checkpoint] 清单损坏，忽略任务 {task_id}: {e}")
+            return None
+
+    # ---------- 阶段 ----------
+
+    def set_status(self, status: str):
+        self.manifest["status"] = status
+        self._flush()
+
+    def has_stage(self, name: str) -> bool:
+        return name in self.manifest["stages"]
+
+    def get_stage(self, name: str) -> Optional[Any]:
+        """读取已完成阶段的产物（未完成返回None）"""
+        if not self.has_stage(name):
+            return None
+        try:
+            with open(self._stage_path(name), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"[Checkpoint] 阶段 {name} 读取失败，将重新执行: {e}")
+            return None
+
+    def save_stage(self, name: str, data: Any):
+        """保存阶段产物（产物写入独立文件，清单只记录索引）"""
+        os.makedirs(os.path.join(self.task_dir, STAGE_DIR_NAME), exist_ok=True)
+        write_json_atomic(self._stage_path(name), data)
+        self.manifest["stages"][name] = {"saved_at": time.time()}
+        self._flush()
+
+    # ---------- 逐句音频片段 ----------
+
+    @staticmethod
+    def segment_key(voice: str, text: str) -> str:
+        """片段指纹：音色或文本变化时不复用旧片段"""
+        return hashlib.sha1(f"{voice}\x00{text}".encode("utf-8")).hexdigest()
+
+    def get_segment(self, index: int, key: str) -> Optional[str]:
+        """已合成的片段文件路径（指纹不符或文件丢失时返回None）"""
+        entry = self.manifest["segments"].get(str(index))
+        if entry and entry.get("key") == key and os.path.exists(entry["path"]):
+            return entry["path"]
+        return None
+
+    def record_segment(self, index: int, key: str, path: str):
+        self.manifest["segments"][str(index)] = {"key": key, "path": path}
+        self._flush()
+
+    # ---------- 结束 ----------
+
+    def complete(self, keep_paths: List[str]):
+        """任务完成：删除中间产物（片段、阶段文件），保留最终音频"""
+        keep = {os.path.abspath(path) for path in keep_paths if path}
+        for entry in self.manifest["segments"].values():
+            path = entry.get("path")
+            if path and os.path.abspath(path) not in keep and os.path.exists(path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        shutil.rmtree(os.path.join(self.task_dir, STAGE_DIR_NAME), ignore_errors=True)
+        self.manifest["segments"] = {}
+        self.manifest["stages"] = {}
+        self.set_status("completed")
+
+
+def get_task_checkpoint() -> Optional[TaskCheckpoint]:
+    """当前任务的检查点（未启用或不在任务中执行时返回None）"""
+    context = get_task_context()
+    return getattr(context, "checkpoint", None) if context else None
+
+
+def discard_segment_file(path: str):
+    """删除已载入内存的片段文件；启用检查点时保留，供重启后复用，任务完成时统一清理"""
+    if get_task_checkpoint() is not None:
+        return
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def prune_stale_checkpoints(ttl_seconds: float) -> int:
+    """
+    删除过期的检查点：失败、取消的任务，以及中断后超过保留期仍未恢复的任务，
+    清单最后更新时间早于保留期时删除整个任务目录（已完成任务的目录含最终音频，不删除）
+
+    Returns:
+        删除的任务目录数
+    """
+    root = settings.audio_output_dir
+    if ttl_seconds <= 0 or not os.path.isdir(root):
+        return 0
+
+    cutoff = time.time() - ttl_seconds
+    removed = 0
+    for task_id in os.listdir(root):
+        if not os.path.isfile(os.path.join(root, task_id, MANIFEST_NAME)):
+            continue
+        checkpoint = TaskCheckpoint.load(task_id)
+        if checkpoint is None or checkpoint.manifest.get("status") == "completed":
+            continue
+        updated_at = checkpoint.manifest.get("updated_at") or checkpoint.manifest.get("created_at") or 0
+        if updated_at < cutoff:
+            shutil.rmtree(checkpoint.task_dir, ignore_errors=True)
+            removed += 1
+    return removed
+
+
+def find_resumable_tasks() -> List[TaskCheckpoint]:
+    """扫描输出目录，找出进程退出前未结束的任务（按创建时间排序）"""
+    root = settings.audio_output_dir
+    if not os.path.isdir(root):
+        return []
+
+    checkpoints = []
+    for task_id in os.listdir(root):
+        if not os.path.isfile(os.path.join(root, task_id, MANIFEST_NAME)):
+            continue
+        checkpoint = TaskCheckpoint.load(task_id)
+        if checkpoint and checkpoint.manifest.get("status") not in TERMINAL_STATUSES:
+            checkpoints.append(checkpoint)
+
+    return sorted(checkpoints, key=lambda item: item.manifest.get("created_at", 0))
@@ -0,0 +1,86 @@
+"""
+任务执行上下文
+通过contextvars在一次播客任务涉及的所有协程间传递截止时间、取消标记等信息，
+gather/create_task创建的子任务和asyncio.to_thread中的线程都会自动继承
+"""
+
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, List, Optional
+
+
+class TaskCancelled(asyncio.CancelledError):
+    """任务已被取消（继承CancelledError，不会被 except Exception 吞掉）"""
+
+
+class TaskContext:
+    """单个播客任务的执行上下文"""
+
+    def __init__(self, task_id: str, deadline_seconds: Optional[float] = None,
+                 checkpoint: Optional[Any] = None, progress: Optional[Any] = None):
+        self.task_id = task_id
+        self.checkpoint = checkpoint  # 阶段检查点（TaskCheckpoint，未启用时为None）
+        self.progress = progress  # 进度事件流（TaskProgress）
+        self.started_at = time.monotonic()
+        self.deadline = self.started_at + deadline_seconds if deadline_seconds else None
+        # 线程安全的取消标记：协程由任务取消中断，线程池中的同步代码通过检查此标记提前退出
+        self._cancelled = threading.Event()
+
+    def remaining(self) -> Optional[float]:
+        """距截止时间的剩余秒数（未设置截止时间时返回None）"""
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
+    def expired(self) -> bool:
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+
+_current_task_context: ContextVar[Optional[TaskContext]] = ContextVar("task_context", default=None)
+
+
+def get_task_context() -> Optional[TaskContext]:
+    """获取当前协程所属任务的上下文（不在任务中执行时返回None）"""
+    return _current_task_context.get()
+
+
+@contextmanager
+def task_context_scope(context: TaskContext):
+    """在当前协程及其子任务中启用任务上下文"""
+    token = _current_task_context.set(context)
+    try:
+        yield context
+    finally:
+        _current_task_context.reset(token)
+
+
+def raise_if_cancelled():
+    """协作式取消检查点：当前任务已取消时抛出 TaskCancelled（供线程中的长循环调用）"""
+    context = _current_task_context.get()
+    if context is not None and context.cancelled:
+        raise TaskCancelled(f"任务 {context.task_id} 已取消")
+
+
+def report_progress(stage: str, done: int, total: int):
+    """上报当前任务某阶段的进度（不在任务中执行时忽略）"""
+    context = _current_task_context.get()
+    if context is not None and context.progress is not None:
+        context.progress.update_stage(stage, done, total)
+
+
+def report_dialogues(dialogues: List[Any]):
+    """上报生成中的剧本对话（状态接口按游标增量返回）"""
+    context = _current_task_context.get()
+    if context is not None and context.progress is not None:
+        context.progress.set_dialogues(dialogues)
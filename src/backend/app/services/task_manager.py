@@ -1,40 +1,336 @@
+import os
+import time
 import uuid
+import shutil
 import asyncio
 import traceback
-from typing import Dict, Any
-from ..models.podcast import PodcastCustomForm, PodcastScript, PodcastGenerationResponse
+from typing import Dict, Any, List, Optional, Set, Tuple
+from ..models.podcast import (
+    PodcastCustomForm, PodcastScript, PodcastGenerationResponse, PodcastBatchItem, PodcastBatchResponse
+)
 from .script_generator import ScriptGenerator
 from .tts_service import TTSService
+from .task_context import TaskContext, task_context_scope
+from .admission_control import admission_controller, classify_priority, PRIORITY_NAMES
+from .task_scheduler import (
+    FairTaskScheduler, DEFAULT_TENANT, estimate_job_cost, estimate_task_deadline, parse_tenant_weights
+)
+from .task_checkpoint import (
+    TaskCheckpoint, find_resumable_tasks, prune_stale_checkpoints, STAGE_SCRIPT, STAGE_MASTER, TERMINAL_STATUSES
+)
+from .request_dedup import request_deduplicator, form_fingerprint
+from .webhook_notifier import webhook_notifier
+from .task_progress import TaskProgress, PROGRESS_SCRIPT_WORDS, PROGRESS_SEGMENTS
+from .task_registry import TaskRegistry
 from ..core.config import settings
 
 class PodcastTask:
-    def __init__(self, task_id: str, form: PodcastCustomForm):
+    def __init__(self, task_id: str, form: PodcastCustomForm, priority: int,
+                 tenant: str = DEFAULT_TENANT):
         self.task_id = task_id
         self.form = form
-        self.status = "pending"
-        self.script = None
+        self.priority = priority  # 优先级（预览任务优先于长时长渲染）
+        self.tenant = tenant  # 所属租户（公平调度的维度）
+        self.progress = TaskProgress()  # 状态/进度事件流（增量状态查询与长轮询）
+        self._status = "pending"
+        self._script: Optional[PodcastScript] = None
         self.audio_path = None
         self.error_message = None
+        self.context: Optional[TaskContext] = None  # 执行上下文（截止时间、取消标记）
+        self.runner: Optional[asyncio.Task] = None  # 正在执行该任务的协程
+        self.checkpoint: Optional[TaskCheckpoint] = None  # 阶段检查点（进程重启后据此恢复）
+        self.fingerprint: Optional[str] = None  # 请求指纹（规范化定制单 + 引擎配置）
+        self.callback_urls: List[str] = []  # 任务结束时回调的地址
+
+    def to_record(self) -> Dict[str, Any]:
+        """结束后写入磁盘的精简记录（不含上下文、进度事件等运行时状态）"""
+        return {
+            "task_id": self.task_id,
+            "status": self.status,
+            "form": self.form.model_dump(mode="json"),
+            "priority": self.priority,
+            "tenant": self.tenant,
+            "script": self.script.model_dump(mode="json") if self.script else None,
+            "audio_path": self.audio_path,
+            "error_message": self.error_message,
+            "fingerprint": self.fingerprint,
+            "finished_at": time.time()
+        }
+
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> "PodcastTask":
+        task = cls(
+            record["task_id"],
+            PodcastCustomForm(**record["form"]),
+            record.get("priority", 1),
+            record.get("tenant", DEFAULT_TENANT)
+        )
+        task.status = record["status"]
+        task.script = PodcastScript(**record["script"]) if record.get("script") else None
+        task.audio_path = record.get("audio_path")
+        task.error_message = record.get("error_message")
+        task.fingerprint = record.get("fingerprint")
+        return task
+
+    @property
+    def status(self) -> str:
+        return self._status
+
+    @status.setter
+    def status(self, value: str):
+        if value == self._status:
+            return
+        self._status = value
+        self.progress.record_status(value)
+
+    @property
+    def script(self) -> Optional[PodcastScript]:
+        return self._script
+
+    @script.setter
+    def script(self, value: Optional[PodcastScript]):
+        self._script = value
+        if value is not None:
+            self.progress.set_dialogues(value.dialogues)
 
 class TaskManager:
     def __init__(self):
-        self.tasks: Dict[str, PodcastTask] = {}
+        # 内存中只保留未结束任务和最近结束的任务，其余按需从磁盘记录加载
+        self.tasks: TaskRegistry[PodcastTask] = TaskRegistry(
+            settings.task_registry_dir,
+            settings.task_registry_recent_max,
+            PodcastTask.to_record,
+            PodcastTask.from_record
+        )
         self.script_generator = ScriptGenerator()
         self.tts_service = TTSService()
-        self.queue: asyncio.Queue = asyncio.Queue()
+        # 按租户加权公平调度的队列（同一租户内先来先服务，优先级高于公平顺序）
+        self.queue = FairTaskScheduler(parse_tenant_weights(settings.tenant_weights))
+        self.queued: Dict[int, Set[str]] = {priority: set() for priority in PRIORITY_NAMES}
+        self.batches: Dict[str, Tuple[float, List[str]]] = {}  # 批次ID -> (创建时间, 任务ID（按提交顺序）)
+        self._background: Set[asyncio.Task] = set()
         self.workers_started = False
         self.worker_count = max(1, getattr(settings, 'task_worker_count', 2))
 
-    async def create_task(self, form: PodcastCustomForm) -> str:
-        """创建新的播客生成任务"""
+    async def create_task(self, form: PodcastCustomForm, tenant: str = DEFAULT_TENANT,
+                          idempotency_key: Optional[str] = None,
+                          callback_url: Optional[str] = None) -> str:
+        """创建新的播客生成任务（队列超限时抛出 QueueFullError）
+
+        相同定制单的任务正在执行或结果仍在缓存中时，直接返回已有任务而不重新生成
+
+        Args:
+            form: 播客定制单
+            tenant: 所属租户（API Key / 客户端ID / 客户端地址），用于公平调度
+            idempotency_key: 客户端提供的幂等键（同一key内容不同时抛出 IdempotencyConflict）
+            callback_url: 任务结束时回调的地址
+        """
+        fingerprint = form_fingerprint(form, tenant) if settings.request_dedup_enabled else None
+        existing_task_id = self._reuse_existing(form, tenant, fingerprint, idempotency_key, callback_url)
+        if existing_task_id:
+            return existing_task_id
+
+        priority = classify_priority(form.target_duration)
+        admission_controller.admit(self._queued_counts(), priority, self.worker_count)
+        return self._new_task(form, tenant, priority, fingerprint, idempotency_key, callback_url)
+
+    async def create_batch(self, forms: List[PodcastCustomForm], tenant: str = DEFAULT_TENANT,
+                           callback_url: Optional[str] = None) -> str:
+        """
+        批量创建任务（整批准入，超限时整体抛出 QueueFullError）
+
+        批内相同的定制单只生成一次；各任务的RAG检索和素材分析在提交时即并发预热，
+        相同主题/素材只计算一次，工作协程执行到各任务时直接命中缓存，
+        预处理与其他任务的剧本、音频生成重叠进行
+
+        Returns:
+            批次ID
+        """
+        # 第一遍：找出可复用的任务和批内重复的定制单，剩余的整批准入
+        assigned: List[Optional[str]] = []
+        new_items = []  # (下标, 定制单, 指纹, 优先级)
+        duplicates: Dict[int, int] = {}  # 批内重复项下标 -> 首次出现的下标
+        first_index: Dict[str, int] = {}
+        for index, form in enumerate(forms):
+            fingerprint = form_fingerprint(form, tenant) if settings.request_dedup_enabled else None
+            existing_task_id = self._reuse_existing(form, tenant, fingerprint, None, callback_url)
+            assigned.append(existing_task_id)
+            if existing_task_id:
+                continue
+            if fingerprint and fingerprint in first_index:
+                duplicates[index] = first_index[fingerprint]
+                continue
+            if fingerprint:
+                first_index[fingerprint] = index
+            new_items.append((index, form, fingerprint, classify_priority(form.target_duration)))
+
+        admission_controller.admit_batch(
+            self._queued_counts(), [item[3] for item in new_items], self.worker_count
+        )
+
+        for index, form, fingerprint, priority in new_items:
+            assigned[index] = self._new_task(form, tenant, priority, fingerprint, None, callback_url)
+        for index, original in duplicates.items():
+            assigned[index] = assigned[original]
+
+        self._prune_batches()
+        batch_id = str(uuid.uuid4())
+        self.batches[batch_id] = (time.time(), list(assigned))
+        self._spawn(self.script_generator.prefetch_preprocessing([item[1] for item in new_items]))
+        print(f"[batch {batch_id}] 批量创建 {len(forms)} 个任务（新建 {len(new_items)}，复用 {len(forms) - len(new_items)}）")
+        return batch_id
+
+    def _reuse_existing(self, form: PodcastCustomForm, tenant: str, fingerprint: Optional[str],
+                        idempotency_key: Optional[str], callback_url: Optional[str]) -> Optional[str]:
+        """相同请求已有任务时返回其ID（并登记回调）"""
+        if not fingerprint:
+            return None
+        existing_task_id = self._find_existing_task(form, tenant, fingerprint, idempotency_key)
+        if existing_task_id:
+            print(f"[{existing_task_id}] 相同请求复用已有任务")
+            if callback_url:
+                self._add_callback(self.tasks[existing_task_id], callback_url)
+        return existing_task_id
+
+    def _new_task(self, form: PodcastCustomForm, tenant: str, priority: int, fingerprint: Optional[str],
+                  idempotency_key: Optional[str] = None, callback_url: Optional[str] = None) -> str:
+        """创建任务并入队（已通过准入）"""
         task_id = str(uuid.uuid4())
-        task = PodcastTask(task_id, form)
+        task = PodcastTask(task_id, form, priority, tenant)
         task.status = "queued"
-        self.tasks[task_id] = task
-        await self.queue.put(task_id)
-        self._ensure_workers()
+        task.fingerprint = fingerprint
+        if callback_url:
+            task.callback_urls.append(callback_url)
+        if settings.task_checkpoint_enabled:
+            task.checkpoint = TaskCheckpoint.create(
+                task_id, form.model_dump(mode="json"), tenant, priority, task.callback_urls
+            )
+        self._enqueue(task, idempotency_key)
+        return task_id
+
+    def _spawn(self, coroutine):
+        """在后台运行协程（保留引用，避免被垃圾回收）"""
+        background = asyncio.get_running_loop().create_task(coroutine)
+        self._background.add(background)
+        background.add_done_callback(self._background.discard)
+
+    def _is_reusable(self, task_id: Optional[str]) -> bool:
+        task = self.tasks.get(task_id) if task_id else None
+        return task is not None and task.status not in ("failed", "cancelled")
+
+    def _find_existing_task(self, form: PodcastCustomForm, tenant: str, fingerprint: str,
+                            idempotency_key: Optional[str]) -> Optional[str]:
+        """查找同一租户可复用的任务：幂等键 > 进行中的相同请求 > 结果缓存"""
+        if idempotency_key:
+            task_id = request_deduplicator.task_for_key(tenant, idempotency_key, fingerprint)
+            if self._is_reusable(task_id):
+                return task_id
+
+        task_id = request_deduplicator.task_in_flight(fingerprint)
+        if self._is_reusable(task_id):
+            return task_id
+
+        cached = request_deduplicator.get_result(fingerprint)
+        if cached is None:
+            return None
+        if cached["audio_path"] and not os.path.exists(cached["audio_path"]):
+            return None
+
+        task_id = cached["task_id"]
+        if not self._is_reusable(task_id):
+            # 任务记录已不在内存中：用缓存结果恢复为已完成任务（沿用原task_id，下载地址不变）
+            task = PodcastTask(task_id, form, classify_priority(form.target_duration), tenant)
+            task.status = "completed"
+            task.fingerprint = fingerprint
+            task.script = PodcastScript(**cached["script"]) if cached["script"] else None
+            task.audio_path = cached["audio_path"]
+            self.tasks[task_id] = task
         return task_id
 
+    def _enqueue(self, task: PodcastTask, idempotency_key: Optional[str] = None):
+        if task.fingerprint:
+            request_deduplicator.register(task.fingerprint, task.task_id, task.tenant, idempotency_key)
+        self.tasks[task.task_id] = task
+        self.queued[task.priority].add(task.task_id)
+        self.queue.put(task.task_id, task.tenant, task.priority, estimate_job_cost(task.form))
+        self._ensure_workers()
+
+    def prune_task_records(self) -> int:
+        """删除超过保留期的已结束任务记录（启动时调用）"""
+        self._prune_batches()
+        return self.tasks.prune(settings.task_registry_retention_days * 86400)
+
+    def _prune_batches(self):
+        """
+        清理过期批次：创建时间超过任务记录保留期、且批次内任务均已结束的批次
+        （此时任务记录也已过期，批次状态只剩 not_found）
+        """
+        retention = settings.task_registry_retention_days * 86400
+        if retention <= 0:
+            return
+        cutoff = time.time() - retention
+        expired = [
+            batch_id for batch_id, (created_at, task_ids) in self.batches.items()
+            if created_at < cutoff and not any(self.tasks.is_active(task_id) for task_id in task_ids)
+        ]
+        for batch_id in expired:
+            del self.batches[batch_id]
+
+    def resume_interrupted_tasks(self) -> int:
+        """
+        重新排队进程退出前未完成的任务（启动时调用），
+        任务从检查点中最后完成的阶段继续执行
+
+        Returns:
+            恢复的任务数
+        """
+        if not settings.task_checkpoint_enabled:
+            return 0
+
+        # 失败、取消和中断过久的任务检查点不再恢复，先删除
+        stale = prune_stale_checkpoints(settings.task_checkpoint_ttl_hours * 3600)
+        if stale:
+            print(f"已清理 {stale} 个过期的任务检查点")
+
+        resumed = 0
+        for checkpoint in find_resumable_tasks():
+            if checkpoint.task_id in self.tasks:
+                continue
+            try:
+                form = PodcastCustomForm(**checkpoint.manifest["form"])
+            except Exception as e:
+                print(f"[{checkpoint.task_id}] 检查点中的定制单无效，放弃恢复: {str(e)}")
+                checkpoint.set_status("failed")
+                continue
+
+            task = PodcastTask(
+                checkpoint.task_id, form,
+                checkpoint.manifest.get("priority", classify_priority(form.target_duration)),
+                checkpoint.manifest.get("tenant", DEFAULT_TENANT)
+            )
+            task.status = "queued"
+            task.checkpoint = checkpoint
+            task.callback_urls = list(checkpoint.manifest.get("callback_urls", []))
+            if settings.request_dedup_enabled:
+                task.fingerprint = form_fingerprint(form, task.tenant)
+            self._enqueue(task)
+            resumed += 1
+            print(f"[{task.task_id}] 从检查点恢复任务（上次状态: {checkpoint.manifest.get('status')}）")
+
+        return resumed
+
+    def _queued_counts(self) -> Dict[int, int]:
+        return {priority: len(task_ids) for priority, task_ids in self.queued.items()}
+
+    def get_queue_stats(self) -> Dict[str, Any]:
+        """排队、准入与各租户公平调度统计"""
+        return {
+            **admission_controller.get_stats(self._queued_counts(), self.worker_count),
+            "scheduler": self.queue.get_stats(),
+            "dedup": request_deduplicator.get_stats(),
+            "registry": self.tasks.get_stats()
+        }
+
     def _ensure_workers(self):
         if self.workers_started:
             return
@@ -51,28 +347,111 @@ class TaskManager:
 
     async def _worker(self):
         while True:
-            task_id = await self.queue.get()
+            priority, task_id = await self.queue.get()
+            self.queued[priority].discard(task_id)
+            task = self.tasks.get(task_id)
             try:
-                await self._execute_task(task_id)
+                # 排队期间已被取消的任务直接跳过
+                if task is None or task.status == "cancelled":
+                    continue
+
+                started = time.monotonic()
+
+                # 任务上下文携带截止时间和取消标记，所有远端调用的超时和重试都受其约束；
+                # 任务在独立协程中执行，取消时只中断该任务，工作协程继续处理队列
+                task.context = TaskContext(
+                    task_id, estimate_task_deadline(task.form), task.checkpoint, task.progress
+                )
+                with task_context_scope(task.context):
+                    task.runner = asyncio.create_task(self._execute_task(task_id))
+                try:
+                    await task.runner
+                except asyncio.CancelledError:
+                    if task.status != "cancelled":
+                        raise
+                    self._release_task_artifacts(task)
+                else:
+                    # 以实际耗时更新吞吐估算，用于准入判断和 Retry-After
+                    admission_controller.record_completion(task.priority, time.monotonic() - started)
             except Exception as worker_error:
                 print(f"[{task_id}] 任务执行异常: {str(worker_error)}")
             finally:
-                self.queue.task_done()
+                if task is not None:
+                    task.runner = None
+                    task.context = None
+                    self._record_outcome(task)
+                    self._send_callbacks(task)
+                    if task.status in TERMINAL_STATUSES:
+                        self.tasks.finish(task)
+
+    def _record_outcome(self, task: PodcastTask):
+        """任务结束后更新请求去重索引：完成的结果进入TTL缓存，失败/取消的不再复用"""
+        if not task.fingerprint:
+            return
+        if task.status == "completed":
+            script = task.script.model_dump(mode="json") if task.script else None
+            request_deduplicator.store_result(task.fingerprint, task.task_id, script, task.audio_path)
+        elif task.status in ("failed", "cancelled"):
+            request_deduplicator.forget(task.fingerprint, task.task_id)
+
+    def _add_callback(self, task: PodcastTask, callback_url: str):
+        """为已有任务追加回调：已结束的任务立即回调"""
+        if task.status in ("completed", "failed", "cancelled"):
+            self._send_callbacks(task, [callback_url])
+        elif callback_url not in task.callback_urls:
+            task.callback_urls.append(callback_url)
+
+    def _send_callbacks(self, task: PodcastTask, urls: Optional[List[str]] = None):
+        """任务结束后在后台投递回调"""
+        if task.status not in ("completed", "failed", "cancelled"):
+            return
+        if urls is None:
+            # 每个回调地址只投递一次
+            urls, task.callback_urls = task.callback_urls, []
+        if not urls:
+            return
+        payload = self.get_task_status(task.task_id).model_dump(mode="json")
+        for url in urls:
+            webhook_notifier.notify(url, f"task.{task.status}", payload)
+
+    def _set_status(self, task: PodcastTask, status: str):
+        """更新任务状态（同步写入检查点清单）"""
+        task.status = status
+        if task.checkpoint is not None:
+            task.checkpoint.set_status(status)
 
     async def _execute_task(self, task_id: str):
-        """执行播客生成任务"""
+        """执行播客生成任务（启用检查点时跳过已完成的阶段）"""
         task = self.tasks[task_id]
+        checkpoint = task.checkpoint
 
         try:
-            task.status = "generating_script"
+            # 上次已生成母带、只差收尾的任务直接完成
+            saved_script = checkpoint.get_stage(STAGE_SCRIPT) if checkpoint else None
+            saved_master = checkpoint.get_stage(STAGE_MASTER) if checkpoint else None
+            if saved_script and saved_master and os.path.exists(saved_master.get("audio_path", "")):
+                task.script = PodcastScript(**saved_script)
+                task.audio_path = saved_master["audio_path"]
+                checkpoint.complete([task.audio_path])
+                task.status = "completed"
+                print(f"[{task_id}] 检查点中已有最终音频，任务完成")
+                return
+
+            self._set_status(task, "generating_script")
             print(f"[{task_id}] 开始生成剧本...")
 
             # 1. 生成剧本
             try:
-                print(f"[{task_id}] 调用脚本生成器...")
-                script = await self.script_generator.generate_script(task.form)
+                if saved_script:
+                    script = PodcastScript(**saved_script)
+                    print(f"[{task_id}] 从检查点恢复剧本，共 {len(script.dialogues)} 段对话")
+                else:
+                    print(f"[{task_id}] 调用脚本生成器...")
+                    script = await self.script_generator.generate_script(task.form)
+                    print(f"[{task_id}] 剧本生成完成，共 {len(script.dialogues)} 段对话")
+                    if checkpoint:
+                        checkpoint.save_stage(STAGE_SCRIPT, script.model_dump(mode="json"))
                 task.script = script
-                print(f"[{task_id}] 剧本生成完成，共 {len(script.dialogues)} 段对话")
             except Exception as script_error:
                 print(f"[{task_id}] 剧本生成异常: {str(script_error)}")
                 print(f"[{task_id}] 剧本生成异常详细: {traceback.format_exc()}")
@@ -86,10 +465,12 @@ class TaskManager:
                 print(f"[{task_id}] 音频生成已禁用，任务完成（仅剧本）")
                 task.status = "completed"
                 task.audio_path = None  # 明确设置为None
+                if checkpoint:
+                    checkpoint.complete([])
                 return
 
             # 2. 生成音频（如果启用）
-            task.status = "generating_audio"
+            self._set_status(task, "generating_audio")
             print(f"[{task_id}] 开始生成音频...")
 
             # 根据设置的氛围生成音频
@@ -105,6 +486,8 @@ class TaskManager:
                     enable_bgm=True       # 启用背景音乐
                 )
                 task.audio_path = audio_path
+                if checkpoint:
+                    checkpoint.save_stage(STAGE_MASTER, {"audio_path": audio_path})
                 print(f"[{task_id}] 音频生成完成: {audio_path}")
             except Exception as audio_error:
                 print(f"[{task_id}] 音频生成异常: {str(audio_error)}")
@@ -117,16 +500,77 @@ class TaskManager:
                 task.script.estimated_duration = duration
 
             task.status = "completed"
+            if checkpoint:
+                # 删除片段等中间产物，只保留最终音频
+                checkpoint.complete([audio_path])
             print(f"[{task_id}] 播客生成完成！音频时长: {duration}秒")
 
+        except asyncio.CancelledError:
+            task.status = "cancelled"
+            print(f"[{task_id}] 任务已取消，释放中间产物")
+            raise
+
         except Exception as e:
-            task.status = "failed"
+            self._set_status(task, "failed")
             task.error_message = str(e)
             print(f"[{task_id}] 任务失败: {str(e)}")
             print(f"[{task_id}] 任务失败详细: {traceback.format_exc()}")
 
-    def get_task_status(self, task_id: str) -> PodcastGenerationResponse:
-        """获取任务状态"""
+    def cancel_task(self, task_id: str, tenant: Optional[str] = None) -> Optional[bool]:
+        """
+        取消任务：排队中的任务不再执行；执行中的任务中断正在进行的LLM/TTS调用，
+        线程池中的同步代码在下一个检查点退出
+
+        Args:
+            task_id: 任务ID
+            tenant: 发起取消的租户，传入时只允许取消该租户创建的任务
+
+        Returns:
+            None表示任务不存在，False表示任务已结束无法取消，True表示已取消
+
+        Raises:
+            PermissionError: 任务不属于发起取消的租户
+        """
+        task = self.tasks.get(task_id)
+        if task is None:
+            return None
+        if tenant is not None and task.tenant != tenant:
+            raise PermissionError("只能取消本租户创建的任务")
+        if task.status in ("completed", "failed", "cancelled"):
+            return False
+
+        task.status = "cancelled"
+        task.error_message = "任务已被用户取消"
+        self.queued[task.priority].discard(task_id)
+        if task.context is not None:
+            task.context.cancel()
+        if task.runner is not None and not task.runner.done():
+            task.runner.cancel()
+        else:
+            # 尚未开始执行：直接删除任务目录（含检查点清单，重启后不会再恢复）
+            self._release_task_artifacts(task)
+            self._record_outcome(task)
+            self._send_callbacks(task)
+            self.tasks.finish(task)
+
+        print(f"[{task_id}] 收到取消请求")
+        return True
+
+    def _release_task_artifacts(self, task: PodcastTask):
+        """删除已取消任务产生的中间音频文件和检查点"""
+        task.audio_path = None
+        task_dir = os.path.join(settings.audio_output_dir, task.task_id)
+        if os.path.isdir(task_dir):
+            shutil.rmtree(task_dir, ignore_errors=True)
+
+    def get_task_status(self, task_id: str, since: Optional[str] = None) -> PodcastGenerationResponse:
+        """获取任务状态
+
+        Args:
+            task_id: 任务ID
+            since: 客户端上次拿到的游标；传入时不再返回生成中的完整剧本，改为返回游标之后
+                   变化的对话和进度事件（completed 仍返回完整剧本；游标已失效时返回全部）
+        """
         if task_id not in self.tasks:
             return PodcastGenerationResponse(
                 task_id=task_id,
@@ -135,41 +579,108 @@ class TaskManager:
             )
 
         task = self.tasks[task_id]
+        fields = self._status_fields(task)
+        progress = task.progress
+
+        if since is not None:
+            if task.status != "completed":
+                fields.pop("script", None)
+            revision = progress.resolve_cursor(since)
+            fields["events"] = progress.events_since(revision)
+            fields["dialogue_delta"] = progress.dialogues_since(revision)
+
+        return PodcastGenerationResponse(
+            task_id=task_id,
+            cursor=progress.cursor,
+            progress=dict(progress.stages) or None,
+            **fields
+        )
 
+    def _status_fields(self, task: PodcastTask) -> Dict[str, Any]:
+        """按任务状态组织响应内容"""
         if task.status == "completed":
-            audio_url = f"/api/v1/podcast/download/{task_id}" if task.audio_path else None
-            return PodcastGenerationResponse(
-                task_id=task_id,
-                status=task.status,
-                script=task.script,
-                audio_url=audio_url,
-                message="播客生成完成"
-            )
+            audio_url = f"/api/v1/podcast/download/{task.task_id}" if task.audio_path else None
+            return {
+                "status": task.status,
+                "script": task.script,
+                "audio_url": audio_url,
+                "message": "播客生成完成"
+            }
         elif task.status == "failed":
-            return PodcastGenerationResponse(
-                task_id=task_id,
-                status=task.status,
-                message=f"生成失败: {task.error_message}"
-            )
+            return {"status": task.status, "message": f"生成失败: {task.error_message}"}
+        elif task.status == "cancelled":
+            return {"status": task.status, "message": "任务已取消"}
         elif task.status == "generating_script":
-            return PodcastGenerationResponse(
-                task_id=task_id,
-                status=task.status,
-                message="正在生成剧本..."
-            )
+            return {"status": task.status, "message": "正在生成剧本..."}
         elif task.status == "generating_audio":
-            return PodcastGenerationResponse(
-                task_id=task_id,
-                status=task.status,
-                script=task.script,
-                message="正在生成音频..."
-            )
+            return {"status": task.status, "script": task.script, "message": "正在生成音频..."}
         else:
-            return PodcastGenerationResponse(
+            return {"status": task.status, "message": "任务排队中..."}
+
+    async def wait_for_change(self, task_id: str, cursor: str, timeout: float):
+        """
+        长轮询：等待任务游标超过 cursor（状态、进度或对话有变化）或超时
+
+        Args:
+            task_id: 任务ID
+            cursor: 客户端已知的游标
+            timeout: 最长等待秒数
+        """
+        task = self.tasks.get(task_id)
+        if task is not None and task.status not in TERMINAL_STATUSES:
+            await task.progress.wait(task.progress.resolve_cursor(cursor), timeout)
+
+    def get_batch_status(self, batch_id: str) -> Optional[PodcastBatchResponse]:
+        """汇总批次内各任务的状态与整体进度（批次不存在时返回None）"""
+        batch = self.batches.get(batch_id)
+        if batch is None:
+            return None
+        _, task_ids = batch
+
+        items = []
+        counts: Dict[str, int] = {}
+        fractions = []
+        for task_id in task_ids:
+            task = self.tasks.get(task_id)
+            status = task.status if task else "not_found"
+            counts[status] = counts.get(status, 0) + 1
+            fractions.append(self._progress_fraction(task))
+            items.append(PodcastBatchItem(
                 task_id=task_id,
-                status=task.status,
-                message="任务排队中..."
-            )
+                status=status,
+                audio_url=f"/api/v1/podcast/download/{task_id}" if task and task.audio_path and status == "completed" else None,
+                progress=(dict(task.progress.stages) or None) if task else None
+            ))
+
+        finished = sum(count for status, count in counts.items() if status in TERMINAL_STATUSES + ("not_found",))
+        done = finished == len(task_ids)
+        return PodcastBatchResponse(
+            batch_id=batch_id,
+            status="completed" if done else "processing",
+            total=len(task_ids),
+            counts=counts,
+            progress=round(sum(fractions) / max(1, len(fractions)), 3),
+            items=items,
+            message="批次已全部结束" if done else f"已结束 {finished}/{len(task_ids)} 个任务"
+        )
+
+    @staticmethod
+    def _progress_fraction(task: Optional[PodcastTask]) -> float:
+        """单个任务的大致进度：剧本阶段占前一半（按字数），音频阶段占后一半（按片段数）"""
+        if task is None or task.status in TERMINAL_STATUSES:
+            return 1.0
+
+        def stage_ratio(stage: str) -> float:
+            entry = task.progress.stages.get(stage)
+            if not entry or not entry["total"]:
+                return 0.0
+            return min(1.0, entry["done"] / entry["total"])
+
+        if task.status == "generating_audio":
+            return 0.5 + 0.5 * stage_ratio(PROGRESS_SEGMENTS)
+        if task.status == "generating_script":
+            return 0.5 * stage_ratio(PROGRESS_SCRIPT_WORDS)
+        return 0.0
 
     def get_task_audio_path(self, task_id: str) -> str:
         """获取任务的音频文件路径"""
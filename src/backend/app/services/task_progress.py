@@ -0,0 +1,117 @@
+"""
+任务进度与增量状态
+每个任务维护一个递增的游标（revision）：状态变化、阶段进度（如已合成片段数/总数）、
+剧本对话增加都会推进游标并记录事件。状态接口据此：
+- 以游标作为 ETag，未变化时返回 304
+- 按客户端上次拿到的游标只返回之后新增的事件和对话
+- 长轮询等待游标前进
+进度对象在任务记录重新加载、从检查点恢复时会重建，revision 从0重新计数，
+因此对外的游标带上每个进度对象随机生成的纪元（"<纪元>.<revision>"），
+纪元不一致的旧游标视为需要全量刷新
+"""
+
+import asyncio
+import secrets
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+# 进度阶段名称
+PROGRESS_SCRIPT_WORDS = "script_words"  # 剧本已生成字数/目标字数
+PROGRESS_SEGMENTS = "segments"  # 已处理音频片段数/对话总数
+
+
+class TaskProgress:
+    """单个任务的进度事件流"""
+
+    def __init__(self, max_events: int = 200):
+        self.epoch = secrets.token_hex(4)
+        self.revision = 0
+        self.events: Deque[Dict[str, Any]] = deque(maxlen=max_events)
+        self.stages: Dict[str, Dict[str, int]] = {}
+        self._dialogues: List[Dict[str, Any]] = []
+        self._dialogue_revisions: List[int] = []  # 每段对话最后一次变化时的游标
+        self._changed: Optional[asyncio.Event] = None
+
+    @property
+    def cursor(self) -> str:
+        """对外的游标（ETag 和 since 参数）"""
+        return f"{self.epoch}.{self.revision}"
+
+    def resolve_cursor(self, cursor: str) -> int:
+        """
+        把客户端传回的游标换算为本进度流的 revision
+
+        纪元不一致（进度对象已重建）或格式无效时返回-1：之后的事件和全部对话都视为新增
+        """
+        epoch, _, revision = (cursor or "").partition(".")
+        if epoch != self.epoch or not revision.isdigit():
+            return -1
+        return int(revision)
+
+    def _record(self, event: Dict[str, Any], coalesce: bool = False):
+        """推进游标并记录事件；coalesce 时替换同一阶段的上一条进度事件，避免事件流被逐句进度占满"""
+        self.revision += 1
+        if coalesce and self.events:
+            last = self.events[-1]
+            if last.get("type") == event["type"] and last.get("stage") == event.get("stage"):
+                self.events.pop()
+        self.events.append({"seq": self.revision, "time": round(time.time(), 3), **event})
+
+        # 唤醒等待的长轮询请求
+        if self._changed is not None:
+            self._changed.set()
+            self._changed = None
+
+    def record_status(self, status: str):
+        self._record({"type": "status", "status": status})
+
+    def update_stage(self, stage: str, done: int, total: int):
+        """更新阶段进度（done/total 未变化时不推进游标）"""
+        current = self.stages.get(stage)
+        if current and current["done"] == done and current["total"] == total:
+            return
+        self.stages[stage] = {"done": done, "total": total}
+        self._record({"type": "progress", "stage": stage, "done": done, "total": total}, coalesce=True)
+
+    def set_dialogues(self, dialogues: List[Any]):
+        """
+        更新当前对话列表（生成中的草稿或最终剧本）：
+        与上次相同的前缀保留原游标，第一处不同之后的对话都视为新增
+        """
+        items = [item.model_dump(mode="json") if hasattr(item, "model_dump") else dict(item) for item in dialogues]
+
+        unchanged = 0
+        while (unchanged < min(len(items), len(self._dialogues))
+               and items[unchanged] == self._dialogues[unchanged]):
+            unchanged += 1
+        if unchanged == len(items) == len(self._dialogues):
+            return
+
+        self._record({"type": "dialogues", "count": len(items), "offset": unchanged})
+        self._dialogues = items
+        self._dialogue_revisions = self._dialogue_revisions[:unchanged] + [self.revision] * (len(items) - unchanged)
+
+    def dialogues_since(self, cursor: int) -> Dict[str, Any]:
+        """游标之后变化的对话：{"offset": 起始下标, "count": 对话总数, "dialogues": [...]}（客户端从offset处替换并截断到count）"""
+        offset = len(self._dialogues)
+        for index, revision in enumerate(self._dialogue_revisions):
+            if revision > cursor:
+                offset = index
+                break
+        return {"offset": offset, "count": len(self._dialogues), "dialogues": self._dialogues[offset:]}
+
+    def events_since(self, cursor: int) -> List[Dict[str, Any]]:
+        return [event for event in self.events if event["seq"] > cursor]
+
+    async def wait(self, cursor: int, timeout: float) -> bool:
+        """等待游标超过 cursor（超时返回False）"""
+        if self.revision > cursor:
+            return True
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
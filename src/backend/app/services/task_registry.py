@@ -0,0 +1,145 @@
+"""
+有界任务注册表
+内存中只保留未结束的任务和最近结束的一小批任务（LRU），
+任务结束时写入磁盘上的精简记录（状态、定制单、剧本、音频路径），
+被挤出内存后由状态查询、下载等调用按需重新加载，进程内存不再随服务的播客数线性增长
+"""
+
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Generic, Optional, TypeVar
+
+from .task_checkpoint import TERMINAL_STATUSES, write_json_atomic
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class TaskRegistry(Generic[T]):
+    """任务注册表（按任务ID存取，接口与dict一致）"""
+
+    def __init__(self, store_dir: str, recent_max: int,
+                 to_record: Callable[[T], Dict[str, Any]],
+                 from_record: Callable[[Dict[str, Any]], T]):
+        """
+        Args:
+            store_dir: 已结束任务的记录目录
+            recent_max: 内存中保留的已结束任务数
+            to_record: 任务 -> 可JSON序列化的记录
+            from_record: 记录 -> 任务
+        """
+        self.store_dir = store_dir
+        self.recent_max = max(0, recent_max)
+        self._to_record = to_record
+        self._from_record = from_record
+        self._active: Dict[str, T] = {}
+        self._recent: "OrderedDict[str, T]" = OrderedDict()
+        self.stats = {"spilled": 0, "reloaded": 0, "evicted": 0}
+
+    def _record_path(self, task_id: str) -> str:
+        # task_id 来自URL，只接受文件名安全的字符，避免路径穿越
+        safe_id = "".join(ch for ch in task_id if ch.isalnum() or ch == "-")
+        return os.path.join(self.store_dir, f"{safe_id}.json")
+
+    # ---------- dict接口 ----------
+
+    def __setitem__(self, task_id: str, task: T):
+        if getattr(task, "status", None) in TERMINAL_STATUSES:
+            self._active.pop(task_id, None)
+            self._remember(task_id, task)
+        else:
+            self._recent.pop(task_id, None)
+            self._active[task_id] = task
+
+    def __getitem__(self, task_id: str) -> T:
+        task = self.get(task_id)
+        if task is None:
+            raise KeyError(task_id)
+        return task
+
+    def __contains__(self, task_id: str) -> bool:
+        return self.get(task_id) is not None
+
+    def get(self, task_id: str, default: Optional[T] = None) -> Optional[T]:
+        """按ID取任务：内存中没有时从磁盘记录重新加载"""
+        task = self._active.get(task_id)
+        if task is not None:
+            return task
+
+        task = self._recent.get(task_id)
+        if task is not None:
+            self._recent.move_to_end(task_id)
+            return task
+
+        task = self._load(task_id)
+        if task is None:
+            return default
+        self._remember(task_id, task)
+        return task
+
+    def is_active(self, task_id: str) -> bool:
+        """任务是否仍未结束（只查内存，不加载磁盘记录）"""
+        return task_id in self._active
+
+    # ---------- 结束/换出 ----------
+
+    def finish(self, task: T):
+        """任务结束：写入磁盘记录，从活跃集合移入最近LRU"""
+        task_id = getattr(task, "task_id")
+        self._active.pop(task_id, None)
+        self._spill(task_id, task)
+        self._remember(task_id, task)
+
+    def _remember(self, task_id: str, task: T):
+        self._recent[task_id] = task
+        self._recent.move_to_end(task_id)
+        while len(self._recent) > self.recent_max:
+            self._recent.popitem(last=False)
+            self.stats["evicted"] += 1
+
+    def _spill(self, task_id: str, task: T):
+        try:
+            os.makedirs(self.store_dir, exist_ok=True)
+            write_json_atomic(self._record_path(task_id), self._to_record(task))
+            self.stats["spilled"] += 1
+        except Exception as e:
+            logger.warning(f"[TaskRegistry] 任务 {task_id} 记录写入失败: {e}")
+
+    def _load(self, task_id: str) -> Optional[T]:
+        path = self._record_path(task_id)
+        if not os.path.isfile(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+            if record.get("task_id") != task_id:
+                return None
+            task = self._from_record(record)
+            self.stats["reloaded"] += 1
+            return task
+        except Exception as e:
+            logger.warning(f"[TaskRegistry] 任务 {task_id} 记录读取失败: {e}")
+            return None
+
+    def prune(self, retention_seconds: float) -> int:
+        """删除超过保留期的任务记录，返回删除数"""
+        if retention_seconds <= 0 or not os.path.isdir(self.store_dir):
+            return 0
+        cutoff = time.time() - retention_seconds
+        removed = 0
+        for name in os.listdir(self.store_dir):
+            path = os.path.join(self.store_dir, name)
+            try:
+                if name.endswith(".json") and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                continue
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"active": len(self._active), "recent": len(self._recent), **self.stats}
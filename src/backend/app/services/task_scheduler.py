@@ -0,0 +1,149 @@
+"""
+多租户加权公平调度（WFQ）
+每个租户（API Key / 客户端ID / 客户端地址）的任务按"虚拟完成时间"排队：
+任务代价按目标时长和角色数估算，租户权重越高代价折算越小。
+单个租户一次提交大量长任务时，只会排在自己之前的任务后面，不会饿死其他租户。
+优先级（预览/标准）仍然优先于公平顺序
+"""
+
+import asyncio
+import hashlib
+import heapq
+import itertools
+import logging
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..core.config import settings
+from ..models.podcast import PodcastCustomForm
+from .admission_control import parse_target_minutes
+
+logger = logging.getLogger(__name__)
+
+# 无法识别租户时使用的默认租户
+DEFAULT_TENANT = "anonymous"
+
+# 未填写目标时长时按该分钟数估算
+DEFAULT_JOB_MINUTES = 5
+
+
+def resolve_tenant(api_key: Optional[str] = None, client_id: Optional[str] = None,
+                   client_host: Optional[str] = None) -> str:
+    """
+    确定请求所属租户：API Key 优先，其次客户端ID，最后客户端地址。
+    API Key 只保留哈希前缀，避免出现在日志和 /metrics 中
+    """
+    if api_key:
+        return "key:" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+    if client_id:
+        return f"client:{client_id}"
+    if client_host:
+        return f"host:{client_host}"
+    return DEFAULT_TENANT
+
+
+def parse_tenant_weights(raw: str) -> Dict[str, float]:
+    """解析租户权重配置，格式：tenant1:2,tenant2:0.5"""
+    weights: Dict[str, float] = {}
+    for item in (raw or "").split(","):
+        if ":" not in item:
+            continue
+        tenant, _, weight = item.strip().rpartition(":")
+        try:
+            weights[tenant] = max(0.01, float(weight))
+        except ValueError:
+            logger.warning(f"忽略无效的租户权重配置: {item}")
+    return weights
+
+
+def estimate_job_cost(form: PodcastCustomForm) -> float:
+    """
+    估算任务代价：剧本轮次和TTS句数都随目标时长线性增长，
+    角色越多每轮需要的LLM调用和音色切换越多
+    """
+    minutes = parse_target_minutes(form.target_duration) or DEFAULT_JOB_MINUTES
+    extra_characters = max(0, len(form.characters) - 2)
+    return max(1, minutes) * (1.0 + 0.25 * extra_characters)
+
+
+def estimate_task_deadline(form: PodcastCustomForm) -> Optional[float]:
+    """
+    任务完成时限（秒）：配置了固定时限时直接使用，
+    否则按目标时长推算（基础时间 + 每分钟音频给予的时间），两者均为0时不限（返回None）
+    """
+    if settings.task_deadline_seconds > 0:
+        return float(settings.task_deadline_seconds)
+    minutes = parse_target_minutes(form.target_duration) or DEFAULT_JOB_MINUTES
+    deadline = settings.task_deadline_base_seconds + settings.task_deadline_per_minute_seconds * max(1, minutes)
+    return float(deadline) if deadline > 0 else None
+
+
+class FairTaskScheduler:
+    """按租户加权公平排队的异步任务队列"""
+
+    def __init__(self, weights: Optional[Dict[str, float]] = None, default_weight: float = 1.0):
+        self.weights = weights or {}
+        self.default_weight = default_weight
+        # 堆元素: (优先级, 虚拟完成时间, 入队序号, task_id, 租户)
+        self._heap: List[Tuple[int, float, int, str, str]] = []
+        self._sequence = itertools.count()
+        self._virtual_time = 0.0
+        self._last_finish: Dict[str, float] = {}
+        self._queued_by_tenant: Counter = Counter()
+        self._not_empty: Optional[asyncio.Event] = None
+
+    def _event(self) -> asyncio.Event:
+        if self._not_empty is None:
+            self._not_empty = asyncio.Event()
+        return self._not_empty
+
+    def _weight(self, tenant: str) -> float:
+        return self.weights.get(tenant, self.default_weight)
+
+    def put(self, task_id: str, tenant: str, priority: int, cost: float):
+        """
+        任务入队
+
+        Args:
+            task_id: 任务ID
+            tenant: 租户
+            priority: 优先级（数值越小越先执行）
+            cost: 估算代价
+        """
+        # 租户空闲一段时间后从当前虚拟时间重新开始，不能"攒"额度
+        start = max(self._virtual_time, self._last_finish.get(tenant, 0.0))
+        finish = start + cost / self._weight(tenant)
+        self._last_finish[tenant] = finish
+
+        heapq.heappush(self._heap, (priority, finish, next(self._sequence), task_id, tenant))
+        self._queued_by_tenant[tenant] += 1
+        self._event().set()
+
+    async def get(self) -> Tuple[int, str]:
+        """取出下一个任务，返回 (优先级, task_id)；队列为空时等待"""
+        event = self._event()
+        while not self._heap:
+            event.clear()
+            await event.wait()
+
+        priority, finish, _, task_id, tenant = heapq.heappop(self._heap)
+        # 虚拟时间推进到已开始服务的任务
+        self._virtual_time = max(self._virtual_time, finish)
+
+        self._queued_by_tenant[tenant] -= 1
+        if self._queued_by_tenant[tenant] <= 0:
+            del self._queued_by_tenant[tenant]
+        return priority, task_id
+
+    def qsize(self) -> int:
+        return len(self._heap)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """各租户排队数与权重"""
+        return {
+            "virtual_time": round(self._virtual_time, 2),
+            "tenants": {
+                tenant: {"queued": count, "weight": self._weight(tenant)}
+                for tenant, count in self._queued_by_tenant.items()
+            }
+        }
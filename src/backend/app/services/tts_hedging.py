@@ -0,0 +1,212 @@
+"""
+TTS对冲请求（hedged requests）
+Gradio Space排队时间长尾严重，单句可能卡住数分钟而拖慢整期播客。
+当某句超过按历史延迟分位数计算出的截止时间仍未返回时，
+向备用客户端再发一次相同请求，取先完成者，并限制对冲比例避免放大负载。
+对冲请求先完成时主通道被取消，此时记录主通道已等待的时长作为截尾样本（实际延迟至少这么长），
+否则延迟窗口里只剩主通道较快的那部分请求，分位数会被低估
+"""
+
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+import time
+from collections import deque
+from functools import partial
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 写文件型合成函数：接收输出路径，返回生成的文件路径
+FileProducer = Callable[[str], Awaitable[Optional[str]]]
+
+
+class _EngineLatency:
+    """单个引擎的滚动延迟窗口与对冲计数"""
+
+    def __init__(self, window: int):
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def percentile(self, p: float) -> float:
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, max(0, int(round(p / 100 * (len(ordered) - 1)))))
+        return ordered[index]
+
+
+class TTSHedger:
+    """基于延迟分位数的TTS对冲调度器"""
+
+    def __init__(self, enabled: bool = False, percentile: float = 95.0,
+                 min_delay: float = 5.0, initial_delay: float = 30.0,
+                 max_ratio: float = 0.1, window: int = 200, min_samples: int = 10):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.initial_delay = initial_delay
+        self.max_ratio = max_ratio
+        self.window = window
+        self.min_samples = min_samples
+        self._engines: Dict[str, _EngineLatency] = {}
+
+    def _engine(self, engine: str) -> _EngineLatency:
+        if engine not in self._engines:
+            self._engines[engine] = _EngineLatency(self.window)
+        return self._engines[engine]
+
+    def get_hedge_delay(self, engine: str) -> float:
+        """计算对冲截止时间（秒）：样本不足时使用初始值"""
+        stats = self._engine(engine)
+        if len(stats.samples) < self.min_samples:
+            return self.initial_delay
+        return max(self.min_delay, stats.percentile(self.percentile))
+
+    def _hedge_allowed(self, stats: _EngineLatency) -> bool:
+        # 对冲比例上限：已发出的对冲数不超过总请求数 * max_ratio
+        return stats.hedges + 1 <= stats.requests * self.max_ratio
+
+    def record_latency(self, engine: str, latency: float):
+        """记录一次主通道调用的延迟（成功完成的耗时，或被对冲胜出时已等待的时长）"""
+        self._engine(engine).samples.append(latency)
+
+    async def run_to_file(self, engine: str, output_path: str, primary: FileProducer,
+                          hedge: Optional[FileProducer] = None) -> Optional[str]:
+        """执行合成，超过截止时间后向备用通道发起对冲请求
+
+        Args:
+            engine: 引擎名称（延迟统计的维度）
+            output_path: 最终输出文件路径
+            primary: 主通道合成函数
+            hedge: 备用通道合成函数（为None时不对冲）
+
+        Returns:
+            输出文件路径（失败时为None）
+        """
+        stats = self._engine(engine)
+        stats.requests += 1
+
+        if not self.enabled or hedge is None:
+            started = time.monotonic()
+            result = await primary(output_path)
+            if result:
+                self.record_latency(engine, time.monotonic() - started)
+            return result
+
+        # 两个通道各自写入临时文件，胜者再移动到输出路径，
+        # 避免落败方的执行线程稍后覆盖已交付的文件
+        suffix = os.path.splitext(output_path)[1] or ".wav"
+        primary_path = _temp_path(suffix)
+
+        started = time.monotonic()
+        primary_task = asyncio.create_task(primary(primary_path))
+        tasks = {primary_task: primary_path}
+
+        hedge_delay = self.get_hedge_delay(engine)
+
+        try:
+            done, _ = await asyncio.wait({primary_task}, timeout=hedge_delay)
+
+            if not done and self._hedge_allowed(stats):
+                stats.hedges += 1
+                logger.warning(
+                    f"[Hedge] {engine} 超过 {hedge_delay:.1f}s 未返回，发起对冲请求 "
+                    f"(已对冲 {stats.hedges}/{stats.requests})"
+                )
+                hedge_path = _temp_path(suffix)
+                hedge_task = asyncio.create_task(hedge(hedge_path))
+                tasks[hedge_task] = hedge_path
+
+            pending = set(tasks)
+            last_error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                results = {}
+                for task in done:
+                    if task.exception() is not None:
+                        last_error = task.exception()
+                        logger.warning(f"[Hedge] {engine} 通道失败: {last_error}")
+                        continue
+                    result = task.result()
+                    if result and os.path.exists(result):
+                        results[task] = result
+
+                if not results:
+                    continue
+
+                # 主通道只要完成就记录真实延迟；对冲请求胜出时记录主通道已等待的时长（截尾样本）
+                self.record_latency(engine, time.monotonic() - started)
+                if primary_task in results:
+                    winner = primary_task
+                else:
+                    winner = next(iter(results))
+                    stats.hedge_wins += 1
+                    logger.info(f"[Hedge] {engine} 对冲请求先完成: {output_path}")
+                shutil.move(results[winner], output_path)
+                return output_path
+
+            if last_error is not None:
+                raise last_error
+            return None
+
+        finally:
+            for task, path in tasks.items():
+                if task.done():
+                    _discard_output(path, output_path, task)
+                else:
+                    # 落败方取消后才真正结束，届时再删除它写出的临时文件
+                    task.add_done_callback(partial(_discard_output, path, output_path))
+                    task.cancel()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取各引擎的延迟分位数与对冲统计"""
+        result = {"enabled": self.enabled, "engines": {}}
+        for engine, stats in self._engines.items():
+            result["engines"][engine] = {
+                "samples": len(stats.samples),
+                "p50": round(stats.percentile(50), 3) if stats.samples else None,
+                "p95": round(stats.percentile(95), 3) if stats.samples else None,
+                "hedge_delay": round(self.get_hedge_delay(engine), 3),
+                "requests": stats.requests,
+                "hedges": stats.hedges,
+                "hedge_wins": stats.hedge_wins
+            }
+        return result
+
+
+def _temp_path(suffix: str) -> str:
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+    temp_file.close()
+    return temp_file.name
+
+
+def _remove_quietly(path: str):
+    try:
+        if os.path.exists(path):
+            os.remove(path)
+    except OSError:
+        pass
+
+
+def _discard_output(path: str, output_path: str, task: asyncio.Task):
+    """删除某个通道的临时文件，以及它返回的结果文件（已移动到输出路径的胜者除外）"""
+    _remove_quietly(path)
+    if task.cancelled() or task.exception() is not None:
+        return
+    result = task.result()
+    if result and result != output_path:
+        _remove_quietly(result)
+
+
+tts_hedger = TTSHedger(
+    enabled=settings.tts_hedging_enabled,
+    percentile=settings.tts_hedge_percentile,
+    min_delay=settings.tts_hedge_min_delay,
+    initial_delay=settings.tts_hedge_initial_delay,
+    max_ratio=settings.tts_hedge_max_ratio
+)
@@ -6,9 +6,18 @@ import shutil
 from pydub import AudioSegment
 from ..models.podcast import PodcastScript, CharacterRole
 from ..core.config import settings
+from ..core.http_clients import http_clients
 from ..utils.text_cleaner import clean_for_tts
 from .voice_resolver_service import voice_resolver
+from .tts_singleflight import tts_singleflight
+from .adaptive_limiter import limiter_registry
+from .engine_router import engine_router
+from .audio_process_pool import audio_process_pool
+from .task_checkpoint import TaskCheckpoint, get_task_checkpoint, discard_segment_file
+from .task_context import report_progress
+from .task_progress import PROGRESS_SEGMENTS
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -18,7 +27,8 @@ class OpenAITTSService:
     def __init__(self):
         self.client = openai.OpenAI(
             api_key=settings.openai_api_key,
-            base_url=settings.openai_base_url
+            base_url=settings.openai_base_url,
+            http_client=http_clients.get_sync_client(settings.openai_base_url)
         )
         # OpenAI TTS支持的音色列表
         self.available_voices = ["alloy", "echo", "fable", "onyx", "nova", "shimmer"]
@@ -55,21 +65,41 @@ class OpenAITTSService:
             if cleaned_text != text:
                 logger.info(f"文本清理: [{text[:50]}...] -> [{cleaned_text[:50]}...]")
 
-            response = self.client.audio.speech.create(
+            # 记录单句耗时和结果，供引擎路由使用
+            async with engine_router.track("openai", voice, cleaned_text):
+                # 单飞去重：跨任务共享相同音色和文本的进行中请求
+                flight_key = tts_singleflight.make_key("openai_tts", voice, None, cleaned_text)
+                result_path = await tts_singleflight.run_to_file(
+                    flight_key,
+                    output_path,
+                    lambda path: self._speech_to_file(cleaned_text, voice, path)
+                )
+                if not result_path:
+                    raise Exception("共享的合成结果不可用")
+
+            return True
+        except Exception as e:
+            logger.error(f"OpenAI TTS合成失败 {output_path}: {str(e)}")
+            logger.warning("尝试生成占位符音频")
+            return self._create_placeholder_audio(output_path, text)
+
+    async def _speech_to_file(self, cleaned_text: str, voice: str, output_path: str) -> str:
+        """调用OpenAI TTS接口并写入输出文件"""
+        # 同步SDK调用放入线程池，避免阻塞事件循环；并发数由自适应限制器控制
+        limiter = limiter_registry.get("openai_tts", initial_limit=settings.tts_max_concurrency)
+        async with limiter.slot():
+            response = await asyncio.to_thread(
+                self.client.audio.speech.create,
                 model=settings.tts_model,
                 voice=voice,
                 input=cleaned_text,  # 使用清理后的文本
                 response_format="mp3"
             )
 
-            with open(output_path, 'wb') as f:
-                f.write(response.content)
+        with open(output_path, 'wb') as f:
+            f.write(response.content)
 
-            return True
-        except Exception as e:
-            logger.error(f"OpenAI TTS合成失败 {output_path}: {str(e)}")
-            logger.warning("尝试生成占位符音频")
-            return self._create_placeholder_audio(output_path, text)
+        return output_path
 
     def _create_placeholder_audio(self, output_path: str, text: str) -> bool:
         """创建占位符音频（静音 + 提示音）"""
@@ -112,18 +142,24 @@ class OpenAITTSService:
         for char in characters:
             character_voices[char.name] = self.get_voice_for_character(char.voice_description)
 
-        # 合成每个对话片段（并发 + 缓存复用）
-        max_concurrency = max(1, getattr(settings, 'tts_max_concurrency', 3))
-        semaphore = asyncio.Semaphore(max_concurrency)
+        # 合成每个对话片段（并发 + 缓存复用，并发上限由自适应限制器控制）
         segment_cache: Dict[tuple, str] = {}
         segment_results = []
+        checkpoint = get_task_checkpoint()
 
         async def process_segment(index: int, dialogue):
             voice = character_voices.get(dialogue.character_name, "alloy")
             output_path = os.path.join(task_dir, f"segment_{index:03d}.mp3")
-            cleaned_text = clean_for_tts(dialogue.content, None)
+            cleaned_text = dialogue.tts_text()
             cache_key = (voice, cleaned_text)
 
+            # 检查点中已有该句音频（进程重启前已合成）
+            segment_key = TaskCheckpoint.segment_key(voice, cleaned_text)
+            saved_path = checkpoint.get_segment(index, segment_key) if checkpoint else None
+            if saved_path:
+                segment_cache[cache_key] = saved_path
+                return index, saved_path, True
+
             if cache_key in segment_cache and os.path.exists(segment_cache[cache_key]):
                 try:
                     shutil.copyfile(segment_cache[cache_key], output_path)
@@ -132,17 +168,29 @@ class OpenAITTSService:
                 except Exception as copy_error:
                     logger.warning(f"缓存复制失败，重新合成: {copy_error}")
 
-            async with semaphore:
-                success = await self.synthesize_single_audio(dialogue.content, voice, output_path)
+            success = await self.synthesize_single_audio(cleaned_text, voice, output_path)
 
             if success:
                 segment_cache[cache_key] = output_path
+                if checkpoint:
+                    checkpoint.record_segment(index, segment_key, output_path)
             else:
                 logger.error(f"音频合成失败: {output_path}")
 
             return index, output_path, success
 
-        tasks = [asyncio.create_task(process_segment(i, dialogue)) for i, dialogue in enumerate(script.dialogues)]
+        completed = 0
+        report_progress(PROGRESS_SEGMENTS, 0, len(script.dialogues))
+
+        async def tracked_segment(index: int, dialogue):
+            nonlocal completed
+            try:
+                return await process_segment(index, dialogue)
+            finally:
+                completed += 1
+                report_progress(PROGRESS_SEGMENTS, completed, len(script.dialogues))
+
+        tasks = [asyncio.create_task(tracked_segment(i, dialogue)) for i, dialogue in enumerate(script.dialogues)]
 
         for result in await asyncio.gather(*tasks, return_exceptions=True):
             if isinstance(result, Exception):
@@ -158,34 +206,22 @@ class OpenAITTSService:
         # 拼接音频
         final_audio_path = await self.concatenate_audio(successful_segments, task_dir, task_id)
 
-        # 清理临时文件
+        # 清理临时文件（启用检查点时由任务完成时统一清理）
         for audio_file in successful_segments:
-            try:
-                os.remove(audio_file)
-            except:
-                pass
+            discard_segment_file(audio_file)
 
         return final_audio_path
 
     async def concatenate_audio(self, audio_files: List[str], task_dir: str, task_id: str) -> str:
-        """拼接音频文件"""
+        """拼接音频文件（解码、拼接和导出都在音频进程池中执行）"""
         try:
-            # 加载第一个音频文件
-            combined = AudioSegment.from_mp3(audio_files[0])
-
-            # 依次拼接其他音频文件
-            for audio_file in audio_files[1:]:
-                if os.path.exists(audio_file):
-                    segment = AudioSegment.from_mp3(audio_file)
-                    # 添加短暂停顿（500ms）
-                    pause = AudioSegment.silent(duration=500)
-                    combined = combined + pause + segment
-
-            # 保存最终音频
-            final_path = os.path.join(task_dir, f"podcast_{task_id}.mp3")
-            combined.export(final_path, format="mp3")
-
-            return final_path
+            # 片段间添加短暂停顿（500ms）
+            return await audio_process_pool.concat_files(
+                audio_files,
+                os.path.join(task_dir, f"podcast_{task_id}.mp3"),
+                pause_duration=500,
+                bitrate=None
+            )
 
         except Exception as e:
             logger.error(f"音频拼接失败: {str(e)}")
@@ -195,6 +231,20 @@ class OpenAITTSService:
 class TTSService:
     """统一的TTS服务管理器"""
 
+    # 引擎名称 -> (服务属性名, 模块名, 类名)
+    ENGINE_SERVICES = {
+        "cosyvoice": ("alicloud_cosyvoice_service", "alicloud_cosyvoice_service", "AliCloudCosyVoiceService"),
+        "qwen3_tts": ("qwen3_tts_service", "qwen3_tts_service", "Qwen3TTSService"),
+        "chatterbox": ("chatterbox_service", "chatterbox_tts_service", "ChatterboxTTSService"),
+        "nihal_tts": ("nihal_tts_service", "nihal_tts_service", "NihalTTSService"),
+        "indextts2_gradio": ("indextts2_gradio_service", "indextts2_gradio_service", "IndexTTS2GradioService"),
+        "indextts2": ("indextts_service", "indextts_service", "IndexTTSService"),
+        "openai": ("openai_service", None, None),
+    }
+
+    # 引擎不可用后暂停路由的时间（秒）
+    ENGINE_RETRY_INTERVAL = 300
+
     def __init__(self):
         self.tts_engine = getattr(settings, 'tts_engine', 'qwen3_tts')  # 默认使用Qwen3-TTS
         self.openai_service = None
@@ -204,9 +254,84 @@ class TTSService:
         self.nihal_tts_service = None
         self.chatterbox_service = None  # Chatterbox Multilingual TTS
         self.alicloud_cosyvoice_service = None  # AliCloud CosyVoice
+        self._engine_unavailable_until: Dict[str, float] = {}  # 路由模式下暂不可用的引擎
+
+    def _routing_candidates(self, characters: List[CharacterRole]) -> List[str]:
+        """配置的路由引擎中，能还原所有角色音色的引擎（保持配置顺序）"""
+        now = time.monotonic()
+        candidates = []
+        for engine in [item.strip().lower() for item in settings.tts_routing_engines.split(",") if item.strip()]:
+            if engine not in self.ENGINE_SERVICES:
+                continue
+            if self._engine_unavailable_until.get(engine, 0) > now:
+                continue
+            if all(voice_resolver.can_render(char.voice_description, engine, char.voice_file) for char in characters):
+                candidates.append(engine)
+        return candidates
+
+    async def _load_engine(self, engine: str):
+        """加载并检查指定引擎，不可用时返回None并暂停路由到该引擎"""
+        attr, module_name, class_name = self.ENGINE_SERVICES[engine]
+        service = getattr(self, attr)
+        if service is not None:
+            return service
+
+        try:
+            if engine == "openai":
+                if not settings.openai_api_key or settings.openai_api_key == "your_openai_api_key_here":
+                    raise Exception("OpenAI API密钥未配置")
+                service = OpenAITTSService()
+            else:
+                import importlib
+                module = importlib.import_module(f".{module_name}", __package__)
+                service = getattr(module, class_name)()
+
+                if engine == "indextts2":
+                    healthy = await service.initialize_model()
+                    error = "模型加载失败"
+                else:
+                    health = await service.health_check()
+                    healthy = health["status"] == "healthy"
+                    error = health.get("error", "未知错误")
+                if not healthy:
+                    raise Exception(error)
+
+        except Exception as e:
+            logger.warning(f"[Router] 引擎 {engine} 不可用: {str(e)}，{self.ENGINE_RETRY_INTERVAL}秒内不再路由")
+            self._engine_unavailable_until[engine] = time.monotonic() + self.ENGINE_RETRY_INTERVAL
+            engine_router.record_failure(engine)
+            return None
+
+        setattr(self, attr, service)
+        return service
+
+    async def _route_service(self, characters: List[CharacterRole]):
+        """按滚动统计选择最快的可用引擎（整期播客使用同一引擎，保证角色音色一致）"""
+        candidates = self._routing_candidates(characters)
+        voices = [char.voice_description for char in characters]
+
+        for engine in engine_router.rank(candidates, voices):
+            service = await self._load_engine(engine)
+            if service is not None:
+                logger.info(f"[Router] 本任务路由到引擎: {engine}")
+                return service
+
+        logger.warning("[Router] 没有可用的路由候选引擎，使用配置的引擎")
+        return None
+
+    def _engine_name(self, service) -> Optional[str]:
+        for engine, (attr, _, _) in self.ENGINE_SERVICES.items():
+            if getattr(self, attr) is service:
+                return engine
+        return None
+
+    async def get_tts_service(self, characters: Optional[List[CharacterRole]] = None):
+        """获取TTS服务（启用路由时按引擎实时表现选择，否则使用配置的引擎）"""
+        if settings.tts_routing_enabled and characters:
+            service = await self._route_service(characters)
+            if service is not None:
+                return service
 
-    async def get_tts_service(self):
-        """获取当前配置的TTS服务"""
         # AliCloud CosyVoice - 优先级高（国内服务，稳定性好）
         if self.tts_engine.lower() == 'cosyvoice':
             if not self.alicloud_cosyvoice_service:
@@ -342,7 +467,7 @@ class TTSService:
         """合成完整播客音频（带自动回退机制）"""
 
         # 尝试获取TTS服务
-        service = await self.get_tts_service()
+        service = await self.get_tts_service(characters)
         service_name = service.__class__.__name__
 
         try:
@@ -359,6 +484,11 @@ class TTSService:
         except Exception as e:
             logger.error(f"{service_name} 音频合成失败: {str(e)}")
 
+            # 整期合成失败计入路由统计，后续任务会优先选择其他引擎
+            failed_engine = self._engine_name(service)
+            if failed_engine:
+                engine_router.record_failure(failed_engine)
+
             # 如果不是OpenAI TTS，尝试回退到OpenAI TTS
             if service_name != "OpenAITTSService":
                 logger.info("回退到 OpenAI TTS 服务")
@@ -377,49 +507,23 @@ class TTSService:
     async def _create_fallback_audio(self, script: PodcastScript, task_id: str) -> str:
         """创建回退音频（占位符）"""
         try:
-            from pydub import AudioSegment
-            from pydub.generators import Sine
-
             logger.info(f"开始生成回退音频，对话数量: {len(script.dialogues)}")
 
             # 创建任务目录
             task_dir = os.path.join(settings.audio_output_dir, task_id)
             os.makedirs(task_dir, exist_ok=True)
 
-            # 为每段对话生成占位符音频
-            audio_segments = []
-
-            for i, dialogue in enumerate(script.dialogues):
-                # 根据内容长度计算音频时长
-                text_length = len(dialogue.content)
-                duration_ms = max(text_length * 200, 1000)  # 每个字200ms，最少1秒
-
-                # 生成提示音 + 静音
-                tone = Sine(440).to_audio_segment(duration=300)  # 300ms提示音
-                silence = AudioSegment.silent(duration=duration_ms - 300)
-                segment_audio = tone + silence
+            # 根据内容长度计算每段占位音频的时长：每个字200ms，最少1秒
+            durations = [max(len(dialogue.content) * 200, 1000) for dialogue in script.dialogues]
 
-                # 添加淡入淡出
-                segment_audio = segment_audio.fade_in(50).fade_out(50) - 15
-
-                # 添加片段间的停顿
-                if i > 0:
-                    pause = AudioSegment.silent(duration=800)
-                    audio_segments.append(pause)
-
-                audio_segments.append(segment_audio)
-                logger.info(f"生成第 {i+1} 段占位符音频 (时长: {duration_ms}ms)")
-
-            # 合并所有音频片段
-            combined_audio = audio_segments[0]
-            for segment in audio_segments[1:]:
-                combined_audio += segment
-
-            # 导出最终音频
-            final_path = os.path.join(task_dir, f"podcast_{task_id}.mp3")
-            combined_audio.export(final_path, format="mp3", bitrate="128k")
+            # 提示音 + 静音的生成、拼接（片段间800ms停顿）和导出在音频进程池中执行
+            final_path = await audio_process_pool.render_placeholder(
+                durations,
+                os.path.join(task_dir, f"podcast_{task_id}.mp3"),
+                pause_duration=800
+            )
 
-            total_duration = len(combined_audio) // 1000
+            total_duration = (sum(durations) + 800 * (len(durations) - 1)) // 1000
             logger.info(f"回退音频生成完成: {final_path} (总时长: {total_duration}秒)")
 
             return final_path
@@ -0,0 +1,98 @@
+"""
+TTS请求单飞（single-flight）去重
+多个任务同时合成完全相同的句子（引擎、音色、情感、清理后文本一致）时，
+只向远端发出一次请求，其余调用方等待并共享同一结果
+"""
+
+import logging
+import os
+import shutil
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from ..core.config import settings
+from ..utils.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+FlightKey = Tuple[str, str, Optional[str], str]
+
+
+class TTSSingleFlight:
+    """跨任务的TTS请求去重层"""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._flights = SingleFlight()
+        self.stats = {"leader_calls": 0, "shared_calls": 0}
+
+    @staticmethod
+    def make_key(engine: str, voice: str, emotion: Optional[str], cleaned_text: str) -> FlightKey:
+        """生成去重键：引擎 + 音色 + 情感 + 清理后文本"""
+        return (engine, voice or "", emotion or None, cleaned_text)
+
+    def _count(self, shared: bool):
+        self.stats["shared_calls" if shared else "leader_calls"] += 1
+
+    async def run(self, key: FlightKey, producer: Callable[[], Awaitable[Any]]) -> Any:
+        """执行返回值型的合成调用（如返回音频字节的引擎），相同键共享结果"""
+        if not self.enabled:
+            return await producer()
+
+        result, shared = await self._flights.do(key, producer)
+        self._count(shared)
+        return result
+
+    async def run_to_file(self, key: FlightKey, output_path: str,
+                          producer: Callable[[str], Awaitable[Optional[str]]]) -> Optional[str]:
+        """执行写文件型的合成调用，相同键只合成一次，结果复制到每个调用方的输出路径
+
+        Args:
+            key: 去重键
+            output_path: 当前调用方期望的输出文件路径
+            producer: 实际合成函数，接收输出路径，返回生成的文件路径（失败返回None）
+
+        Returns:
+            当前调用方输出路径上的音频文件（失败时为None）
+        """
+        if not self.enabled:
+            return await producer(output_path)
+
+        result_path, shared = await self._flights.do(
+            key, lambda: producer(output_path), payload=output_path, publish=self._copy_to_followers
+        )
+        self._count(shared)
+        if not shared:
+            return result_path
+
+        if result_path and os.path.exists(output_path):
+            logger.info(f"[SingleFlight] 复用进行中的合成结果: {output_path}")
+            return output_path
+        return None
+
+    @staticmethod
+    def _copy_to_followers(result_path: Optional[str], follower_paths: List[str]):
+        """
+        领头者在交付结果前把文件复制给所有跟随者，
+        避免领头任务随后删除自己的片段文件导致跟随者读不到
+        """
+        if not result_path or not os.path.exists(result_path):
+            return
+        for follower_path in follower_paths:
+            if os.path.abspath(follower_path) == os.path.abspath(result_path):
+                continue
+            try:
+                os.makedirs(os.path.dirname(follower_path) or ".", exist_ok=True)
+                shutil.copyfile(result_path, follower_path)
+            except Exception as copy_error:
+                logger.warning(f"[SingleFlight] 复制共享音频失败 {follower_path}: {copy_error}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取去重统计"""
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._flights),
+            **self.stats
+        }
+
+
+tts_singleflight = TTSSingleFlight(enabled=settings.tts_singleflight_enabled)
@@ -15,6 +15,7 @@ from PIL import Image
 import io
 
 from ..core.config import settings
+from ..core.http_clients import http_clients
 
 logger = logging.getLogger(__name__)
 
@@ -202,7 +203,7 @@ class HunyuanVisionService:
             }
 
             # 发送API请求
-            async with aiohttp.ClientSession() as session:
+            async with http_clients.session() as session:
                 async with session.post(
                     f"{self.base_url}/chat/completions",
                     headers=headers,
@@ -14,6 +14,9 @@ logger = logging.getLogger(__name__)
 class VoiceResolverService:
     """统一音色解析服务"""
 
+    # 支持以参考音频（自定义音色文件）合成的引擎
+    FILE_VOICE_ENGINES = ("indextts2", "indextts2_gradio", "chatterbox")
+
     def __init__(self):
         # CosyVoice官方音色映射（v1和v2通用）
         self.cosyvoice_voices = {
@@ -483,6 +486,78 @@ class VoiceResolverService:
 
         return defaults.get(tts_engine.lower(), "default")
 
+    def get_voice_family(self, voice: str) -> str:
+        """
+        获取音色所属的音色族（用于按音色统计引擎性能）
+
+        Args:
+            voice: 音色描述、任一引擎的音色ID或音色文件路径
+
+        Returns:
+            "male" / "female" / "neutral" / "custom"
+        """
+        if not voice:
+            return "neutral"
+
+        voice = voice.strip()
+        # 注意Qwen3音色ID本身含有"/"，不能按路径分隔符判断
+        is_file = voice.lower().endswith(('.wav', '.mp3', '.m4a')) or os.path.isabs(voice)
+        if is_file:
+            # 内置样本文件名带有性别信息（如 voice_female.wav），其余视为自定义音色
+            return self._detect_gender(Path(voice).stem) or "custom"
+
+        voice_id = voice.replace('_v2', '').replace('_v3', '')
+        label = (
+            self.cosyvoice_voices.get(voice_id)
+            or self.openai_voices.get(voice_id)
+            or self.qwen3_voices.get(voice_id)
+            or self.nihal_voices.get(voice_id.lower())
+        )
+        if label:
+            return self._detect_gender(label) or "neutral"
+
+        gender = self._detect_gender(voice)
+        if gender:
+            return gender
+
+        # 风格关键词：按其默认音色的性别归类
+        for keyword, engine_map in self.voice_keyword_mapping.items():
+            if keyword in voice:
+                default_voice = engine_map.get("default", "")
+                return self._detect_gender(default_voice) or "neutral"
+
+        return "neutral"
+
+    @staticmethod
+    def _detect_gender(text: str) -> Optional[str]:
+        """从描述中识别性别（先判断女声，避免 female 被 male 误匹配）"""
+        text_lower = text.lower()
+        if "女" in text_lower or "female" in text_lower:
+            return "female"
+        if "男" in text_lower or "male" in text_lower:
+            return "male"
+        return None
+
+    def can_render(self, voice_description: str, tts_engine: str, voice_file: Optional[str] = None) -> bool:
+        """
+        判断引擎能否还原指定音色（自定义音色文件只有支持参考音频的引擎可用）
+
+        Args:
+            voice_description: 音色描述或音色ID
+            tts_engine: TTS引擎类型
+            voice_file: 用户指定的音色文件
+
+        Returns:
+            是否可以渲染
+        """
+        uses_custom_file = bool(voice_file and os.path.exists(voice_file))
+        if not uses_custom_file and voice_description:
+            uses_custom_file = self._find_custom_voice_file(voice_description.strip()) is not None
+
+        if uses_custom_file:
+            return tts_engine.lower() in self.FILE_VOICE_ENGINES
+        return True
+
     def get_all_available_voices(self, tts_engine: str) -> Dict[str, str]:
         """获取指定引擎的所有可用音色"""
         if tts_engine.lower() == 'cosyvoice':
@@ -9,6 +9,8 @@ import aiohttp
 from bs4 import BeautifulSoup
 import re
 
+from ..core.http_clients import http_clients
+
 logger = logging.getLogger(__name__)
 
 
@@ -134,8 +136,8 @@ class WebScraperService:
 
             timeout = aiohttp.ClientTimeout(total=30)
 
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                async with session.get(url, headers=headers) as response:
+            async with http_clients.session() as session:
+                async with session.get(url, headers=headers, timeout=timeout) as response:
                     if response.status != 200:
                         return {
                             'success': False,
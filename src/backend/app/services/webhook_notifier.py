@@ -0,0 +1,193 @@
+"""
+任务完成回调（Webhook）
+任务结束（完成/失败/取消）时向请求中的 callback_url POST 任务状态，客户端无需轮询：
+- 请求体用 HMAC-SHA256 签名（X-Podcast-Signature: sha256=<hex>，签名内容为 "<时间戳>.<请求体>"）
+- 网络错误、超时、429 和 5xx 按统一重试策略重试，其他 4xx 视为接收方拒绝，不再重试
+- 投递在后台进行，不占用任务工作协程
+- 回调地址由客户端提供：所有回调共用一个连接数有上限的客户端（不按用户主机各建连接池），
+  不跟随重定向，并拒绝回环、链路本地和内网地址（提交时校验IP字面量，投递前再校验解析结果）
+"""
+
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import socket
+import time
+from typing import Any, Dict, Optional, Set
+from urllib.parse import urlparse
+
+import httpx
+
+from ..core.config import settings
+from .retry_policy import RetryBudget, RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+
+class WebhookDeliveryError(Exception):
+    """回调投递失败（retryable 表示是否值得重试）"""
+
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+def _is_private_address(address: str) -> bool:
+    """非公网地址：回环、链路本地、内网、运营商共享地址、保留和组播地址"""
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return not ip.is_global or ip.is_multicast
+
+
+def validate_callback_url(url: str) -> str:
+    """校验回调地址（只允许 http/https，拒绝指向本机和内网的地址），无效时抛出 ValueError"""
+    parsed = urlparse(url or "")
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise ValueError(f"无效的回调地址: {url}")
+    if settings.webhook_allow_private_targets:
+        return url
+
+    host = parsed.hostname.rstrip(".").lower()
+    if host == "localhost" or host.endswith(".localhost"):
+        raise ValueError(f"回调地址不能指向本机: {url}")
+    try:
+        private = _is_private_address(host)
+    except ValueError:
+        private = False  # 域名：投递前再校验解析结果
+    if private:
+        raise ValueError(f"回调地址不能指向本机或内网: {url}")
+    return url
+
+
+async def _check_resolved_host(url: str):
+    """投递前解析回调主机，任一地址属于本机或内网时拒绝（防止域名解析到内网地址）"""
+    if settings.webhook_allow_private_targets:
+        return
+    parsed = urlparse(url)
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(parsed.hostname, port, type=socket.SOCK_STREAM)
+    except OSError as e:
+        raise WebhookDeliveryError(f"无法解析回调主机: {e}")
+    if any(_is_private_address(info[4][0]) for info in infos):
+        raise WebhookDeliveryError("回调主机解析到本机或内网地址", retryable=False)
+
+
+def sign_payload(secret: str, timestamp: str, body: bytes) -> str:
+    """计算回调签名：HMAC-SHA256("<时间戳>.<请求体>")"""
+    message = timestamp.encode("utf-8") + b"." + body
+    return "sha256=" + hmac.new(secret.encode("utf-8"), message, hashlib.sha256).hexdigest()
+
+
+class WebhookNotifier:
+    """后台投递任务回调"""
+
+    def __init__(self, secret: str = "", max_attempts: int = 5, timeout: float = 10.0,
+                 max_connections: int = 20):
+        self.secret = secret
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._client: Optional[httpx.AsyncClient] = None
+        self.policy = RetryPolicy(
+            "webhook",
+            max_attempts=max_attempts,
+            base_delay=2.0,
+            max_delay=60.0,
+            call_timeout=timeout,
+            # 回调重试使用独立的预算：目标服务故障时不会耗尽LLM/TTS调用共用的全局重试预算
+            budget=RetryBudget(ratio=settings.retry_budget_ratio, min_tokens=settings.retry_budget_min_tokens)
+        )
+        self._pending: Set[asyncio.Task] = set()
+        self.stats = {"delivered": 0, "failed": 0}
+
+        if not secret:
+            logger.warning("[Webhook] 未配置 WEBHOOK_SECRET，回调请求不签名")
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """所有回调共用的客户端：总连接数有上限，不跟随重定向"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                ),
+                timeout=self.timeout,
+                follow_redirects=False
+            )
+        return self._client
+
+    def _headers(self, event: str, body: bytes) -> Dict[str, str]:
+        timestamp = str(int(time.time()))
+        headers = {
+            "Content-Type": "application/json",
+            "X-Podcast-Event": event,
+            "X-Podcast-Timestamp": timestamp
+        }
+        if self.secret:
+            headers["X-Podcast-Signature"] = sign_payload(self.secret, timestamp, body)
+        return headers
+
+    async def deliver(self, url: str, event: str, payload: Dict[str, Any]) -> bool:
+        """
+        投递一次回调（含重试）
+
+        Args:
+            url: 回调地址
+            event: 事件名（如 task.completed）
+            payload: 回调内容
+
+        Returns:
+            是否投递成功
+        """
+        body = json.dumps({"event": event, **payload}, ensure_ascii=False, default=str).encode("utf-8")
+
+        async def post_once(timeout: Optional[float]):
+            await _check_resolved_host(url)
+            # 每次尝试重新签名，时间戳与实际发送时间一致
+            response = await self._get_client().post(url, content=body, headers=self._headers(event, body),
+                                                     timeout=timeout or self.timeout)
+            if response.status_code == 429 or response.status_code >= 500:
+                raise WebhookDeliveryError(f"HTTP {response.status_code}")
+            if response.status_code >= 400:
+                raise WebhookDeliveryError(f"HTTP {response.status_code}", retryable=False)
+
+        try:
+            await self.policy.run(
+                post_once,
+                retry_on=lambda error: getattr(error, "retryable", True)
+            )
+            self.stats["delivered"] += 1
+            return True
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.stats["failed"] += 1
+            logger.warning(f"[Webhook] 回调投递失败 {url}: {str(e)}")
+            return False
+
+    def notify(self, url: str, event: str, payload: Dict[str, Any]):
+        """在后台投递回调（保留任务引用，避免被垃圾回收）"""
+        task = asyncio.get_running_loop().create_task(self.deliver(url, event, payload))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def aclose(self):
+        """应用关闭时释放回调连接"""
+        client, self._client = self._client, None
+        if client is not None and not client.is_closed:
+            await client.aclose()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"pending": len(self._pending), "retry_budget": self.policy.budget.get_stats(), **self.stats}
+
+
+webhook_notifier = WebhookNotifier(
+    secret=settings.webhook_secret,
+    max_attempts=settings.webhook_max_attempts,
+    timeout=settings.webhook_timeout_seconds,
+    max_connections=settings.webhook_max_connections
+)
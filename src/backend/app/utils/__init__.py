@@ -3,5 +3,15 @@ Utils模块 - 工具函数集合
 """
 
 from .text_cleaner import TextCleaner, clean_for_tts
+from .json_stream import DialogueStreamParser, extract_dialogues, loads_tolerant
+from .shingle_index import ShingleIndex, find_repeated_texts
+from .keyword_matcher import KeywordMatcher, get_matcher
+from .single_flight import SingleFlight
 
-__all__ = ['TextCleaner', 'clean_for_tts']
\ No newline at end of file
+__all__ = [
+    'TextCleaner', 'clean_for_tts',
+    'DialogueStreamParser', 'extract_dialogues', 'loads_tolerant',
+    'ShingleIndex', 'find_repeated_texts',
+    'KeywordMatcher', 'get_matcher',
+    'SingleFlight'
+]
\ No newline at end of file
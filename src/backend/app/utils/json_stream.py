@@ -0,0 +1,177 @@
+"""
+容错的流式JSON解析
+LLM输出的JSON常见问题：被```代码块包裹、前后夹杂说明文字、字符串里直接换行、多余的尾逗号、
+输出被截断。本模块提供：
+- loads_tolerant：修复上述问题后解析完整文本
+- DialogueStreamParser：边接收token边扫描，每当一个对话对象（含character_name和content的最内层对象）
+  完整出现就立即返回；外层结构损坏或输出被截断时，已完整的对话也不会丢失
+"""
+
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+DIALOGUE_KEYS = ("character_name", "content")
+
+_CLOSERS = {"{": "}", "[": "]"}
+_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+
+
+def _repair(text: str) -> str:
+    """
+    修复从第一个 { 或 [ 开始的JSON文本：转义字符串中的换行/制表符，去掉尾逗号，
+    丢弃顶层结构结束后的多余内容，补全被截断的字符串和括号
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    in_string = False
+    escaped = False
+
+    for ch in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            elif ch in _ESCAPES:
+                out.append(_ESCAPES[ch])
+                continue
+            out.append(ch)
+            continue
+
+        if ch == '"':
+            in_string = True
+        elif ch in _CLOSERS:
+            stack.append(_CLOSERS[ch])
+        elif ch in ("}", "]"):
+            # 去掉结构结尾前的尾逗号
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            if stack:
+                stack.pop()
+            out.append(ch)
+            if not stack:
+                break
+            continue
+        out.append(ch)
+
+    # 输出被截断：补全字符串和未闭合的括号
+    if escaped:
+        out.pop()
+    if in_string:
+        out.append('"')
+    while out and (out[-1].isspace() or out[-1] == ","):
+        out.pop()
+    out.extend(reversed(stack))
+    return "".join(out)
+
+
+def loads_tolerant(text: str) -> Any:
+    """
+    解析LLM输出的JSON（忽略代码块标记和前后的说明文字，修复常见格式问题）
+
+    Raises:
+        ValueError: 找不到JSON或修复后仍无法解析
+    """
+    starts = [index for index in (text.find("{"), text.find("[")) if index >= 0]
+    if not starts:
+        raise ValueError("响应中没有JSON内容")
+    candidate = text[min(starts):]
+
+    decoder = json.JSONDecoder()
+    try:
+        return decoder.raw_decode(candidate)[0]
+    except ValueError:
+        return decoder.raw_decode(_repair(candidate))[0]
+
+
+def _loads_object(text: str) -> Optional[Any]:
+    try:
+        return json.loads(text)
+    except ValueError:
+        try:
+            return json.loads(_repair(text))
+        except ValueError:
+            return None
+
+
+class DialogueStreamParser:
+    """
+    增量提取对话对象：feed() 传入新到达的文本片段，返回其中新出现的完整对话
+
+    只跟踪最内层的对象（不再包含子对象），因此 {"dialogues": [...]} 外层结构
+    是否完整、最外层是对象还是数组都不影响对话的提取
+    """
+
+    def __init__(self, required_keys: Tuple[str, ...] = DIALOGUE_KEYS):
+        self.required_keys = required_keys
+        self.text = ""
+        self._pos = 0
+        self._stack: List[List[Any]] = []  # [括号, 起始位置, 是否包含子对象]
+        self._in_string = False
+        self._escaped = False
+        self.dialogues: List[Dict[str, Any]] = []
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        self.text += chunk
+        found = []
+        text = self.text
+
+        for index in range(self._pos, len(text)):
+            ch = text[index]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if not self._stack and ch not in _CLOSERS:
+                # JSON开始之前的说明文字、代码块标记
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in _CLOSERS:
+                if ch == "{":
+                    for entry in reversed(self._stack):
+                        if entry[0] == "{":
+                            entry[2] = True
+                            break
+                self._stack.append([ch, index, False])
+            elif ch in ("}", "]"):
+                opener = "{" if ch == "}" else "["
+                # 括号不匹配时丢弃内层未闭合的部分
+                while self._stack and self._stack[-1][0] != opener:
+                    self._stack.pop()
+                if not self._stack:
+                    continue
+                _, start, has_child = self._stack.pop()
+                if opener == "{" and not has_child:
+                    item = self._accept(text[start:index + 1])
+                    if item is not None:
+                        found.append(item)
+
+        self._pos = len(text)
+        self.dialogues.extend(found)
+        return found
+
+    def _accept(self, fragment: str) -> Optional[Dict[str, Any]]:
+        item = _loads_object(fragment)
+        if not isinstance(item, dict):
+            return None
+        for key in self.required_keys:
+            value = item.get(key)
+            if not isinstance(value, str) or not value.strip():
+                return None
+        return item
+
+
+def extract_dialogues(text: str) -> List[Dict[str, Any]]:
+    """从完整的LLM输出中提取所有完整的对话对象"""
+    return DialogueStreamParser().feed(text)
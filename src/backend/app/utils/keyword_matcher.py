@@ -0,0 +1,132 @@
+"""
+多关键词匹配（Aho-Corasick自动机）
+敏感词检测、音效触发词、质量评估的关键词打分都要在一段文本里查找一组关键词。
+逐个关键词做 `in` 判断的代价是 O(关键词数 × 文本长度)；自动机把整组关键词编译一次，
+之后每段文本只需从头到尾扫描一遍即可找出全部命中。
+同一组关键词通过 get_matcher 共享同一个编译好的自动机
+"""
+
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Iterable, List, Set, Tuple
+
+
+class KeywordMatcher:
+    """编译好的关键词自动机（构建后只读，可在多个协程/线程间共享）"""
+
+    def __init__(self, keywords: Iterable[str], ignore_case: bool = False):
+        """
+        Args:
+            keywords: 关键词列表（空字符串和重复项会被忽略）
+            ignore_case: 是否忽略大小写
+        """
+        self.ignore_case = ignore_case
+        self.keywords: List[str] = []
+        seen: Set[str] = set()
+        for keyword in keywords:
+            if keyword and keyword not in seen:
+                seen.add(keyword)
+                self.keywords.append(keyword)
+
+        # 节点0为根；_goto[节点][字符] -> 子节点，_fail[节点] -> 失配跳转，_output[节点] -> 命中的关键词编号
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Tuple[int, ...]] = [()]
+        self._build()
+
+    def _build(self):
+        outputs: List[List[int]] = [[]]
+        for index, keyword in enumerate(self.keywords):
+            node = 0
+            for ch in self._fold(keyword):
+                next_node = self._goto[node].get(ch)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][ch] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    outputs.append([])
+                node = next_node
+            outputs[node].append(index)
+
+        # 按层（BFS）计算失配指针，并把失配节点的输出并入当前节点
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                outputs[child].extend(outputs[self._fail[child]])
+                queue.append(child)
+
+        self._output = [tuple(items) for items in outputs]
+
+    def _fold(self, text: str) -> str:
+        return text.lower() if self.ignore_case else text
+
+    def __len__(self) -> int:
+        return len(self.keywords)
+
+    def find_all(self, text: str) -> List[Tuple[int, str]]:
+        """
+        文本中所有命中（含重叠命中）
+
+        Returns:
+            [(起始位置, 关键词), ...]，按结束位置排序
+        """
+        hits = []
+        if not text or not self.keywords:
+            return hits
+
+        goto, fail, output = self._goto, self._fail, self._output
+        node = 0
+        for position, ch in enumerate(self._fold(text)):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for index in output[node]:
+                keyword = self.keywords[index]
+                hits.append((position - len(keyword) + 1, keyword))
+        return hits
+
+    def matched(self, text: str) -> List[str]:
+        """文本中出现过的关键词（去重，按关键词列表中的顺序）"""
+        if not text or not self.keywords:
+            return []
+
+        goto, fail, output = self._goto, self._fail, self._output
+        found: Set[int] = set()
+        total = len(self.keywords)
+        node = 0
+        for ch in self._fold(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if output[node]:
+                found.update(output[node])
+                if len(found) == total:
+                    break
+        return [self.keywords[index] for index in sorted(found)]
+
+    def contains_any(self, text: str) -> bool:
+        """文本中是否出现任一关键词"""
+        if not text or not self.keywords:
+            return False
+
+        goto, fail, output = self._goto, self._fail, self._output
+        node = 0
+        for ch in self._fold(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if output[node]:
+                return True
+        return False
+
+
+@lru_cache(maxsize=64)
+def get_matcher(keywords: Tuple[str, ...], ignore_case: bool = False) -> KeywordMatcher:
+    """按关键词组取共享的自动机（同一组关键词只编译一次）"""
+    return KeywordMatcher(keywords, ignore_case=ignore_case)
@@ -0,0 +1,114 @@
+"""
+Shingle指纹索引
+把文本切成固定长度的字符片段（shingle），用滚动哈希（Rabin-Karp）在O(文本长度)内算出全部片段指纹，
+按指纹建立倒排索引。新文本查询时统计其片段在每段已有文本中出现的比例，用于：
+- 剧本生成时判断新对话是否与前文重复（覆盖整段对话，而不只是最近几句）
+- 质量评估时找出剧本中与前文高度重复的对话
+"""
+
+import unicodedata
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+_MOD = (1 << 61) - 1
+_BASE = 1_000_003
+
+
+def normalize_text(text: str) -> str:
+    """小写并去掉空白和标点，只比较实际内容"""
+    return "".join(
+        ch for ch in text.lower()
+        if not unicodedata.category(ch).startswith(("P", "Z", "C"))
+    )
+
+
+def shingle_hashes(text: str, size: int) -> List[int]:
+    """文本中每个长度为 size 的片段的滚动哈希（文本短于 size 时返回空列表）"""
+    if len(text) < size:
+        return []
+
+    power = pow(_BASE, size - 1, _MOD)
+    value = 0
+    for ch in text[:size]:
+        value = (value * _BASE + ord(ch)) % _MOD
+    hashes = [value]
+    for index in range(size, len(text)):
+        value = ((value - ord(text[index - size]) * power) * _BASE + ord(text[index])) % _MOD
+        hashes.append(value)
+    return hashes
+
+
+class ShingleIndex:
+    """文本集合的shingle倒排索引（只追加；文档编号即加入顺序）"""
+
+    def __init__(self, shingle_size: int = 10, min_length: int = 20):
+        """
+        Args:
+            shingle_size: 片段长度（字符）
+            min_length: 规范化后短于该长度的文本不做重复判断
+        """
+        self.shingle_size = shingle_size
+        self.min_length = min_length
+        self._postings: Dict[int, Set[int]] = defaultdict(set)
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def clear(self):
+        self._postings.clear()
+        self._count = 0
+
+    def add(self, text: str) -> int:
+        """加入一段文本，返回其文档编号"""
+        doc_id = self._count
+        for value in shingle_hashes(normalize_text(text), self.shingle_size):
+            self._postings[value].add(doc_id)
+        self._count += 1
+        return doc_id
+
+    def best_match(self, text: str) -> Tuple[Optional[int], float]:
+        """
+        与新文本重合度最高的已有文本
+
+        Returns:
+            (文档编号, 重合比例)：新文本的片段中出现在该文档里的比例；文本过短或没有重合时为 (None, 0.0)
+        """
+        normalized = normalize_text(text)
+        if len(normalized) < self.min_length:
+            return None, 0.0
+        hashes = shingle_hashes(normalized, self.shingle_size)
+        if not hashes:
+            return None, 0.0
+
+        hits: Dict[int, int] = defaultdict(int)
+        for value in hashes:
+            for doc_id in self._postings.get(value, ()):
+                hits[doc_id] += 1
+        if not hits:
+            return None, 0.0
+
+        doc_id = max(hits, key=hits.get)
+        return doc_id, hits[doc_id] / len(hashes)
+
+    def is_repetition(self, text: str, threshold: float = 0.5) -> bool:
+        """新文本与某段已有文本的重合比例是否超过阈值"""
+        return self.best_match(text)[1] > threshold
+
+
+def find_repeated_texts(texts: List[str], threshold: float = 0.5,
+                        shingle_size: int = 10) -> List[Tuple[int, int, float]]:
+    """
+    按顺序找出与前文高度重复的文本
+
+    Returns:
+        [(文本下标, 与之重复的前文下标, 重合比例), ...]
+    """
+    index = ShingleIndex(shingle_size=shingle_size)
+    repeated = []
+    for position, text in enumerate(texts):
+        doc_id, ratio = index.best_match(text)
+        if doc_id is not None and ratio > threshold:
+            repeated.append((position, doc_id, ratio))
+        index.add(text)
+    return repeated
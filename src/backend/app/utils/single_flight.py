@@ -0,0 +1,81 @@
+"""
+单飞（single-flight）合并
+相同键的并发调用只执行一次，其余调用方等待并共享同一结果；
+领头调用被取消时，等待方自行重新发起（其中一个成为新的领头者）。
+TTS请求去重和预处理缓存共用这一实现
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+class LeaderCancelled(Exception):
+    """领头调用被取消，等待方需要自行重新发起"""
+
+
+class _Flight:
+    """一次进行中的调用"""
+
+    def __init__(self, future: asyncio.Future):
+        self.future = future
+        self.payloads: List[Any] = []  # 等待方附带的数据（如各自的输出路径）
+
+
+class SingleFlight:
+    """按键合并并发调用"""
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def do(self, key: Hashable, producer: Callable[[], Awaitable[Any]],
+                 payload: Any = None,
+                 publish: Optional[Callable[[Any, List[Any]], None]] = None) -> Tuple[Any, bool]:
+        """
+        执行调用，相同键的并发调用共享结果
+
+        Args:
+            key: 合并键
+            producer: 实际调用
+            payload: 作为等待方加入时附带的数据，交给领头者的 publish
+            publish: 领头者在交付结果前调用 publish(结果, 等待方附带的数据)
+
+        Returns:
+            (结果, 是否共享了其他调用方的结果)
+        """
+        flight = self._flights.get(key)
+        if flight is not None:
+            if payload is not None:
+                flight.payloads.append(payload)
+            try:
+                return await asyncio.shield(flight.future), True
+            except LeaderCancelled:
+                return await self.do(key, producer, payload, publish)
+            except asyncio.CancelledError:
+                # 已取消的等待方不再需要结果（如不再给它复制输出文件）
+                if payload is not None and payload in flight.payloads:
+                    flight.payloads.remove(payload)
+                raise
+
+        flight = _Flight(asyncio.get_running_loop().create_future())
+        # 没有等待方时也取走异常，避免 "exception was never retrieved" 警告
+        flight.future.add_done_callback(lambda future: future.cancelled() or future.exception())
+        self._flights[key] = flight
+        try:
+            result = await producer()
+        except asyncio.CancelledError:
+            self._flights.pop(key, None)
+            flight.future.set_exception(LeaderCancelled())
+            raise
+        except BaseException as error:
+            self._flights.pop(key, None)
+            flight.future.set_exception(error)
+            raise
+
+        self._flights.pop(key, None)
+        if publish is not None:
+            publish(result, flight.payloads)
+        flight.future.set_result(result)
+        return result, False
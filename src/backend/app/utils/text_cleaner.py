@@ -4,9 +4,19 @@
 """
 
 import re
+import threading
+from collections import OrderedDict
 from typing import Optional
 
 
+def _combine(patterns) -> "re.Pattern":
+    """把多条正则合并成一个检测用的分支正则，MULTILINE标志只作用于各自的分支"""
+    return re.compile('|'.join(
+        f"(?m:{pattern.pattern})" if pattern.flags & re.MULTILINE else f"(?:{pattern.pattern})"
+        for pattern in patterns
+    ))
+
+
 class TextCleaner:
     """文本清理器 - 移除TTS不应该读出的内容"""
 
@@ -74,6 +84,37 @@ class TextCleaner:
         (re.compile(r'注意[语气情绪]'), ''),
     ]
 
+    # 所有规则合并成的一个检测正则（保留各规则自己的标志）：大部分对话一条规则都不命中，
+    # 扫描一遍即可跳过逐条替换；原文不命中任何规则时逐条替换也不会改变文本，结果完全一致
+    ANY_PATTERN = _combine(pattern for pattern, _ in PATTERNS)
+
+    WHITESPACE = re.compile(r'\s+')
+    REPEATED_PUNCTUATION = re.compile(r'([，。！？；])\1+')
+    AGGRESSIVE_PATTERNS = [
+        # 移除短的单词情感标记（避免误删正常词）
+        re.compile(r'\b[（(][a-zA-Z]{2,8}[）)]\b'),
+        # 移除过于简短的标注（1-2个字的）
+        re.compile(r'[（(【\[][\u4e00-\u9fa5]{1,2}[）)】\]]'),
+    ]
+
+    EMOTION_WORDS = (
+        '开心|悲伤|激动|平静|愤怒|惊讶|温暖|严肃|幽默|思考|轻松|紧张|焦虑|兴奋|疑惑|好奇|友好|期待|感动|欣慰|满足|骄傲|自豪|羞愧|尴尬|无奈|无聊|困惑|迷茫|坚定|犹豫|担心|害怕|恐惧|厌恶|反感|冷漠|淡然|热情|激昂|喜悦|失望|沮丧|愧疚|感激|同情|厌烦|焦躁|急切|渴望|怀疑'
+    )
+
+    # 有情感标签时额外清理的情感描述
+    EMOTION_TAGGED_PATTERNS = [
+        re.compile(r'[以用][^，。！？]{1,8}[的地][语气口吻声音方式]'),
+        re.compile(r'[^，。！？]{1,6}[地的]说'),
+    ]
+
+    # 对话文本通用清理：残留的情绪副词和提示
+    DIALOGUE_PATTERNS = [
+        (re.compile(rf'(^|[，。！？；\s])({EMOTION_WORDS})[地的](?=(说|讲|分享|表示|强调|提醒|回答|补充|开场|总结))'), r'\1'),
+        (re.compile(rf'({EMOTION_WORDS})[：:]\s*'), ''),
+        (re.compile(r'[\u4e00-\u9fa5]{1,4}[地的](?:说|说道|回答|讲述|问道|提到|强调|补充|感叹)[：:]?\s*'), ''),
+    ]
+    ANY_DIALOGUE_PATTERN = _combine(pattern for pattern, _ in DIALOGUE_PATTERNS)
+
     @staticmethod
     def clean_text(text: str, aggressive: bool = False) -> str:
         """
@@ -91,24 +132,22 @@ class TextCleaner:
 
         cleaned = text.strip()
 
-        # 应用所有预定义的清理规则
-        for pattern, replacement in TextCleaner.PATTERNS:
-            cleaned = pattern.sub(replacement, cleaned)
+        # 应用所有预定义的清理规则（先用合并正则扫描一遍，有命中才逐条替换）
+        if TextCleaner.ANY_PATTERN.search(cleaned):
+            for pattern, replacement in TextCleaner.PATTERNS:
+                cleaned = pattern.sub(replacement, cleaned)
 
         # 激进模式：额外清理
         if aggressive:
-            # 移除短的单词情感标记（避免误删正常词）
-            cleaned = re.sub(r'\b[（(][a-zA-Z]{2,8}[）)]\b', '', cleaned)
-
-            # 移除过于简短的标注（1-2个字的）
-            cleaned = re.sub(r'[（(【\[][\u4e00-\u9fa5]{1,2}[）)】\]]', '', cleaned)
+            for pattern in TextCleaner.AGGRESSIVE_PATTERNS:
+                cleaned = pattern.sub('', cleaned)
 
         # 清理多余的空白字符
-        cleaned = re.sub(r'\s+', ' ', cleaned)
+        cleaned = TextCleaner.WHITESPACE.sub(' ', cleaned)
         cleaned = cleaned.strip()
 
         # 移除连续的标点符号
-        cleaned = re.sub(r'([，。！？；])\1+', r'\1', cleaned)
+        cleaned = TextCleaner.REPEATED_PUNCTUATION.sub(r'\1', cleaned)
 
         # 如果清理后为空，返回原文（避免过度清理）
         if not cleaned and text:
@@ -133,20 +172,16 @@ class TextCleaner:
         # 如果已经有情感标签，更激进地清理文本中的情感描述
         if emotion:
             # 移除"以...的语气"、"用...说"等
-            cleaned = re.sub(r'[以用][^，。！？]{1,8}[的地][语气口吻声音方式]', '', cleaned)
-            cleaned = re.sub(r'[^，。！？]{1,6}[地的]说', '', cleaned)
+            for pattern in TextCleaner.EMOTION_TAGGED_PATTERNS:
+                cleaned = pattern.sub('', cleaned)
 
         # 通用清理：移除残留的情绪副词和提示
-        emotion_words = (
-            '开心|悲伤|激动|平静|愤怒|惊讶|温暖|严肃|幽默|思考|轻松|紧张|焦虑|兴奋|疑惑|好奇|友好|期待|感动|欣慰|满足|骄傲|自豪|羞愧|尴尬|无奈|无聊|困惑|迷茫|坚定|犹豫|担心|害怕|恐惧|厌恶|反感|冷漠|淡然|热情|激昂|喜悦|失望|沮丧|愧疚|感激|同情|厌烦|焦躁|急切|渴望|怀疑'
-        )
-
-        cleaned = re.sub(rf'(^|[，。！？；\s])({emotion_words})[地的](?=(说|讲|分享|表示|强调|提醒|回答|补充|开场|总结))', r'\1', cleaned)
-        cleaned = re.sub(rf'({emotion_words})[：:]\s*', '', cleaned)
-        cleaned = re.sub(r'[\u4e00-\u9fa5]{1,4}[地的](?:说|说道|回答|讲述|问道|提到|强调|补充|感叹)[：:]?\s*', '', cleaned)
+        if TextCleaner.ANY_DIALOGUE_PATTERN.search(cleaned):
+            for pattern, replacement in TextCleaner.DIALOGUE_PATTERNS:
+                cleaned = pattern.sub(replacement, cleaned)
 
         # 再次清理空白
-        cleaned = re.sub(r'\s+', ' ', cleaned).strip()
+        cleaned = TextCleaner.WHITESPACE.sub(' ', cleaned).strip()
 
         return cleaned
 
@@ -191,10 +226,47 @@ class TextCleaner:
         return None
 
 
+class _CleanMemo:
+    """
+    清理结果的有界LRU记忆，按 (文本, 情感) 区分：同一句对话会依次经过剧本生成、合成调度和各引擎的合成方法，
+    原文命中时直接返回结果；清理后的文本也以相同情感记下，再次传入时视为已清理、原样返回。
+    进程内所有任务共用，条目数超过上限时淘汰最久未用的
+    """
+
+    def __init__(self, max_size: int = 4096):
+        self.max_size = max_size
+        self._results: "OrderedDict[tuple, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, text: str, emotion: Optional[str]) -> Optional[str]:
+        key = (text, emotion or None)
+        with self._lock:
+            cleaned = self._results.get(key)
+            if cleaned is not None:
+                self._results.move_to_end(key)
+            return cleaned
+
+    def put(self, text: str, emotion: Optional[str], cleaned: str):
+        emotion = emotion or None
+        with self._lock:
+            self._results[(text, emotion)] = cleaned
+            self._results.move_to_end((text, emotion))
+            self._results[(cleaned, emotion)] = cleaned
+            self._results.move_to_end((cleaned, emotion))
+            while len(self._results) > self.max_size:
+                self._results.popitem(last=False)
+
+
+_clean_memo = _CleanMemo()
+
+# 反复清理的次数上限（防御性，正常几轮内即收敛）
+_MAX_CLEAN_PASSES = 8
+
+
 # 便捷函数
 def clean_for_tts(text: str, emotion: Optional[str] = None) -> str:
     """
-    清理文本用于TTS（便捷函数）
+    清理文本用于TTS（便捷函数，结果带记忆，同一句不会重复清理）
 
     Args:
         text: 原始文本
@@ -203,7 +275,21 @@ def clean_for_tts(text: str, emotion: Optional[str] = None) -> str:
     Returns:
         清理后的文本
     """
-    return TextCleaner.clean_dialogue_text(text, emotion)
+    if not text or not isinstance(text, str):
+        return TextCleaner.clean_dialogue_text(text, emotion)
+
+    cleaned = _clean_memo.get(text, emotion)
+    if cleaned is None:
+        # 单次清理不是幂等的（移除一个情绪词后可能露出新的匹配），
+        # 反复清理直到结果不再变化，记下的"已清理文本"再次清理时才确实保持不变
+        cleaned = TextCleaner.clean_dialogue_text(text, emotion)
+        for _ in range(_MAX_CLEAN_PASSES):
+            again = TextCleaner.clean_dialogue_text(cleaned, emotion)
+            if again == cleaned:
+                break
+            cleaned = again
+        _clean_memo.put(text, emotion, cleaned)
+    return cleaned
 
 
 # 测试用例
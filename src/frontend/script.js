@@ -2,7 +2,7 @@
 // 全局变量
 let characterCount = 0;
 let currentTaskId = null;
-let statusCheckInterval = null;
+let statusPollId = 0;
 let isGenerating = false;
 let knowledgeState = {
     stats: null,
@@ -19,7 +19,7 @@ const CONFIG = {
     maxCharacters: 6,
     minCharacters: 2,
     defaultCharacterCount: 2,
-    statusCheckInterval: 2000,
+    statusLongPollSeconds: 30,
     animationDuration: 300,
     toastDuration: 3000
 };
@@ -504,10 +504,11 @@ function updateGenerateButton(generating) {
 /**
  * 开始状态检查
  */
-function startStatusCheck() {
-    if (statusCheckInterval) {
-        clearInterval(statusCheckInterval);
-    }
+async function startStatusCheck() {
+    // 长轮询：服务端在状态或进度变化（或等待超时）后才返回，且只返回游标之后的增量；
+    // 新的检查开始后旧循环自动退出
+    const pollId = ++statusPollId;
+    let cursor = null;
 
     // 显示进度详情
     const progressDetails = document.getElementById('progressDetails');
@@ -515,33 +516,38 @@ function startStatusCheck() {
 
     updateStatus('pending', '任务已提交，正在处理中...');
 
-    statusCheckInterval = setInterval(async () => {
+    while (pollId === statusPollId) {
         try {
-            const response = await fetch(`${API_BASE_URL}/podcast/status/${currentTaskId}`);
+            const params = cursor !== null
+                ? `?since=${cursor}&wait=${CONFIG.statusLongPollSeconds}`
+                : '';
+            const response = await fetch(`${API_BASE_URL}/podcast/status/${currentTaskId}${params}`);
             const result = await response.json();
 
-            if (response.ok) {
-                updateStatus(result.status, result.message, result);
-                updateProgressSteps(result.status);
-
-                if (result.status === 'completed' || result.status === 'failed') {
-                    clearInterval(statusCheckInterval);
-                    statusCheckInterval = null;
-                    isGenerating = false;
-                    updateGenerateButton(false);
-                }
-            } else {
+            if (!response.ok) {
                 throw new Error('状态查询失败');
             }
+            if (pollId !== statusPollId) {
+                return;
+            }
+
+            cursor = result.cursor ?? cursor;
+            updateStatus(result.status, result.message, result);
+            updateProgressSteps(result.status);
+
+            if (['completed', 'failed', 'cancelled', 'not_found'].includes(result.status)) {
+                isGenerating = false;
+                updateGenerateButton(false);
+                return;
+            }
         } catch (error) {
             console.error('Status check error:', error);
-            clearInterval(statusCheckInterval);
-            statusCheckInterval = null;
             isGenerating = false;
             updateGenerateButton(false);
             showToast('状态查询失败', 'error');
+            return;
         }
-    }, CONFIG.statusCheckInterval);
+    }
 }
 
 /**